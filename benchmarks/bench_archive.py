@@ -0,0 +1,83 @@
+"""Storage size and cold reload time of the cleaned-data formats.
+
+Cleans a synthetic flight to the 30 Hz grid, then writes it as cleaned
+CSV, text .fdr, binary .fdrb, column cache and compressed .fda archive,
+and reads each back in full (for the .fda also a 10 minute range).
+
+Run from the repository root:
+    python -m benchmarks.bench_archive --hours 4
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import make_raw_flight
+from src.archive import read_archive, write_archive
+from src.cache import open_columns, write_cache
+from src.export_replay_fdr import write_replay_fdr
+from src.fdr_binary import open_binary_fdr, read_text_fdr, write_binary_fdr
+from src.loader import interpolate, load_csv, normalize
+
+
+def _size(path):
+    path = Path(path)
+    if path.is_dir():
+        return sum(f.stat().st_size for f in path.iterdir())
+    return os.path.getsize(path)
+
+
+def _timed(func):
+    t = time.perf_counter()
+    func()
+    return time.perf_counter() - t
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--hours", type=float, default=4.0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        make_raw_flight(tmp / "raw.csv", hours=args.hours)
+        df = interpolate(normalize(load_csv(tmp / "raw.csv")), 30)
+        print(f"rows: {len(df):,}  in memory: {df.memory_usage(index=False).sum() / 1e6:.1f} MB")
+
+        fda = tmp / "flight.fda"
+        formats = {
+            "csv": (tmp / "flight.csv",
+                    lambda p: df.to_csv(p, index=False), pd.read_csv),
+            "fdr": (tmp / "flight.fdr",
+                    lambda p: write_replay_fdr(df, p), read_text_fdr),
+            "fdrb": (tmp / "flight.fdrb",
+                     lambda p: write_binary_fdr(df, p),
+                     lambda p: np.array(open_binary_fdr(p))),
+            "cache": (tmp / "flight.cache",
+                      lambda p: write_cache(df, p),
+                      lambda p: {k: np.array(v) for k, v in open_columns(p).items()}),
+            "fda": (fda,
+                    lambda p: write_archive(df, p, workers=args.workers),
+                    lambda p: read_archive(p, workers=args.workers)),
+        }
+
+        print(f"{'format':<8}{'MB':>10}{'write s':>10}{'read s':>10}")
+        for name, (path, write, read) in formats.items():
+            write_s = _timed(lambda: write(path))
+            read_s = _timed(lambda: read(path))
+            print(f"{name:<8}{_size(path) / 1e6:>10.1f}{write_s:>10.2f}{read_s:>10.3f}")
+
+        t0 = df["Time"].iloc[len(df) // 2]
+        part = _timed(lambda: read_archive(fda, t0=t0, t1=t0 + 600))
+        print(f"fda 10 min range: {part * 1e3:.1f} ms")
+        assert read_archive(fda).equals(df)
+
+
+if __name__ == "__main__":
+    main()
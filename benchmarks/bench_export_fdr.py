@@ -0,0 +1,76 @@
+"""Rows/second of write_replay_fdr against the old per-row writer.
+
+Run from the repository root:
+    python -m benchmarks.bench_export_fdr --rows 1000000
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.export_replay_fdr import FDR_HEADER, write_replay_fdr
+
+
+def write_replay_fdr_per_row(df, path):
+    """Previous implementation: one f-string and one write per row."""
+    with open(path, "w") as f:
+        f.write("\n".join(FDR_HEADER) + "\n")
+        df_export = df.rename(columns={
+            "Roll (deg)": "Roll",
+            "Pitch (deg)": "Pitch",
+            "Yaw (deg)": "Yaw"
+        })
+        for row in df_export.itertuples():
+            f.write(
+                f"{row.Time:.3f},{row.Longitude:.6f},{row.Latitude:.6f},"
+                f"{row.Altitude:.2f},{row.Roll:.2f},{row.Pitch:.2f},{row.Yaw:.2f}\n"
+            )
+
+
+def make_flight(rows, rate_hz=30):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "Time": np.arange(rows) / rate_hz,
+        "Longitude": 10 + np.cumsum(rng.normal(0, 1e-5, rows)),
+        "Latitude": 50 + np.cumsum(rng.normal(0, 1e-5, rows)),
+        "Altitude": 10000 + np.cumsum(rng.normal(0, 0.1, rows)),
+        "Roll (deg)": rng.normal(0, 5, rows),
+        "Pitch (deg)": rng.normal(2, 2, rows),
+        "Yaw (deg)": rng.uniform(0, 360, rows),
+    })
+
+
+def bench(func, df, path):
+    t0 = time.perf_counter()
+    func(df, path)
+    return time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    df = make_flight(args.rows)
+    with tempfile.TemporaryDirectory() as tmp:
+        old_path = Path(tmp) / "per_row.fdr"
+        new_path = Path(tmp) / "block.fdr"
+        t_old = bench(write_replay_fdr_per_row, df, old_path)
+        t_new = bench(lambda d, p: write_replay_fdr(d, p, workers=args.workers),
+                      df, new_path)
+        identical = old_path.read_bytes() == new_path.read_bytes()
+
+    print(f"rows:           {args.rows:,}")
+    print(f"per-row writer: {args.rows / t_old:12,.0f} rows/s ({t_old:.2f} s)")
+    print(f"block writer:   {args.rows / t_new:12,.0f} rows/s ({t_new:.2f} s)")
+    print(f"speedup:        {t_old / t_new:.1f}x")
+    print(f"byte-identical: {identical}")
+
+
+if __name__ == "__main__":
+    main()
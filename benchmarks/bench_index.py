@@ -0,0 +1,96 @@
+"""Archive queries: spatio-temporal index against a rescan of every flight.
+
+Writes --flights synthetic caches (straight legs over Europe), builds the
+index and times "which flights passed within 5 NM of this point between
+14:00 and 15:00" both ways.
+
+Run from the repository root:
+    python -m benchmarks.bench_index --flights 10000
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.cache import open_columns, write_cache
+from src.flight_index import NAUTICAL_MILE, build_index
+from src.replay import R_EARTH
+
+
+def write_flights(root, n, minutes, rate, seed=0):
+    rng = np.random.default_rng(seed)
+    paths = {}
+    for i in range(n):
+        t = rng.uniform(8, 20) * 3600 + np.arange(0, minutes * 60, 1 / rate)
+        lat0, lon0 = rng.uniform(40, 55), rng.uniform(-5, 20)
+        heading = rng.uniform(0, 2 * np.pi)
+        step = np.degrees(230.0 / R_EARTH) * (t - t[0])
+        df = pd.DataFrame({
+            "Time": t,
+            "Latitude": lat0 + step * np.cos(heading),
+            "Longitude": lon0 + step * np.sin(heading) / np.cos(np.radians(lat0)),
+        })
+        paths[f"F{i:05d}"] = write_cache(df, Path(root) / f"F{i:05d}.cache")
+    return paths
+
+
+def rescan(paths, lat, lon, radius, t0, t1):
+    """ The previous way: read every flight and test every sample """
+    found = set()
+    for fid, path in paths.items():
+        c = open_columns(path)
+        la, lo, t = (np.asarray(c[k]) for k in ("Latitude", "Longitude", "Time"))
+        h = (np.sin(np.radians(la - lat) / 2) ** 2 + np.cos(np.radians(la))
+             * np.cos(np.radians(lat)) * np.sin(np.radians(lo - lon) / 2) ** 2)
+        mask = (h <= np.sin(radius / (2 * R_EARTH)) ** 2) & (t >= t0) & (t <= t1)
+        if mask.any():
+            found.add(fid)
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--flights", type=int, default=10_000)
+    parser.add_argument("--minutes", type=float, default=90.0)
+    parser.add_argument("--rate", type=float, default=1.0, help="Samples per second")
+    parser.add_argument("--queries", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    with tempfile.TemporaryDirectory() as tmp:
+        t = time.perf_counter()
+        paths = write_flights(tmp, args.flights, args.minutes, args.rate)
+        print(f"flights: {args.flights:,}  written in {time.perf_counter() - t:.1f} s")
+
+        t = time.perf_counter()
+        index = build_index(paths, Path(tmp) / "index")
+        print(f"build: {time.perf_counter() - t:.2f} s  "
+              f"segments: {len(index.segments):,}")
+        t = time.perf_counter()
+        index = build_index(paths, Path(tmp) / "index")
+        print(f"rebuild (unchanged): {time.perf_counter() - t:.2f} s")
+
+        radius, t0, t1 = 5 * NAUTICAL_MILE, 14 * 3600.0, 15 * 3600.0
+        points = np.column_stack([rng.uniform(42, 53, args.queries),
+                                  rng.uniform(0, 15, args.queries)])
+        t = time.perf_counter()
+        results = [index.query_near(lat, lon, radius, t0, t1) for lat, lon in points]
+        per_query = (time.perf_counter() - t) / args.queries
+        hits = sum(r["flight"].nunique() for r in results)
+        print(f"index query: {per_query * 1e3:8.2f} ms  ({hits} flights matched)")
+
+        t = time.perf_counter()
+        lat, lon = points[0]
+        expected = rescan(paths, lat, lon, radius, t0, t1)
+        scan = time.perf_counter() - t
+        assert expected == set(results[0]["flight"])
+        print(f"full rescan: {scan * 1e3:8.2f} ms  ({scan / per_query:,.0f}x slower)")
+        del index
+
+
+if __name__ == "__main__":
+    main()
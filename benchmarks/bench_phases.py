@@ -0,0 +1,87 @@
+"""Flight-phase segmentation throughput and reuse of the phase table.
+
+Builds a gate-to-gate synthetic flight of the given length, writes it to
+a column cache with its derived speeds, and times:
+  - segment_phases over the whole flight (rows/s),
+  - flight_phases the first time (classify and store in the cache) and
+    again (the table read back from the cache header),
+  - cutting the approach out as a FrameStore with phase_store.
+
+Run from the repository root:
+    python -m benchmarks.bench_phases --rows 20000000
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.cache import write_cache
+from src.derived import DerivedChannels
+from src.phases import flight_phases, phase_store, segment_phases
+from src.replay import R_EARTH
+
+# (share of the flight, ground speed from, to (m/s), vertical speed (m/s))
+LEGS = [(0.04, 5, 5, 0), (0.006, 5, 75, 0), (0.17, 75, 230, 8), (0.5, 230, 230, 0),
+        (0.21, 230, 90, -6), (0.04, 90, 70, -3.5), (0.004, 70, 15, 0), (0.03, 8, 8, 0)]
+
+
+def make_flight(rows, seconds=7200.0, seed=0):
+    rng = np.random.default_rng(seed)
+    rate = rows / seconds
+    k = [int(share * rows) for share, *_ in LEGS]
+    k[3] += rows - sum(k)
+    speed = np.concatenate([np.linspace(a, b, n) for n, (_, a, b, _) in zip(k, LEGS)])
+    vs = np.repeat([v for *_, v in LEGS], k).astype(float)
+    return pd.DataFrame({
+        "Time": 36000 + np.arange(rows) / rate,
+        "Longitude": np.full(rows, 10.0),
+        "Latitude": 20 + np.degrees(np.cumsum(speed) / rate / R_EARTH),
+        "Altitude": 100 + np.cumsum(vs) / rate + rng.normal(0, 2, rows),
+        "Roll": np.zeros(rows), "Pitch": np.zeros(rows), "Yaw": np.zeros(rows),
+    })
+
+
+def timed(func, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20_000_000)
+    args = parser.parse_args()
+
+    df = make_flight(args.rows)
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = Path(tmp) / "flight.cache"
+        write_cache(df, cache)
+        channels = DerivedChannels.from_cache(cache)
+        channels["GroundSpeed"], channels["VerticalSpeed"]  # derived once, outside the timing
+
+        seconds, table = timed(lambda: segment_phases(channels))
+        print(f"rows: {args.rows:,}")
+        print(f"segment_phases: {seconds:.3f} s ({args.rows / seconds / 1e6:.1f} M rows/s)")
+        print(table.to_string(index=False))
+
+        start = time.perf_counter()
+        flight_phases(cache)
+        first = time.perf_counter() - start
+        again, _ = timed(lambda: flight_phases(cache))
+        print(f"\nflight_phases, classify and store: {first:.3f} s")
+        print(f"flight_phases, from the cache header: {again * 1e3:.2f} ms")
+
+        cut, store = timed(lambda: phase_store(cache, "approach"))
+        print(f"phase_store('approach'): {cut * 1e3:.2f} ms for {len(store):,} frames")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""End-to-end pipeline benchmark on a synthetic flight, per stage.
+
+Records wall time, rows/s and peak RSS of each main.py stage (best of
+--repeat runs) and can compare against a previous result to catch
+regressions across commits:
+
+    python -m benchmarks.bench_pipeline --hours 2 --output base.json
+    git checkout other-branch
+    python -m benchmarks.bench_pipeline --hours 2 --compare base.json
+
+The exit status is 1 if any stage got slower than --threshold.
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt
+
+from benchmarks.synthetic import make_raw_flight
+from src.export_replay_fdr import write_replay_fdr
+from src.loader import INGEST_ENGINES, interpolate, load_csv, normalize
+from src.profiling import StageProfiler, stage
+from src.replay import compute_xyz
+from src.visualize import plot_attitude, plot_map
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                               capture_output=True, text=True).stdout.strip()
+        return commit + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_once(raw, tmp, rate_hz, viz, engine="auto"):
+    with StageProfiler() as profiler:
+        df = load_csv(raw, engine=engine)
+        df = normalize(df)
+        df = interpolate(df, rate_hz)
+        df = compute_xyz(df)
+        with stage("write_csv", rows=len(df)):
+            df.to_csv(tmp / "clean.csv", index=False)
+        write_replay_fdr(df, tmp / "out.fdr")
+        if viz:
+            plt.close(plot_map(df))
+            plt.close(plot_attitude(df))
+    return profiler.report()
+
+
+def best_of(reports):
+    """Fastest run of each stage across repeats."""
+    best = {}
+    for report in reports:
+        for s in report["stages"]:
+            if s["name"] not in best or s["seconds"] < best[s["name"]]["seconds"]:
+                best[s["name"]] = s
+    result = dict(reports[-1])
+    result["stages"] = list(best.values())
+    result["total_seconds"] = min(r["total_seconds"] for r in reports)
+    return result
+
+
+def compare(result, baseline, threshold):
+    """Print old vs new time per stage; returns the regressed stage names."""
+    old = {s["name"]: s for s in baseline["stages"]}
+    regressed = []
+    print(f"\n{'stage':<20}{'base s':>10}{'new s':>10}{'ratio':>8}")
+    for s in result["stages"]:
+        if s["name"] not in old:
+            continue
+        ratio = s["seconds"] / max(old[s["name"]]["seconds"], 1e-9)
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  REGRESSION"
+            regressed.append(s["name"])
+        print(f"{s['name']:<20}{old[s['name']]['seconds']:>10.3f}"
+              f"{s['seconds']:>10.3f}{ratio:>8.2f}{flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hours", type=float, default=1.0, help="Flight length")
+    parser.add_argument("--raw-rate", type=float, default=8.0, help="Recorder rate (Hz)")
+    parser.add_argument("--rate", type=int, default=30, help="Interpolation rate (Hz)")
+    parser.add_argument("--extra-cols", type=int, default=0,
+                        help="Unused recorder columns the loader must skip")
+    parser.add_argument("--engine", choices=INGEST_ENGINES, default="auto",
+                        help="Raw CSV parser used by load_csv")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--viz", action="store_true", help="Include plot_map/plot_attitude")
+    parser.add_argument("--output", help="Write the result JSON here")
+    parser.add_argument("--compare", metavar="BASELINE", help="Previous result JSON")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Allowed slowdown per stage before failing")
+    args = parser.parse_args()
+
+    params = {"hours": args.hours, "raw_rate": args.raw_rate, "rate": args.rate,
+              "extra_cols": args.extra_cols, "seed": args.seed, "viz": args.viz,
+              "engine": args.engine}
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        raw = tmp / "raw.csv"
+        rows = make_raw_flight(raw, args.hours, args.raw_rate, args.extra_cols, args.seed)
+        print(f"synthetic flight: {rows:,} raw rows, {raw.stat().st_size / 1e6:.1f} MB")
+        reports = [run_once(raw, tmp, args.rate, args.viz, args.engine)
+                   for _ in range(args.repeat)]
+
+    result = {"commit": git_commit(), "params": params, **best_of(reports)}
+    print(f"\n{'stage':<20}{'seconds':>10}{'rows/s':>14}{'peak MB':>10}")
+    for s in result["stages"]:
+        print(f"{s['name']:<20}{s['seconds']:>10.3f}{s['rows_per_s']:>14,}"
+              f"{s['peak_rss_mb']:>10.1f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nresult written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get("params") != params:
+            print("warning: baseline was run with different parameters")
+        regressed = compare(result, baseline, args.threshold)
+        if regressed:
+            print(f"\n{len(regressed)} stage(s) slower than {args.threshold:.0%}: "
+                  f"{', '.join(regressed)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Headless static reports for an archive of flights.
+
+Writes --flights synthetic column caches, then renders the four report
+plots of each one: first serially with new figures per flight (the old
+way), then with write_reports, which reuses one set of figures per worker
+and spreads flights across --workers processes.
+
+Run from the repository root:
+    python -m benchmarks.bench_report --flights 16 --hours 1
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.synthetic import make_raw_flight
+from src.cache import write_cache
+from src.derived import DerivedChannels
+from src.loader import interpolate, load_csv, normalize
+from src.report import load_flight, write_reports
+from src.visualize import PLOTS
+
+
+def fresh_figures(flights, out_dir):
+    """ Build every figure from scratch for every flight """
+    for fid, cache in flights.items():
+        df = load_flight(cache)
+        (Path(out_dir) / fid).mkdir(parents=True, exist_ok=True)
+        for name, template in PLOTS.items():
+            template().update(df).savefig(Path(out_dir) / fid / f"{name}.png")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--flights", type=int, default=16)
+    parser.add_argument("--hours", type=float, default=1.0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        flights = {}
+        for i in range(args.flights):
+            make_raw_flight(tmp / "raw.csv", hours=args.hours, seed=i)
+            df = interpolate(normalize(load_csv(tmp / "raw.csv")), 30)
+            flights[f"F{i:03d}"] = write_cache(df, tmp / f"F{i:03d}.cache")
+            DerivedChannels.from_cache(flights[f"F{i:03d}"])["X"]
+        print(f"flights: {args.flights}  rows each: {len(df):,}")
+
+        t = time.perf_counter()
+        fresh_figures(flights, tmp / "fresh")
+        fresh = time.perf_counter() - t
+        print(f"new figures, serial:   {fresh:6.2f} s  ({fresh / args.flights:.2f} s/flight)")
+
+        for workers in sorted({1, args.workers}):
+            t = time.perf_counter()
+            summary = write_reports(flights, tmp / f"reports{workers}", workers=workers)
+            elapsed = time.perf_counter() - t
+            assert summary["failed"] == 0
+            print(f"templates, {workers:>2} worker(s): {elapsed:6.2f} s  "
+                  f"({elapsed / args.flights:.2f} s/flight, {fresh / elapsed:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Fan-out of replay frames to local consumer processes.
+
+Publishes a synthetic flight into a shared-memory FrameRing with 0, 1, 4
+and 10 attached reader processes and reports the producer's cost per
+frame (which should not depend on the number of readers) and what each
+reader received or lost to overruns. For comparison, it times the old
+way: every consumer running generate_fdr_frames over its own DataFrame.
+
+Run from the repository root:
+    python -m benchmarks.bench_ring --frames 2000000
+"""
+
+import argparse
+import multiprocessing as mp
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.frame_ring import FrameRing, FrameRingReader
+from src.replay import FrameStore, generate_fdr_frames
+
+
+def make_store(n):
+    t = np.arange(n, dtype=np.float64)
+    return FrameStore(time=36000 + t / 30, lat=20 + t * 1e-7, lon=10 + t * 1e-7,
+                      alt=3000 + np.sin(t / 1e4), roll=np.sin(t / 300),
+                      pitch=np.cos(t / 500), yaw=(t / 100) % 360)
+
+
+def consume(name, ready, results):
+    with FrameRingReader(name, from_start=True) as reader:
+        ready.set()
+        checksum = 0.0
+        for view in reader.batches(timeout=30):
+            checksum += float(view["alt"].sum())
+            del view
+        results.put((reader.received, reader.lost))
+
+
+def publish_with(readers, store, capacity, block):
+    ctx = mp.get_context("spawn")
+    results = ctx.Queue()
+    with FrameRing(capacity=capacity) as ring:
+        events = [ctx.Event() for _ in range(readers)]
+        procs = [ctx.Process(target=consume, args=(ring.name, e, results)) for e in events]
+        for p in procs:
+            p.start()
+        for e in events:
+            e.wait()
+        start = time.perf_counter()
+        ring.publish(store, block=block)
+        elapsed = time.perf_counter() - start
+        ring.finish()
+        got = [results.get() for _ in procs]
+        for p in procs:
+            p.join()
+    return elapsed, got
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=2_000_000)
+    parser.add_argument("--capacity", type=int, default=1 << 16, help="Ring slots")
+    parser.add_argument("--block", type=int, default=4096, help="Frames per publish")
+    args = parser.parse_args()
+
+    store = make_store(args.frames)
+    df = pd.DataFrame({"Time": store.time, "Longitude": store.lon, "Latitude": store.lat,
+                       "Altitude": store.alt, "Roll": store.roll, "Pitch": store.pitch,
+                       "Yaw": store.yaw})
+    start = time.perf_counter()
+    for _ in generate_fdr_frames(df):
+        pass
+    regen = time.perf_counter() - start
+    print(f"frames: {args.frames:,}")
+    print(f"generate_fdr_frames per consumer: {regen:.2f} s "
+          f"({regen / args.frames * 1e9:.0f} ns/frame)")
+
+    print(f"\n{'readers':>8}{'publish s':>11}{'ns/frame':>10}  received / lost per reader")
+    for readers in (0, 1, 4, 10):
+        elapsed, got = publish_with(readers, store, args.capacity, args.block)
+        per_reader = ", ".join(f"{r:,}/{lost:,}" for r, lost in got) or "-"
+        print(f"{readers:>8}{elapsed:>11.3f}{elapsed / args.frames * 1e9:>10.1f}  {per_reader}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Seek latency on a memory-mapped flight: frame_at, window and sample.
+
+Run from the repository root:
+    python -m benchmarks.bench_seek --hours 12
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.cache import write_cache
+from src.replay import FrameStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--hours", type=float, default=12.0)
+    parser.add_argument("--rate", type=float, default=30.0)
+    parser.add_argument("--seeks", type=int, default=10_000)
+    args = parser.parse_args()
+
+    times = np.arange(0.0, args.hours * 3600, 1 / args.rate)
+    df = pd.DataFrame({name: times for name in
+                       ["Time", "Latitude", "Longitude", "Altitude",
+                        "Roll", "Pitch", "Yaw"]})
+    rng = np.random.default_rng(0)
+    targets = rng.uniform(0, times[-1], args.seeks).tolist()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        write_cache(df, Path(tmp) / "flight.cache")
+        del df
+
+        t0 = time.perf_counter()
+        store = FrameStore.from_cache(Path(tmp) / "flight.cache")
+        opened = time.perf_counter() - t0
+
+        runs = {
+            "frame_at": lambda t: store.frame_at(t),
+            "window 60s": lambda t: store.window(t, t + 60),
+            "sample": lambda t: store.sample(t),
+            "searchsorted": lambda t: np.searchsorted(store.time, t),
+        }
+        print(f"frames: {len(times):,}  open: {opened * 1e3:.2f} ms")
+        for name, func in runs.items():
+            t0 = time.perf_counter()
+            for t in targets:
+                func(t)
+            per_seek = (time.perf_counter() - t0) / len(targets)
+            print(f"{name:>12}: {per_seek * 1e6:8.1f} us/seek")
+        del store, runs
+
+
+if __name__ == "__main__":
+    main()
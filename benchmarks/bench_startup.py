@@ -0,0 +1,166 @@
+"""Startup cost of each main.py command, from `python -X importtime`.
+
+Runs every command on a tiny synthetic flight (so the work itself is
+negligible) and reports the time spent importing modules, the wall time,
+which heavy packages got loaded and the slowest top-level imports.
+Results can be saved and compared like bench_pipeline:
+
+    python -m benchmarks.bench_startup --output startup.json
+    git checkout other-branch
+    python -m benchmarks.bench_startup --compare startup.json
+
+The exit status is 1 if any command's import time grew by more than
+--threshold, if a command loads a package it must not, or if it exits
+with another status than expected.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.synthetic import make_raw_flight
+
+MAIN = Path(__file__).resolve().parents[1] / "main.py"
+
+HEAVY = ("numpy", "pandas", "matplotlib", "matplotlib.pyplot")
+
+# Packages each command must never import
+FORBIDDEN = {
+    "help": ("pandas", "numpy", "matplotlib"),
+    "bad-option": ("pandas", "numpy", "matplotlib"),
+    "preprocess": ("matplotlib",),
+    "export": ("matplotlib",),
+    "replay-video": ("matplotlib.pyplot",),
+    "plot-report": ("matplotlib.pyplot",),
+}
+
+# Exit status of each command (0 unless listed)
+EXIT_STATUS = {"bad-option": 2}
+
+
+def commands(tmp):
+    raw, clean = tmp / "raw.csv", tmp / "clean.csv"
+    return {
+        "help": ["--help"],
+        "bad-option": ["preprocess", "--input", str(raw), "--quality", "nope"],
+        "preprocess": ["preprocess", "--input", str(raw), "--clean", str(clean)],
+        "export": ["export", "--clean", str(clean), "--fdr", str(tmp / "out.fdr")],
+        "replay-video": ["replay", "--clean", str(clean), "--video", str(tmp / "out.gif"),
+                         "--speed", "1000"],
+        "plot-report": ["plot", "--clean", str(clean), "--report", str(tmp / "report"),
+                        "--workers", "1"],
+    }
+
+
+def parse_importtime(stderr):
+    """ {module: (self us, cumulative us, depth)} from -X importtime output """
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules[name.strip()] = (int(self_us), int(cumulative), depth)
+    return modules
+
+
+def run_command(args, env):
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", str(MAIN), *args],
+                          capture_output=True, text=True, env=env)
+    wall = time.perf_counter() - start
+    modules = parse_importtime(proc.stderr)
+    top = {name: cum for name, (_, cum, depth) in modules.items() if depth == 0}
+    errors = [line for line in proc.stderr.splitlines() if not line.startswith("import time:")]
+    return {
+        "returncode": proc.returncode,
+        "error": errors[-1] if errors else "",
+        "wall_s": round(wall, 4),
+        "import_s": round(sum(top.values()) / 1e6, 4),
+        "modules": len(modules),
+        "heavy": [name for name in HEAVY if name in modules],
+        "slowest": sorted(top.items(), key=lambda kv: -kv[1])[:5],
+    }
+
+
+def best_of(runs):
+    best = min(runs, key=lambda r: r["import_s"])
+    return {**best, "wall_s": min(r["wall_s"] for r in runs)}
+
+
+def compare(result, baseline, threshold):
+    """ Print old vs new import time per command; returns the regressed ones """
+    old = baseline["commands"]
+    regressed = []
+    print(f"\n{'command':<16}{'base ms':>10}{'new ms':>10}{'ratio':>8}")
+    for name, r in result["commands"].items():
+        if name not in old:
+            continue
+        ratio = r["import_s"] / max(old[name]["import_s"], 1e-9)
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  REGRESSION"
+            regressed.append(name)
+        print(f"{name:<16}{old[name]['import_s'] * 1e3:>10.0f}"
+              f"{r['import_s'] * 1e3:>10.0f}{ratio:>8.2f}{flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="Write the result JSON here")
+    parser.add_argument("--compare", metavar="BASELINE", help="Previous result JSON")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Allowed import-time growth per command before failing")
+    args = parser.parse_args()
+
+    env = {**os.environ, "MPLBACKEND": "Agg"}
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        make_raw_flight(tmp / "raw.csv", hours=0.02)
+        for name, argv in commands(tmp).items():
+            results[name] = best_of([run_command(argv, env) for _ in range(args.repeat)])
+
+    print(f"{'command':<16}{'import ms':>10}{'wall ms':>10}{'modules':>9}  heavy imports")
+    failures = []
+    for name, r in results.items():
+        print(f"{name:<16}{r['import_s'] * 1e3:>10.0f}{r['wall_s'] * 1e3:>10.0f}"
+              f"{r['modules']:>9}  {', '.join(r['heavy']) or '-'}")
+        bad = [m for m in FORBIDDEN.get(name, ()) if m in r["heavy"]]
+        if bad:
+            failures.append(f"{name} imports {', '.join(bad)}")
+        if r["returncode"] != EXIT_STATUS.get(name, 0):
+            failures.append(f"{name} exited with status {r['returncode']}: {r['error']}")
+    print("\nslowest top-level imports (ms):")
+    for name, r in results.items():
+        print(f"  {name:<14}" + ", ".join(f"{m} {us / 1e3:.0f}" for m, us in r["slowest"]))
+
+    result = {"python": sys.version.split()[0], "commands": results}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nresult written to {args.output}")
+
+    regressed = []
+    if args.compare:
+        with open(args.compare) as f:
+            regressed = compare(result, json.load(f), args.threshold)
+    for failure in failures:
+        print(f"FAILED: {failure}")
+    if regressed:
+        print(f"\n{len(regressed)} command(s) slower to start than {args.threshold:.0%}: "
+              f"{', '.join(regressed)}")
+    if failures or regressed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Throughput of latlon_to_xyz: spherical vs WGS-84, against the old kernel.
+
+Run from the repository root:
+    python -m benchmarks.bench_xyz --points 10000000
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from src.replay import R_EARTH, latlon_to_xyz
+
+
+def latlon_to_xyz_three_expr(lat, lon, alt_m):
+    """Previous spherical implementation, one temporary per sub-expression."""
+    lat = np.radians(lat)
+    lon = np.radians(lon)
+    r = R_EARTH + alt_m
+    x = r * np.cos(lat) * np.cos(lon)
+    y = r * np.cos(lat) * np.sin(lon)
+    z = r * np.sin(lat)
+    return x, y, z
+
+
+def best_of(func, repeat, *args):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--points", type=int, default=10_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    lat = rng.uniform(-90, 90, args.points)
+    lon = rng.uniform(-180, 180, args.points)
+    alt = rng.uniform(0, 12000, args.points)
+
+    runs = {
+        "old sphere": lambda: latlon_to_xyz_three_expr(lat, lon, alt),
+        "sphere": lambda: latlon_to_xyz(lat, lon, alt, model="sphere"),
+        "wgs84": lambda: latlon_to_xyz(lat, lon, alt, model="wgs84"),
+    }
+    times = {name: best_of(func, args.repeat) for name, func in runs.items()}
+
+    print(f"points: {args.points:,}")
+    for name, t in times.items():
+        print(f"{name:>10}: {args.points / t / 1e6:8.1f} Mpts/s ({t:.3f} s)")
+    print(f"wgs84 / old sphere time: {times['wgs84'] / times['old sphere']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""Reproducible synthetic recorder CSVs for the benchmarks."""
+
+import numpy as np
+import pandas as pd
+
+WRITE_BLOCK = 200_000
+
+
+def make_raw_flight(path, hours=1.0, rate_hz=8.0, extra_cols=0, seed=0):
+    """Write a recorder-style CSV (GMT time columns, raw parameter names)
+    of a smooth random flight, plus `extra_cols` columns the loader has to
+    skip. Same arguments, same bytes. Returns the number of rows."""
+    rng = np.random.default_rng(seed)
+    n = int(hours * 3600 * rate_hz)
+    # Slightly irregular sample times, like a real recorder
+    t = 36000 + np.cumsum(rng.uniform(0.9, 1.1, n) / rate_hz)
+
+    heading = np.cumsum(rng.normal(0, 0.05, n)) % 360
+    lat = 20 + np.cumsum(np.cos(np.radians(heading))) * 1e-5
+    lon = 10 + np.cumsum(np.sin(np.radians(heading))) * 1e-5
+    alt = 3000 + np.cumsum(rng.normal(0, 0.5, n))
+    roll = np.clip(np.cumsum(rng.normal(0, 0.1, n)), -45, 45)
+    pitch = np.clip(np.cumsum(rng.normal(0, 0.05, n)), -20, 20)
+
+    with open(path, "w", newline="") as f:
+        for start in range(0, n, WRITE_BLOCK):
+            s = slice(start, start + WRITE_BLOCK)
+            hour = (t[s] // 3600).astype(int)
+            minute = ((t[s] % 3600) // 60).astype(int)
+            columns = {
+                "GMT_HOUR": hour,
+                "GMT_MINUTE": minute,
+                "GMT_SEC": np.round(t[s] - hour * 3600 - minute * 60, 4),
+                "LONP": lon[s], "LATP": lat[s], "baroaltitude": alt[s],
+                "ROLL": roll[s], "PTCH": pitch[s], "HDGS": heading[s],
+            }
+            for k in range(extra_cols):
+                columns[f"PARAM_{k}"] = rng.normal(size=len(hour))
+            pd.DataFrame(columns).to_csv(f, header=(start == 0), index=False)
+    return n
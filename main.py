@@ -1,75 +1,444 @@
 import argparse
-import pandas as pd
+import sys
+from contextlib import nullcontext
 from pathlib import Path
 
-from src.loader import preprocess_flight_data
-from src.replay import compute_xyz
-from src.visualize import plot_map, plot_trajectory, plot_attitude, animate_trajectory
-from src.export_replay_fdr import write_replay_fdr
+# Only light modules are imported here. pandas, matplotlib and the rest of
+# src load inside the stage that needs them, so `--help`, a bad option or
+# a subcommand that never plots does not pay for them.
+from src.profiling import StageProfiler, stage
 
-def main():
+COMMANDS = ("run", "preprocess", "export", "replay", "plot")
+
+
+def _split_names(value):
+    return [n for n in value.split(",") if n]
+
+
+def _data_options():
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--clean", default="data/clean/cleaned.csv",
+                       help="Output cleaned CSV path")
+    parser.add_argument("--cache", default=None,
+                       help="Binary column cache directory "
+                            "(default: next to --clean with a .cache suffix)")
+    parser.add_argument("--earth-model", default="sphere",
+                       help="Earth model for ECEF X/Y/Z: sphere or wgs84")
+    parser.add_argument("--workers", type=int, default=None,
+                       help="Worker processes for batch mode (default: all cores) "
+                            "or for rendering --video (default: 1)")
+    parser.add_argument("--profile", nargs="?", const="profile.json", default=None,
+                       metavar="JSON",
+                       help="Record wall time, rows/s and peak memory per stage "
+                            "and write them to this report")
+    return parser
+
+
+def _preprocess_options():
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--force-reprocess", action="store_true",
+                       help="Force reprocessing even if clean file exists")
+    parser.add_argument("--chunksize", type=int, default=None,
+                       help="Stream the raw CSV in chunks of this many rows "
+                            "(bounded memory for long recordings)")
+    parser.add_argument("--incremental", action="store_true",
+                       help="Live recorder file: only process rows appended since "
+                            "the last run and append to the cleaned/cache/.fdr outputs")
+    parser.add_argument("--final", action="store_true",
+                       help="With --incremental: the recording has ended, flush its tail")
+    parser.add_argument("--quality", choices=["flag", "drop", "repair"], default=None,
+                        help="Check for rate-of-change spikes, z-score outliers and "
+                             "time gaps before interpolating; drop or repair bad samples")
+    parser.add_argument("--events", default=None,
+                        help="Data-quality event table (default: next to --clean)")
+    parser.add_argument("--derived", type=_split_names, default=[], metavar="NAMES",
+                        help="Extra derived channels to compute, cache and write, "
+                             "comma separated (e.g. GroundSpeed,VerticalSpeed,LoadFactor)")
+    return parser
+
+
+def _export_options():
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--fdr", default=None,
+                       help="Optional output .fdr file path (a .fdrb suffix "
+                            "writes the memory-mappable binary format)")
+    parser.add_argument("--archive", default=None,
+                        help="Also write the cleaned data as a compressed .fda archive")
+    return parser
+
+
+def _plot_options():
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--report", default=None, metavar="DIR",
+                        help="Render the map, attitude, trajectory and altitude plots "
+                             "off-screen to DIR with an index.html instead of showing "
+                             "them; in batch mode one report per flight")
+    parser.add_argument("--report-format", default="png",
+                        help="Image format of --report plots: png or svg")
+    return parser
+
+
+def _phase_options():
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--phase", default=None, metavar="PHASE",
+                        help="Only use one flight phase (taxi, takeoff, climb, cruise, "
+                             "descent, approach or landing), cut from the phase table "
+                             "kept in the cache")
+    return parser
+
+
+def _video_options():
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--video", default=None,
+                       help="Render a headless top-down replay to this .mp4, .gif "
+                            "or .png sequence; in batch mode give only the "
+                            "format (e.g. .mp4) to get one video per flight")
+    parser.add_argument("--fps", type=int, default=30, help="Video frames per second")
+    parser.add_argument("--speed", type=float, default=1.0,
+                       help="Video replay speed multiplier")
+    return parser
+
+
+def build_parser():
     parser = argparse.ArgumentParser(
-        description="Flight Data Replay Pipeline",
+        description="Flight Data Replay Pipeline. Without a command, runs the "
+                    "whole pipeline (`run`).",
         formatter_class=argparse.ArgumentDefaultsHelpFormatter
     )
-    parser.add_argument("--input", required=True, help="Raw input CSV file")
-    parser.add_argument("--clean", default="data/clean/cleaned.csv", 
-                       help="Output cleaned CSV path")
-    parser.add_argument("--fdr", default=None, help="Optional output .fdr file path")
-    parser.add_argument("--skip-viz", action="store_true", 
+    commands = parser.add_subparsers(dest="command", metavar="COMMAND")
+    data, prep, export = _data_options(), _preprocess_options(), _export_options()
+    plot, video = _plot_options(), _video_options()
+    phase = _phase_options()
+
+    run = commands.add_parser(
+        "run", parents=[data, prep, phase, export, plot, video],
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        help="Preprocess, plot and export in one go (the default)")
+    source = run.add_mutually_exclusive_group(required=True)
+    source.add_argument("--input", help="Raw input CSV file")
+    source.add_argument("--batch", metavar="DIR_OR_GLOB",
+                        help="Process every raw CSV in a directory or glob "
+                             "across a process pool")
+    run.add_argument("--skip-viz", action="store_true",
                        help="Skip visualizations (faster processing)")
-    parser.add_argument("--force-reprocess", action="store_true",
-                       help="Force reprocessing even if clean file exists")
-    
-    args = parser.parse_args()
-    
+    run.add_argument("--out-dir", default="output",
+                       help="Batch mode: directory for .fdr files and manifest.json")
+
+    preprocess = commands.add_parser(
+        "preprocess", parents=[data, prep],
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        help="Clean a raw CSV into the cleaned CSV and column cache")
+    preprocess.add_argument("--input", required=True, help="Raw input CSV file")
+    preprocess.add_argument("--fdr", default=None,
+                            help="With --incremental: .fdr file to append to")
+
+    commands.add_parser(
+        "export", parents=[data, phase, export],
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        help="Write the cleaned data as .fdr, .fdrb or .fda")
+    commands.add_parser(
+        "replay", parents=[data, phase, video],
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        help="Replay the cleaned flight: animated, or rendered with --video")
+    commands.add_parser(
+        "plot", parents=[data, phase, plot],
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        help="Show the flight plots, or write them with --report")
+    return parser
+
+
+def parse_args(argv=None):
+    """ Parse a command line; one without a command runs the whole pipeline """
+
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if not argv or argv[0] not in (*COMMANDS, "-h", "--help"):
+        argv.insert(0, "run")
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    _check_args(parser, args)
+    return args
+
+
+def _check_args(parser, args):
+    """ Option values that are checked against the library, importing only
+    the parts that the given options need """
+
+    if args.earth_model != "sphere":
+        from src.replay import EARTH_MODELS
+        if args.earth_model not in EARTH_MODELS:
+            parser.error(f"Unknown earth model {args.earth_model!r}; "
+                         f"use one of {', '.join(EARTH_MODELS)}")
+    if getattr(args, "derived", None):
+        from src.derived import DERIVED
+        unknown = [n for n in args.derived if n not in DERIVED]
+        if unknown:
+            parser.error(f"Unknown derived channel(s): {', '.join(unknown)}; "
+                         f"use {', '.join(DERIVED)}")
+    if getattr(args, "phase", None):
+        from src.phases import PHASES
+        if getattr(args, "batch", None):
+            parser.error("--phase selects from a single flight; it cannot be used with --batch")
+        if args.phase not in PHASES:
+            parser.error(f"Unknown phase {args.phase!r}; use one of {', '.join(PHASES)}")
+    if getattr(args, "batch", None) and args.video:
+        try:
+            Path("flight.fdr").with_suffix(args.video)
+        except ValueError:
+            parser.error(f"In batch mode --video is a format such as .mp4, not {args.video!r}")
+    if getattr(args, "report", None) and args.report_format not in ("png", "svg"):
+        parser.error(f"Unsupported --report-format {args.report_format!r}; use png or svg")
+    if (getattr(args, "incremental", False) and args.fdr
+            and Path(args.fdr).suffix == ".fdrb"):
+        parser.error("--incremental appends to a text .fdr; use a .fdr path")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
     print("=" * 60)
     print("Flight Data Replay Pipeline")
     print("=" * 60)
-    
-    # Smart loading: skip preprocessing if clean file exists
-    if not args.force_reprocess and Path(args.clean).exists():
-        print("\n[1/4] Loading existing cleaned data...")
-        df = pd.read_csv(args.clean)
-        
-        # Check if XYZ already computed
-        if all(col in df.columns for col in ["X", "Y", "Z"]) and not df[["X","Y","Z"]].isna().all().any():
-
-            print(" XYZ coordinates already present")
-        else:
-            print("[2/4] Computing ECEF coordinates...")
-            df = compute_xyz(df)
-            df.to_csv(args.clean, index=False)
+
+    profiler = StageProfiler() if args.profile else nullcontext()
+    with profiler:
+        COMMAND_FUNCS[args.command](args)
+
+    if args.profile:
+        profiler.write(args.profile, args=vars(args))
+        print(profiler.summary())
+        print(f"\n Profile written to {args.profile}")
+
+
+def _cache_path(args):
+    return Path(args.cache) if args.cache else Path(args.clean).with_suffix(".cache")
+
+
+def _open_cache(args):
+    """ Derived-channel view of the cleaned data cache written by preprocess """
+
+    from src.cache import read_header
+    from src.derived import DerivedChannels
+
+    cache = _cache_path(args)
+    if read_header(cache) is None:
+        raise SystemExit(f"No cleaned data cache at {cache}; run `main.py preprocess` first")
+    with stage("read_cache"):
+        return DerivedChannels.from_cache(cache, earth_model=args.earth_model)
+
+
+def _select_phase(args, df, channels=None):
+    """ The rows of df in --phase, cut using the cache's phase table """
+
+    if not args.phase:
+        return df
+    from src.phases import flight_phases, select_phase
+
+    table = flight_phases(channels if channels is not None else _open_cache(args))
+    part = select_phase(df, table, args.phase)
+    if not len(part):
+        raise SystemExit(f"No {args.phase} phase in this flight "
+                         f"({' > '.join(table['phase']) or 'no data'})")
+    print(f"  Phase {args.phase}: {len(part):,} of {len(df):,} data points")
+    return part
+
+
+def preprocess(args):
+    """ Raw CSV to cleaned CSV and cache, with X/Y/Z and any --derived
+    channels; returns the cleaned data, or None for an incremental update """
+
+    from src.cache import cache_is_fresh
+
+    cache = _cache_path(args)
+    if args.incremental:
+        from src.incremental import preprocess_incremental
+
+        print("\nIncremental update of live recording...")
+        new_rows = preprocess_incremental(args.input, args.clean, cache_path=cache,
+                                          fdr_path=args.fdr,
+                                          earth_model=args.earth_model,
+                                          final=args.final)
+        print(f"\n{'=' * 60}")
+        print(f" {new_rows:,} new data points appended")
+        print(f" Cleaned data: {args.clean}")
+        print(f" FDR file: {args.fdr}")
+        print(f"{'=' * 60}\n")
+        return None
+
+    # Smart loading: reuse the binary cache while the raw input is unchanged
+    reprocessed = args.force_reprocess or not cache_is_fresh(cache, args.input)
+    if not reprocessed:
+        print("\n[1/4] Loading cached cleaned data...")
     else:
+        from src.loader import preprocess_flight_data
+
         # Full preprocessing
         print("\n[1/4] Preprocessing flight data...")
-        preprocess_flight_data(args.input, args.clean)
-        
-        print("[2/4] Computing ECEF coordinates...")
-        df = pd.read_csv(args.clean)
-        df = compute_xyz(df)
-        df.to_csv(args.clean, index=False)
-    
-    # Visualizations
-    if not args.skip_viz:
-        print("[3/4] Generating visualizations...")
-        plot_map(df)
-        plot_attitude(df)
-        plot_trajectory(df)
-        animate_trajectory(df)
+        quality = {}
+        if args.quality or args.events:
+            events = args.events or Path(args.clean).with_suffix(".events.csv")
+            fix = None if args.quality in (None, "flag") else args.quality
+            quality = {"events_path": events, "fix": fix}
+        # Only the cache here: the CSV is written once, below, with X/Y/Z
+        preprocess_flight_data(args.input, None,
+                               chunksize=args.chunksize, cache_path=cache, **quality)
+
+    # Derived channels are computed once per input and earth model and kept
+    # in the cache; only the CSV copy needs rewriting when one is added
+    channels = _open_cache(args)
+    wanted = ["X", "Y", "Z"] + [n for n in args.derived if n not in ("X", "Y", "Z")]
+    missing = [n for n in wanted if not channels.is_cached(n)]
+    if missing:
+        print(f"[2/4] Computing {', '.join(missing)}...")
     else:
-        print("[3/4] Skipping visualizations")
-    
-    # Export
+        print(" Derived channels already present")
+    df = channels.frame(list(channels.base) + wanted)
+    if missing or reprocessed:
+        Path(args.clean).parent.mkdir(parents=True, exist_ok=True)
+        with stage("write_csv", rows=len(df)):
+            df.to_csv(args.clean, index=False)
+    return df
+
+
+def plot(args, df=None):
+    """ The static report with --report, otherwise the interactive plots """
+
+    if df is None and args.phase:
+        channels = _open_cache(args)
+        df = _select_phase(args, channels.frame(list(channels.base) + ["X", "Y", "Z"]),
+                           channels)
+    if args.report:
+        from src.report import write_report
+
+        print("[3/4] Writing static report...")
+        source = df if args.phase else _cache_path(args)
+        record = write_report(source, args.report, fmt=args.report_format,
+                              workers=args.workers, earth_model=args.earth_model)
+        for error in record["errors"]:
+            print(f"  FAILED {error}")
+        print(f"  Report: {Path(args.report) / 'index.html'}")
+        return
+
+    from src.visualize import plot_attitude, plot_map, plot_trajectory
+
+    print("[3/4] Generating visualizations...")
+    if df is None:
+        channels = _open_cache(args)
+        df = channels.frame(list(channels.base) + ["X", "Y", "Z"])
+    plot_map(df)
+    plot_attitude(df)
+    plot_trajectory(df)
+
+
+def animate(args, df):
+    from src.visualize import animate_trajectory
+
+    animate_trajectory(df, fps=args.fps, speed=args.speed)
+
+
+def render_video(args, df):
+    """ Headless replay video; src.render needs no pyplot """
+
+    from src.render import render_replay
+
+    frames = render_replay(df["Time"].values, df["X"].values, df["Y"].values,
+                           args.video, fps=args.fps, speed=args.speed,
+                           workers=args.workers)
+    print(f"  Rendered {frames:,} video frames: {args.video}")
+
+
+def replay(args):
+    """ Render the replay to --video off-screen, or animate it on screen """
+
+    channels = _open_cache(args)
+    df = _select_phase(args, channels.frame(["Time", "X", "Y"]), channels)
+    if args.video:
+        render_video(args, df)
+    else:
+        animate(args, df)
+
+
+def export(args, df=None):
+    """ Write the cleaned data to --fdr (.fdr text or .fdrb binary) and
+    --archive (.fda) """
+
+    if df is None:
+        channels = _open_cache(args)
+        df = _select_phase(args, channels.frame(), channels)
     print("[4/4] Exporting files...")
+    if args.fdr and Path(args.fdr).suffix == ".fdrb":
+        from src.fdr_binary import write_binary_fdr
+
+        write_binary_fdr(df, args.fdr)
+    elif args.fdr:
+        from src.export_replay_fdr import write_replay_fdr
+
+        write_replay_fdr(df, args.fdr)
+    if args.fdr:
+        print(f"  Generated FDR file: {args.fdr}")
+    if args.archive:
+        from src.archive import write_archive
+
+        with stage("write_archive", rows=len(df)):
+            write_archive(df, args.archive, workers=args.workers)
+        print(f"  Generated archive: {args.archive}")
+
+
+def _default_fdr(args):
     if args.fdr is None:
         default = "data/out.fdr"
         print(f"No --fdr provided — writing to {default}")
         args.fdr = default
-    write_replay_fdr(df, args.fdr)
-    print(f"  Generated FDR file: {args.fdr}")
 
-    
+
+def run_batch_command(args):
+    from src.batch import run_batch
+
+    print(f"\nBatch processing {args.batch} -> {args.out_dir}")
+    kwargs = {"chunksize": args.chunksize} if args.chunksize else {}
+    summary = run_batch(args.batch, args.out_dir, workers=args.workers,
+                        force=args.force_reprocess,
+                        earth_model=args.earth_model, video=args.video,
+                        fps=args.fps, speed=args.speed, report_dir=args.report,
+                        report_format=args.report_format, **kwargs)
+    print(f"\n{'=' * 60}")
+    print(f" Batch complete: {summary['ok']} ok, {summary['skipped']} skipped, "
+          f"{summary['failed']} failed")
+    print(f" {summary['rows']:,} rows in {summary['seconds']:.1f} s "
+          f"({summary['rows_per_s']:,} rows/s, {summary['files_per_s']} files/s)")
+    if args.report:
+        reports = summary["reports"]
+        print(f" Reports: {reports['ok']} ok, {reports['failed']} failed "
+              f"in {reports['seconds']:.1f} s -> {Path(args.report) / 'index.html'}")
+    print(f" Manifest: {Path(args.out_dir) / 'manifest.json'}")
+    print(f"{'=' * 60}\n")
+
+
+def run_pipeline(args):
+    if args.batch:
+        run_batch_command(args)
+        return
+
+    _default_fdr(args)
+    df = preprocess(args)
+    if df is None:
+        return
+    df = _select_phase(args, df)
+
+    # Visualizations
+    if args.report:
+        plot(args, df)
+    elif not args.skip_viz:
+        plot(args, df)
+        animate(args, df)
+    else:
+        print("[3/4] Skipping visualizations")
+
+    if args.video:
+        render_video(args, df)
+
+    # Export
+    export(args, df)
+
     print(f"\n{'=' * 60}")
     print(f" Pipeline complete!")
     print(f" Cleaned data: {args.clean}")
@@ -78,5 +447,27 @@ def main():
     print(f"{'=' * 60}\n")
 
 
+def run_preprocess(args):
+    df = preprocess(args)
+    if df is not None:
+        print(f"\n Cleaned data: {args.clean} ({len(df):,} data points)")
+        print(f" Cache: {_cache_path(args)}\n")
+
+
+def run_export(args):
+    if args.archive is None:
+        _default_fdr(args)
+    export(args)
+
+
+COMMAND_FUNCS = {
+    "run": run_pipeline,
+    "preprocess": run_preprocess,
+    "export": run_export,
+    "replay": replay,
+    "plot": plot,
+}
+
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -7,6 +7,23 @@ TEST_FILES = (
     "test_loader.py",
     "test_replay.py",
     "test_export_replay_fdr.py",
+    "test_cache.py",
+    "test_stream.py",
+    "test_batch.py",
+    "test_incremental.py",
+    "test_lod.py",
+    "test_render.py",
+    "test_profiling.py",
+    "test_fleet.py",
+    "test_fdr_binary.py",
+    "test_quality.py",
+    "test_derived.py",
+    "test_flight_index.py",
+    "test_archive.py",
+    "test_report.py",
+    "test_main.py",
+    "test_frame_ring.py",
+    "test_phases.py",
 )
 
 ROOT = Path(__file__).resolve().parent
@@ -0,0 +1,344 @@
+""" Compressed long-term archive of resampled flight data (.fda)
+
+Rows are stored in blocks of BLOCK_ROWS. Within a block every channel is
+encoded on its float64 bit patterns: XOR with the previous value
+(Gorilla-style), or the zigzagged first or second integer delta, chosen
+per block, then byte-shuffled so that the near-constant high bytes sit
+together, and deflated. Time is not stored when it is the uniform rate_hz grid that
+interpolate produces; it is rebuilt as start + i / rate_hz. Encoding is
+lossless.
+
+Layout (little-endian):
+  header   magic, version, flags, rate_hz, start time, rows, block rows,
+           column count, then each column name (u16 length + utf-8)
+  blocks   compressed column streams, block by block
+  index    per block and column: offset, compressed size, codec
+  trailer  offset of the index, magic
+
+The index lets a reader decode only the blocks covering a time range;
+blocks decode independently, in parallel threads (zlib releases the GIL).
+"""
+
+import os
+import struct
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+MAGIC = b"FDRA"
+VERSION = 1
+BLOCK_ROWS = 65536
+LEVEL = 6
+
+FLAG_IMPLICIT_TIME = 1
+
+CODEC_XOR = 0
+CODEC_DELTA = 1
+CODEC_DELTA2 = 2
+CODECS = (CODEC_XOR, CODEC_DELTA, CODEC_DELTA2)
+SAMPLE_WORDS = 4096  # codec trial size
+
+_HEADER = struct.Struct("<4sHHddQIH")
+_TRAILER = struct.Struct("<Q4s")
+INDEX_DTYPE = np.dtype([("offset", "<u8"), ("size", "<u4"), ("codec", "u1")])
+
+
+def _shuffle(words):
+    return words.view(np.uint8).reshape(-1, 8).T.tobytes()
+
+
+def _unshuffle(data, n):
+    return np.frombuffer(data, dtype=np.uint8).reshape(8, n).T.copy().view("<u8").ravel()
+
+
+def _zigzag(delta):
+    return ((delta << 1) ^ (delta >> 63)).view("<u8")
+
+
+def _unzigzag(words):
+    return (words >> 1).view("<i8") ^ -(words & 1).view("<i8")
+
+
+def _transform(bits, codec):
+    """ Bit patterns -> words to compress; integer arithmetic wraps, so
+    every transform is exactly invertible """
+
+    if codec == CODEC_XOR:
+        return bits ^ np.concatenate([np.zeros(1, "<u8"), bits[:-1]])
+    delta = np.diff(bits.view("<i8"), prepend=0)
+    if codec == CODEC_DELTA2:
+        delta = np.diff(delta, prepend=0)
+    return _zigzag(delta)
+
+
+def encode_column(values, level=LEVEL, codec=None):
+    """ (codec, compressed bytes) of one block of a float64 channel.
+
+    Unless given, the codec is XOR with the previous value, the delta or
+    the delta of the delta of the bit patterns, whichever compresses a
+    leading sample of the block best (smooth channels favour the deltas) """
+
+    bits = np.ascontiguousarray(values, dtype="<f8").view("<u8")
+    sample = bits[:SAMPLE_WORDS]
+    if codec is None:
+        codec = min(CODECS, key=lambda c: len(zlib.compress(
+            _shuffle(_transform(sample, c)), 1)))
+    return codec, zlib.compress(_shuffle(_transform(bits, codec)), level)
+
+
+def decode_column(codec, data, n):
+    words = _unshuffle(zlib.decompress(data), n)
+    if codec == CODEC_XOR:
+        bits = np.bitwise_xor.accumulate(words)
+    else:
+        delta = _unzigzag(words)
+        if codec == CODEC_DELTA2:
+            delta = np.cumsum(delta)
+        bits = np.cumsum(delta).view("<u8")
+    return bits.view("<f8")
+
+
+def _pack_header(flags, rate_hz, start, rows, block_rows, columns):
+    names = b"".join(struct.pack("<H", len(n.encode())) + n.encode() for n in columns)
+    return _HEADER.pack(MAGIC, VERSION, flags, rate_hz, start, rows,
+                        block_rows, len(columns)) + names
+
+
+def _grid(start, rate_hz, first, n):
+    # Same grid as np.arange(start, end, 1 / rate_hz) in interpolate
+    delta = (start + 1.0 / rate_hz) - start
+    return start + np.arange(first, first + n) * delta
+
+
+class ArchiveWriter:
+    """ Append cleaned DataFrames to a new .fda file; blocks are written as
+    they fill, and the index and final header on close.
+
+    Time is implicit if the first rows are on the rate_hz grid; later
+    rows must then stay on it. """
+
+    def __init__(self, path, rate_hz=30, columns=None, block_rows=BLOCK_ROWS,
+                 level=LEVEL, workers=None):
+        self.path = Path(path)
+        self.rate_hz = float(rate_hz)
+        self.columns = list(columns) if columns is not None else None
+        self.block_rows = block_rows
+        self.level = level
+        self.workers = workers or 1
+        self.rows = 0
+        self.start = None
+        self.implicit = None
+        self.index = []
+        self._pending = []
+        self._pending_rows = 0
+        self._tmp = Path(str(path) + ".tmp")
+        self._file = None
+
+    def _open(self, df):
+        if self.columns is None:
+            self.columns = list(df.columns)
+        time = df["Time"].to_numpy(dtype=np.float64)
+        self.start = float(time[0])
+        self.implicit = np.array_equal(time, _grid(self.start, self.rate_hz, 0, len(time)))
+        self.stored = [c for c in self.columns if not (self.implicit and c == "Time")]
+        self._file = open(self._tmp, "wb")
+        self._file.write(self._header(0))
+
+    def _header(self, rows):
+        flags = FLAG_IMPLICIT_TIME if self.implicit else 0
+        return _pack_header(flags, self.rate_hz, self.start, rows,
+                            self.block_rows, self.columns)
+
+    def append(self, df):
+        if len(df) == 0:
+            return
+        if self._file is None:
+            self._open(df)
+        elif self.implicit:
+            time = df["Time"].to_numpy(dtype=np.float64)
+            if not np.array_equal(time, _grid(self.start, self.rate_hz, self.rows, len(time))):
+                raise ValueError("Time left the rate_hz grid the archive was started on")
+
+        self._pending.append({c: df[c].to_numpy(dtype=np.float64) for c in self.stored})
+        self._pending_rows += len(df)
+        self.rows += len(df)
+        if self._pending_rows >= self.block_rows:
+            self._flush(final=False)
+
+    def _encode(self, block):
+        return [encode_column(block[c], self.level) for c in self.stored]
+
+    def _flush(self, final):
+        data = {c: np.concatenate([p[c] for p in self._pending]) for c in self.stored}
+        n = self._pending_rows
+        stop = n if final else n - n % self.block_rows
+        blocks = [{c: v[i:i + self.block_rows] for c, v in data.items()}
+                  for i in range(0, stop, self.block_rows)]
+
+        if self.workers > 1 and len(blocks) > 1:
+            with ThreadPoolExecutor(self.workers) as pool:
+                encoded = list(pool.map(self._encode, blocks))
+        else:
+            encoded = [self._encode(b) for b in blocks]
+        for streams in encoded:
+            entries = []
+            for codec, payload in streams:
+                entries.append((self._file.tell(), len(payload), codec))
+                self._file.write(payload)
+            self.index.append(entries)
+
+        self._pending = [{c: v[stop:] for c, v in data.items()}] if stop < n else []
+        self._pending_rows = n - stop
+
+    def close(self):
+        if self._file is None:
+            if self.columns is None:
+                raise ValueError("Nothing was written to the archive")
+            self.start, self.implicit, self.stored = 0.0, False, list(self.columns)
+            self._file = open(self._tmp, "wb")
+            self._file.write(self._header(0))
+        if self._pending_rows:
+            self._flush(final=True)
+
+        index_offset = self._file.tell()
+        index = np.array(self.index, dtype=INDEX_DTYPE).reshape(-1, len(self.stored))
+        self._file.write(index.tobytes())
+        self._file.write(_TRAILER.pack(index_offset, MAGIC))
+        self._file.seek(0)
+        self._file.write(self._header(self.rows))
+        self._file.close()
+        self._file = None
+        os.replace(self._tmp, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        elif self._file is not None:
+            self._file.close()
+            self._file = None
+            self._tmp.unlink(missing_ok=True)
+
+
+def write_archive(df, path, rate_hz=30, block_rows=BLOCK_ROWS, level=LEVEL, workers=None):
+    """ Write a cleaned DataFrame as a .fda archive; returns the path """
+
+    with ArchiveWriter(path, rate_hz, block_rows=block_rows, level=level,
+                       workers=workers) as writer:
+        writer.append(df)
+    return path
+
+
+class ArchiveReader:
+    """ Random access to a .fda archive by time range and column """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._data = np.memmap(path, dtype=np.uint8, mode="r")
+        head = bytes(self._data[:_HEADER.size])
+        magic, version, flags, rate_hz, start, rows, block_rows, n_columns = \
+            _HEADER.unpack(head) if len(head) == _HEADER.size else (None,) * 8
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a flight data archive")
+        if version > VERSION:
+            raise ValueError(f"{path} is archive version {version}; "
+                             f"this reader supports up to {VERSION}")
+
+        pos = _HEADER.size
+        self.columns = []
+        for _ in range(n_columns):
+            size, = struct.unpack_from("<H", self._data, pos)
+            self.columns.append(bytes(self._data[pos + 2:pos + 2 + size]).decode())
+            pos += 2 + size
+
+        self.rate_hz = rate_hz
+        self.start = start
+        self.rows = rows
+        self.block_rows = block_rows
+        self.implicit = bool(flags & FLAG_IMPLICIT_TIME)
+        self.stored = [c for c in self.columns if not (self.implicit and c == "Time")]
+
+        index_offset, magic = _TRAILER.unpack_from(self._data, len(self._data) - _TRAILER.size)
+        n_blocks = -(-rows // block_rows)
+        self.index = np.frombuffer(self._data, dtype=INDEX_DTYPE,
+                                   count=n_blocks * len(self.stored),
+                                   offset=index_offset).reshape(n_blocks, len(self.stored))
+
+    def __len__(self):
+        return self.rows
+
+    def _time_block(self, b):
+        n = min(self.block_rows, self.rows - b * self.block_rows)
+        return _grid(self.start, self.rate_hz, b * self.block_rows, n)
+
+    def _decode_block(self, b, columns):
+        n = min(self.block_rows, self.rows - b * self.block_rows)
+        out = {}
+        for c in columns:
+            if c == "Time" and self.implicit:
+                out[c] = self._time_block(b)
+                continue
+            offset, size, codec = self.index[b, self.stored.index(c)]
+            out[c] = decode_column(codec, self._data[offset:offset + size], n)
+        return out
+
+    def _row_range(self, t0, t1):
+        """ Rows with t0 <= Time <= t1 """
+
+        if self.rows == 0:
+            return 0, 0
+        if self.implicit:
+            step = (self.start + 1.0 / self.rate_hz) - self.start
+            lo = 0 if t0 is None else int(np.clip(np.floor((t0 - self.start) / step) - 1,
+                                                 0, self.rows))
+            hi = self.rows if t1 is None else int(np.clip(np.floor((t1 - self.start) / step) + 2,
+                                                          0, self.rows))
+            time = _grid(self.start, self.rate_hz, lo, max(hi - lo, 0))
+            return lo + int(np.searchsorted(time, t0, side="left") if t0 is not None else 0), \
+                lo + int(np.searchsorted(time, t1, side="right") if t1 is not None else len(time))
+        # Explicit time: decode the Time blocks (small next to all channels)
+        time = self.read(["Time"])["Time"].to_numpy()
+        lo = 0 if t0 is None else int(np.searchsorted(time, t0, side="left"))
+        hi = self.rows if t1 is None else int(np.searchsorted(time, t1, side="right"))
+        return lo, hi
+
+    def read(self, columns=None, t0=None, t1=None, workers=None):
+        """ DataFrame of the given columns (default all) between t0 and t1;
+        only the blocks covering that range are decoded, with `workers`
+        threads """
+
+        columns = self.columns if columns is None else list(columns)
+        unknown = set(columns) - set(self.columns)
+        if unknown:
+            raise KeyError(f"Missing column(s): {', '.join(sorted(unknown))}")
+
+        if t0 is None and t1 is None:
+            lo, hi = 0, self.rows
+        else:
+            lo, hi = self._row_range(t0, t1)
+        if hi <= lo:
+            return pd.DataFrame({c: np.empty(0) for c in columns})
+
+        b0, b1 = lo // self.block_rows, (hi - 1) // self.block_rows + 1
+        blocks = range(b0, b1)
+        if workers and workers > 1 and len(blocks) > 1:
+            with ThreadPoolExecutor(workers) as pool:
+                parts = list(pool.map(lambda b: self._decode_block(b, columns), blocks))
+        else:
+            parts = [self._decode_block(b, columns) for b in blocks]
+
+        skip = lo - b0 * self.block_rows
+        data = {c: np.concatenate([p[c] for p in parts])[skip:skip + hi - lo]
+                for c in columns}
+        return pd.DataFrame(data, copy=False)
+
+
+def read_archive(path, columns=None, t0=None, t1=None, workers=None):
+    """ Cleaned data (all or part of it) back from a .fda archive """
+
+    return ArchiveReader(path).read(columns, t0, t1, workers)
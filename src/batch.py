@@ -0,0 +1,198 @@
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+
+from src.export_replay_fdr import write_replay_fdr_chunks
+from src.loader import DEFAULT_CHUNKSIZE, interpolate_chunks, iter_csv_chunks
+from src.replay import compute_xyz
+
+MANIFEST_NAME = "manifest.json"
+
+
+def find_inputs(pattern):
+    """ Raw CSVs from a directory or a glob pattern, sorted """
+
+    path = Path(pattern)
+    if path.is_dir():
+        return sorted(path.glob("*.csv"))
+    return sorted(Path(p) for p in glob.glob(pattern, recursive=True))
+
+
+def batch_root(pattern):
+    """ Directory the inputs of a batch are named relative to: the
+    directory itself, or the part of a glob before its first wildcard """
+
+    path = Path(pattern)
+    if path.is_dir():
+        return path
+    parts = []
+    for part in path.parts[:-1]:
+        if any(c in part for c in "*?["):
+            break
+        parts.append(part)
+    return Path(*parts) if parts else Path(".")
+
+
+def output_path(input_path, out_dir, root=None):
+    """ .fdr path for an input: its path under root, mirrored under out_dir,
+    so same-named recordings in different directories never collide """
+
+    input_path = Path(input_path)
+    relative = input_path.relative_to(root) if root is not None else Path(input_path.name)
+    return Path(out_dir) / relative.with_suffix(".fdr")
+
+
+def video_path(fdr_path, video):
+    """ Video next to an .fdr; video is a suffix such as ".mp4" """
+    return Path(fdr_path).with_suffix(video)
+
+
+def _rendered(path):
+    """ A file a finished render leaves (a .png sequence starts at _00000) """
+    path = Path(path)
+    if path.suffix.lower() == ".png":
+        return path.with_name(path.stem + "_00000.png")
+    return path
+
+
+def is_up_to_date(input_path, *outputs):
+    """ Every output exists and is newer than its raw input """
+
+    try:
+        mtime = os.stat(input_path).st_mtime_ns
+        return all(os.stat(path).st_mtime_ns >= mtime for path in outputs)
+    except FileNotFoundError:
+        return False
+
+
+def process_flight(input_path, fdr_path, rate_hz=30, chunksize=DEFAULT_CHUNKSIZE,
+                   earth_model="sphere", video=None, fps=30, speed=1.0):
+    """ Raw CSV to .fdr in bounded memory; returns a manifest record.
+    With video (a suffix such as ".mp4") a replay video is rendered next
+    to the .fdr, before the .fdr gets its final name. A failed flight
+    leaves no .fdr (not even an older one), so the next run redoes it.
+    Errors are recorded instead of raised so one bad file can't stop a
+    run """
+
+    start = time.perf_counter()
+    record = {"input": str(input_path), "output": str(fdr_path)}
+    tmp_path = Path(str(fdr_path) + ".tmp")
+    video_file = video_path(fdr_path, video) if video else None
+    track = []  # (Time, X, Y) per part, kept only for the video
+
+    def keep_track(parts):
+        for part in parts:
+            track.append(part[["Time", "X", "Y"]].to_numpy())
+            yield part
+
+    try:
+        Path(fdr_path).parent.mkdir(parents=True, exist_ok=True)
+        chunks = iter_csv_chunks(input_path, chunksize)
+        parts = (compute_xyz(part, model=earth_model)
+                 for part in interpolate_chunks(chunks, rate_hz, chunksize))
+        if video:
+            parts = keep_track(parts)
+        rows = write_replay_fdr_chunks(parts, tmp_path)
+        if video and track:
+            from src.render import render_replay  # matplotlib, only for videos
+
+            t, x, y = np.concatenate(track).T
+            render_replay(t, x, y, video_file, fps=fps, speed=speed)
+            record["video"] = str(video_file)
+        # Only complete outputs get the final name (and so count as up to date)
+        os.replace(tmp_path, fdr_path)
+        record.update(status="ok", rows=rows)
+    except Exception as e:
+        tmp_path.unlink(missing_ok=True)
+        Path(fdr_path).unlink(missing_ok=True)
+        if video_file is not None and video_file.is_file():
+            video_file.unlink()  # possibly partial
+        record.update(status="failed", rows=0, error=f"{type(e).__name__}: {e}")
+
+    record["seconds"] = round(time.perf_counter() - start, 3)
+    record["bytes_in"] = os.path.getsize(input_path) if Path(input_path).exists() else 0
+    return record
+
+
+def run_batch(pattern, out_dir, workers=None, rate_hz=30,
+              chunksize=DEFAULT_CHUNKSIZE, force=False, max_tasks_per_child=50,
+              earth_model="sphere", video=None, fps=30, speed=1.0,
+              report_dir=None, report_format="png"):
+    """ Process every matching raw CSV across a process pool and write a
+    per-file manifest next to the outputs. With report_dir, a static
+    report of every processed flight is rendered there afterwards """
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    if video:
+        video_path("flight.fdr", video)  # a bad suffix fails here, not in every worker
+    inputs = find_inputs(pattern)
+    root = batch_root(pattern)
+    start = time.perf_counter()
+
+    records = []
+    todo = []
+    for path in inputs:
+        fdr_path = output_path(path, out_dir, root)
+        outputs = [fdr_path] + ([_rendered(video_path(fdr_path, video))] if video else [])
+        if not force and is_up_to_date(path, *outputs):
+            records.append({"input": str(path), "output": str(fdr_path),
+                            "status": "skipped", "rows": 0, "seconds": 0.0})
+        else:
+            todo.append((path, fdr_path))
+
+    if todo:
+        # Recycling workers keeps long runs from growing in memory
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count(),
+                                 max_tasks_per_child=max_tasks_per_child) as pool:
+            futures = {pool.submit(process_flight, path, fdr_path, rate_hz,
+                                   chunksize, earth_model, video, fps,
+                                   speed): (path, fdr_path)
+                       for path, fdr_path in todo}
+            for future in as_completed(futures):
+                path, fdr_path = futures[future]
+                try:
+                    record = future.result()
+                except Exception as e:  # worker died (e.g. killed, out of memory)
+                    record = {"input": str(path), "output": str(fdr_path),
+                              "status": "failed", "rows": 0, "seconds": 0.0,
+                              "error": f"{type(e).__name__}: {e}"}
+                if record["status"] == "failed":
+                    print(f"  FAILED {path}: {record['error']}")
+                records.append(record)
+
+    elapsed = time.perf_counter() - start
+    records.sort(key=lambda r: r["input"])
+    summary = summarize(records, elapsed)
+    if report_dir is not None:
+        from src.report import write_reports  # matplotlib, only for reports
+
+        flights = {Path(r["output"]).relative_to(out_dir).with_suffix("").as_posix():
+                   r["output"] for r in records if r["status"] != "failed"}
+        summary["reports"] = write_reports(flights, report_dir, fmt=report_format,
+                                           workers=workers, earth_model=earth_model)
+    with open(out_dir / MANIFEST_NAME, "w") as f:
+        json.dump({"summary": summary, "files": records}, f, indent=2)
+
+    return summary
+
+
+def summarize(records, elapsed):
+    counts = {status: sum(r["status"] == status for r in records)
+              for status in ("ok", "skipped", "failed")}
+    rows = sum(r["rows"] for r in records)
+    mb_in = sum(r.get("bytes_in", 0) for r in records if r["status"] == "ok") / 1e6
+    return {
+        "files": len(records),
+        **counts,
+        "rows": rows,
+        "seconds": round(elapsed, 3),
+        "rows_per_s": round(rows / elapsed) if elapsed > 0 else 0,
+        "files_per_s": round(counts["ok"] / elapsed, 2) if elapsed > 0 else 0,
+        "mb_in_per_s": round(mb_in / elapsed, 2) if elapsed > 0 else 0,
+    }
@@ -0,0 +1,271 @@
+""" Binary columnar cache for cleaned flight data
+
+A cache is a directory holding one raw little-endian file per column and a
+small header.json with the schema, row count, rate_hz and a fingerprint of
+the raw input it was built from. Columns are memory-mapped on read, so
+opening a cache costs the same no matter how long the flight is.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+CACHE_VERSION = 1
+HEADER_NAME = "header.json"
+
+
+def _file_hash(path, block_size=1 << 20):
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def source_fingerprint(path):
+    """ Size, mtime and content hash of the raw input file """
+
+    st = os.stat(path)
+    return {
+        "path": str(Path(path).resolve()),
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "blake2b": _file_hash(path),
+    }
+
+
+def read_header(path):
+    """ Return the cache header, or None if there is no complete cache """
+
+    try:
+        with open(Path(path) / HEADER_NAME) as f:
+            header = json.load(f)
+    except (FileNotFoundError, NotADirectoryError, json.JSONDecodeError):
+        return None
+
+    if header.get("version") != CACHE_VERSION:
+        return None
+    return header
+
+
+def cache_is_fresh(path, source, rate_hz=None, partial=False):
+    """ Check whether the cache was built from the current raw input. A
+    cache an incremental run left without the recording's tail (source
+    "final" false) only counts with partial=True """
+
+    header = read_header(path)
+    if header is None or header.get("source") is None:
+        return False
+    if rate_hz is not None and header.get("rate_hz") != rate_hz:
+        return False
+
+    saved = header["source"]
+    if not (partial or saved.get("final", True)):
+        return False
+    st = os.stat(source)
+    if saved["size"] != st.st_size:
+        return False
+    if saved["mtime_ns"] == st.st_mtime_ns:
+        return True
+
+    # Touched or copied but possibly unchanged: fall back to the content hash
+    return saved["blake2b"] == _file_hash(source)
+
+
+def _write_header(path, header):
+    tmp = Path(path) / (HEADER_NAME + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(header, f, indent=2)
+    os.replace(tmp, Path(path) / HEADER_NAME)
+
+
+class CacheWriter:
+    """ Append DataFrame blocks to a column cache, header written on close """
+
+    def __init__(self, path, rate_hz=None, source=None, attrs=None,
+                 append_rows=None):
+        self.path = Path(path)
+        self.rate_hz = rate_hz
+        self.source = source
+        self.attrs = attrs or {}
+        self.columns = None
+        self.rows = 0
+        self._files = []
+        self._append = False
+        self._dropped = []
+
+        header = read_header(self.path) if append_rows is not None else None
+        if header is not None and header["columns"]:
+            self._open_for_append(header, append_rows)
+            return
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        # A cache without a header is never considered valid
+        (self.path / HEADER_NAME).unlink(missing_ok=True)
+
+    def _open_for_append(self, header, rows):
+        """ Continue an existing cache after its first `rows` rows; the old
+        header stays valid for readers until close() commits the new one """
+
+        if rows > header["rows"]:
+            raise ValueError(f"Cache has {header['rows']} rows, cannot append after {rows}")
+        self._append = True
+        self.columns = header["columns"]
+        self.rows = rows
+        self.attrs = {**header.get("attrs", {}), **self.attrs}
+        for col in self.columns:
+            f = open(self.path / col["file"], "r+b")
+            f.truncate(rows * np.dtype(col["dtype"]).itemsize)
+            f.seek(0, os.SEEK_END)
+            self._files.append(f)
+
+    def _drop_absent(self, names):
+        """ Appending: columns the new blocks do not carry (derived channels
+        added with add_columns) cannot be extended, so they are dropped
+        along with their signatures and are derived again when needed """
+
+        kept = []
+        for col, f in zip(self.columns, self._files):
+            if col["name"] in names:
+                kept.append((col, f))
+            else:
+                f.close()
+                self._dropped.append(col["file"])
+        self.columns = [col for col, _ in kept]
+        self._files = [f for _, f in kept]
+        if "derived" in self.attrs:
+            self.attrs["derived"] = {name: sig for name, sig in self.attrs["derived"].items()
+                                     if name in names}
+
+    def append(self, df):
+        if self._append and not self._dropped and len(self.columns) > len(df.columns):
+            self._drop_absent(set(df.columns))
+        if self.columns is None:
+            self.columns = []
+            for i, col in enumerate(df.columns):
+                dtype = np.dtype(df[col].dtype)
+                if dtype.kind not in "biuf":
+                    raise ValueError(f"Column {col!r} is not numeric ({dtype})")
+                name = f"{i}.bin"
+                self.columns.append({
+                    "name": col,
+                    "dtype": dtype.newbyteorder("<").str,
+                    "file": name,
+                })
+                # Written aside and renamed on close, so an open memory
+                # map of the previous cache is never truncated under a reader
+                self._files.append(open(self.path / (name + ".tmp"), "wb"))
+        elif list(df.columns) != [c["name"] for c in self.columns]:
+            raise ValueError("Column layout changed between appended blocks")
+
+        for col, f in zip(self.columns, self._files):
+            values = np.ascontiguousarray(df[col["name"]].values,
+                                          dtype=col["dtype"])
+            f.write(values.tobytes())
+        self.rows += len(df)
+
+    def close(self):
+        for f in self._files:
+            f.close()
+        self._files = []
+
+        if not self._append:
+            for col in self.columns or []:
+                os.replace(self.path / (col["file"] + ".tmp"),
+                           self.path / col["file"])
+        header = {
+            "version": CACHE_VERSION,
+            "rows": self.rows,
+            "rate_hz": self.rate_hz,
+            "columns": self.columns or [],
+            "source": self.source,
+        }
+        if self.attrs:
+            header["attrs"] = self.attrs
+        _write_header(self.path, header)
+        for file in self._dropped:
+            (self.path / file).unlink(missing_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            for f in self._files:
+                f.close()
+
+
+def write_cache(df, path, rate_hz=None, source=None):
+    """ Write a DataFrame to a column cache in one go """
+
+    with CacheWriter(path, rate_hz=rate_hz, source=source) as writer:
+        writer.append(df)
+    return path
+
+
+def add_columns(path, columns, attrs=None):
+    """ Add (or replace) columns in an existing cache without rewriting it.
+    attrs are merged into the header's free-form "attrs" mapping """
+
+    header = read_header(path)
+    if header is None:
+        raise FileNotFoundError(f"No valid flight data cache at {path}")
+
+    existing = {c["name"]: c for c in header["columns"]}
+    for name, values in columns.items():
+        values = np.asarray(values)
+        if len(values) != header["rows"]:
+            raise ValueError(f"Column {name!r} has {len(values)} rows, "
+                             f"cache has {header['rows']}")
+        if values.dtype.kind not in "biuf":
+            raise ValueError(f"Column {name!r} is not numeric ({values.dtype})")
+
+        dtype = values.dtype.newbyteorder("<").str
+        if name in existing:
+            existing[name]["dtype"] = dtype
+            file = existing[name]["file"]
+        else:
+            file = f"{len(header['columns'])}.bin"
+            header["columns"].append({"name": name, "dtype": dtype,
+                                      "file": file})
+        tmp = Path(path) / (file + ".tmp")
+        np.ascontiguousarray(values, dtype=dtype).tofile(tmp)
+        os.replace(tmp, Path(path) / file)
+
+    if attrs:
+        header.setdefault("attrs", {}).update(attrs)
+    _write_header(path, header)
+    return path
+
+
+def open_columns(path, mode="r"):
+    """ Memory-map every column of a cache; returns {name: array}.
+    Nothing is read from disk until the arrays are indexed """
+
+    header = read_header(path)
+    if header is None:
+        raise FileNotFoundError(f"No valid flight data cache at {path}")
+
+    rows = header["rows"]
+    data = {}
+    for col in header["columns"]:
+        if rows == 0:
+            data[col["name"]] = np.empty(0, dtype=col["dtype"])
+        else:
+            data[col["name"]] = np.memmap(Path(path) / col["file"],
+                                          dtype=col["dtype"], mode=mode,
+                                          shape=(rows,))
+    return data
+
+
+def read_cache(path):
+    """ Open a column cache as a DataFrame backed by memory-mapped columns """
+
+    # Copy-on-write: callers may modify the frame without touching disk
+    return pd.DataFrame(open_columns(path, mode="c"), copy=False)
@@ -0,0 +1,241 @@
+""" Derived flight parameters, computed lazily and cached
+
+Each derived channel is registered with the channels it is computed from
+and any options it depends on (e.g. the earth model for X/Y/Z).
+DerivedChannels computes a channel the first time it is asked for, over
+the full arrays, and keeps it. When backed by a column cache, computed
+channels are added to the cache with a signature of their inputs, so a
+later run memory-maps them instead; the signature changes, and the
+channel is recomputed, when an input column is rewritten, the parameter's
+version is bumped or one of its options changes.
+"""
+
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.cache import add_columns, open_columns, read_header
+from src.profiling import stage
+from src.replay import R_EARTH, latlon_to_xyz
+
+G0 = 9.80665  # standard gravity, m/s^2
+
+DEFAULT_OPTIONS = {"earth_model": "sphere"}
+
+
+@dataclass(frozen=True)
+class DerivedParam:
+    outputs: tuple
+    inputs: tuple
+    func: object
+    options: tuple = ()
+    version: int = 1
+
+
+DERIVED = {}  # channel name -> DerivedParam producing it
+
+
+def derived(*outputs, inputs, options=(), version=1):
+    """ Register func(*input arrays, **options) as producing `outputs`
+    (one array, or a tuple of arrays for several outputs) """
+
+    def register(func):
+        param = DerivedParam(tuple(outputs), tuple(inputs), func,
+                             tuple(options), version)
+        for name in outputs:
+            DERIVED[name] = param
+        return func
+    return register
+
+
+def _rate(values, time):
+    """ d(values)/dt, central differences inside, one-sided at the ends """
+    if len(values) < 2:
+        return np.zeros(len(values))
+    return np.gradient(values, time)
+
+
+@derived("X", "Y", "Z", inputs=("Latitude", "Longitude", "Altitude"),
+         options=("earth_model",))
+def _xyz(lat, lon, alt, earth_model="sphere"):
+    return latlon_to_xyz(lat, lon, alt, model=earth_model)
+
+
+@derived("GroundSpeed", "Track", inputs=("Time", "Latitude", "Longitude"))
+def _ground_velocity(time, lat, lon):
+    """ Speed over ground (m/s) and track angle (deg true, 0-360) """
+    lat = np.radians(lat)
+    north = R_EARTH * _rate(lat, time)
+    east = R_EARTH * np.cos(lat) * _rate(np.unwrap(np.radians(lon)), time)
+    return np.hypot(north, east), np.degrees(np.arctan2(east, north)) % 360
+
+
+@derived("VerticalSpeed", inputs=("Time", "Altitude"))
+def _vertical_speed(time, alt):
+    """ m/s, positive climbing """
+    return _rate(alt, time)
+
+
+@derived("TurnRate", inputs=("Time", "Yaw"))
+def _turn_rate(time, yaw):
+    """ deg/s, positive turning right; heading is unwrapped through north """
+    return _rate(np.unwrap(yaw, period=360), time)
+
+
+@derived("LoadFactor", inputs=("Time", "GroundSpeed", "TurnRate", "VerticalSpeed"))
+def _load_factor(time, speed, turn_rate, vertical_speed):
+    """ g from the centripetal and vertical accelerations of the flight
+    path (1 in steady level flight, 1/cos(bank) in a coordinated turn) """
+    lateral = speed * np.radians(turn_rate)
+    vertical = _rate(vertical_speed, time) + G0
+    return np.hypot(lateral, vertical) / G0
+
+
+@derived("Distance", inputs=("Latitude", "Longitude"))
+def _distance(lat, lon):
+    """ Great-circle distance flown since the first sample, m """
+    lat = np.radians(lat)
+    lon = np.radians(lon)
+    h = (np.sin(np.diff(lat) / 2) ** 2
+         + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(np.diff(lon) / 2) ** 2)
+    legs = 2 * R_EARTH * np.arcsin(np.sqrt(np.minimum(h, 1.0)))
+    return np.concatenate([[0.0], np.cumsum(legs)])
+
+
+def _digest(payload):
+    text = json.dumps(payload, sort_keys=True)
+    return hashlib.blake2b(text.encode(), digest_size=12).hexdigest()
+
+
+class DerivedChannels:
+    """ Base columns plus lazily computed derived ones.
+
+    Indexing returns an array: a base column as given, or a derived
+    channel, computed (with whatever it depends on) on first access.
+    Only the channels actually asked for are ever computed. """
+
+    def __init__(self, columns, cache_path=None, **options):
+        unknown = set(options) - set(DEFAULT_OPTIONS)
+        if unknown:
+            raise TypeError(f"Unknown option(s): {', '.join(sorted(unknown))}")
+        self.base = dict(columns)
+        self.options = {**DEFAULT_OPTIONS, **options}
+        self.cache_path = Path(cache_path) if cache_path is not None else None
+        self._values = {}
+        self._stored = {}   # cached derived column -> its saved signature
+        self._columns = {}  # memory-mapped cache columns
+        self._files = {}
+        self._base_sigs = {}
+
+    @classmethod
+    def from_df(cls, df, **options):
+        """ Every column of df is taken as a base column """
+        return cls({name: df[name].to_numpy() for name in df.columns}, **options)
+
+    @classmethod
+    def from_cache(cls, path, **options):
+        """ Memory-mapped columns of a cache; derived channels found there
+        are reused while their signature matches, new ones are added """
+
+        header = read_header(path)
+        if header is None:
+            raise FileNotFoundError(f"No valid flight data cache at {path}")
+        columns = open_columns(path, mode="c")
+        stored = header.get("attrs", {}).get("derived", {})
+        channels = cls({name: values for name, values in columns.items()
+                        if name not in DERIVED}, cache_path=path, **options)
+        channels._stored = {name: stored[name] for name in columns
+                            if name in DERIVED and name in stored}
+        channels._columns = columns
+        channels._files = {c["name"]: c["file"] for c in header["columns"]}
+        return channels
+
+    def __len__(self):
+        return len(next(iter(self.base.values()), ()))
+
+    def __contains__(self, name):
+        return name in self.base or self.available(name)
+
+    def available(self, name):
+        """ Whether name is a base column or derivable from them """
+        if name in self.base:
+            return True
+        param = DERIVED.get(name)
+        return param is not None and all(self.available(i) for i in param.inputs)
+
+    @property
+    def columns(self):
+        return list(self.base) + [n for n in DERIVED
+                                  if n not in self.base and self.available(n)]
+
+    def _base_signature(self, name):
+        if name not in self._base_sigs:
+            if self.cache_path is None:
+                sig = name
+            else:
+                # Rewriting a column replaces its file
+                st = os.stat(self.cache_path / self._files[name])
+                sig = f"{name}:{st.st_size}:{st.st_mtime_ns}:{st.st_ino}"
+            self._base_sigs[name] = sig
+        return self._base_sigs[name]
+
+    def signature(self, name):
+        """ Hash of a channel's definition, options and input signatures """
+
+        if name in self.base:
+            return self._base_signature(name)
+        param = DERIVED[name]
+        return _digest({
+            "outputs": param.outputs,
+            "version": param.version,
+            "options": {k: self.options[k] for k in param.options},
+            "inputs": [self.signature(i) for i in param.inputs],
+        })
+
+    def is_cached(self, name):
+        """ Whether a derived channel can be read from the cache as is """
+        return (name in self._stored
+                and self._stored[name] == self.signature(name))
+
+    def __getitem__(self, name):
+        if name in self.base:
+            return self.base[name]
+        if name in self._values:
+            return self._values[name]
+        if not self.available(name):
+            raise KeyError(f"Missing column: {name}")
+
+        param = DERIVED[name]
+        if all(self.is_cached(out) for out in param.outputs):
+            for out in param.outputs:
+                self._values[out] = self._columns[out]
+        else:
+            self._compute(param)
+        return self._values[name]
+
+    def _compute(self, param):
+        args = [np.asarray(self[i], dtype=np.float64) for i in param.inputs]
+        options = {k: self.options[k] for k in param.options}
+        with stage("derive", rows=len(self)):
+            result = param.func(*args, **options)
+        if len(param.outputs) == 1:
+            result = (result,)
+        values = dict(zip(param.outputs, result))
+        self._values.update(values)
+
+        if self.cache_path is not None:
+            sig = self.signature(param.outputs[0])
+            self._stored.update({out: sig for out in param.outputs})
+            with stage("write_cache", rows=len(self)):
+                add_columns(self.cache_path, values,
+                            attrs={"derived": dict(self._stored)})
+
+    def frame(self, names=None):
+        """ DataFrame of the given channels (default: the base columns) """
+        names = list(self.base) if names is None else list(names)
+        return pd.DataFrame({name: self[name] for name in names}, copy=False)
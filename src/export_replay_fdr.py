@@ -1,25 +1,157 @@
+from concurrent.futures import ThreadPoolExecutor
 
-def write_replay_fdr(df, path):
-    """ Custom .fdr file format """
+import numpy as np
 
+from src.profiling import profiled
+
+FDR_HEADER = [
+    "A",
+    "1000 Version",
+    "FDR Created by Flight Data Replay Project",
+    "I",
+    "Time,Longitude,Latitude,Altitude,Roll,Pitch,Yaw",
+    "DATA"
+]
+
+FDR_COLUMNS = ["Time", "Longitude", "Latitude", "Altitude",
+               "Roll", "Pitch", "Yaw"]
+
+# Decimal places per column: time 3, lon/lat 6, the rest 2
+FDR_PRECISION = [3, 6, 6, 2, 2, 2, 2]
+FDR_ROW_FORMAT = ",".join(f"%.{p}f" for p in FDR_PRECISION) + "\n"
+
+BLOCK_ROWS = 65536
+
+_PAD = 0
+_MAX_WIDTH = 32
+_MAX_EXACT = 2.0 ** 52
+
+
+def _format_column(values, precision):
+    """ Fixed-point text of one column as a right-aligned, NUL-padded
+    byte matrix, or None if the column needs the slow path """
+
+    n = len(values)
+    scaled = np.abs(values) * 10.0 ** precision
+    with np.errstate(invalid="ignore"):
+        rounded = np.rint(scaled)
+        # Values whose rounding could differ from the exact decimal result
+        # (near a half, non-finite or too large) are formatted by Python
+        slow = ~(np.abs(np.abs(scaled - rounded) - 0.5) > 2 * np.spacing(scaled))
+        slow |= ~(scaled < _MAX_EXACT)
+    k = np.where(slow, 0, rounded).astype(np.int64)
+    slow_idx = np.flatnonzero(slow)
+    slow_text = [(f"%.{precision}f" % values[i]).encode() for i in slow_idx]
+
+    n_digits = 1
+    rest = k // 10 ** precision
+    while rest.any():
+        rest //= 10
+        n_digits += 1
+    width = max([n_digits + precision + 2] + [len(s) for s in slow_text])
+    if width > _MAX_WIDTH:
+        return None
+
+    out = np.full((n, width), _PAD, dtype=np.uint8)
+    for j in range(precision):
+        k, digit = np.divmod(k, 10)
+        out[:, width - 1 - j] = 48 + digit
+    out[:, width - 1 - precision] = ord(".")
+
+    sign_col = np.full(n, width - 2 - precision)
+    for j in range(n_digits):
+        col = width - 2 - precision - j
+        keep = k > 0
+        if j == 0:
+            keep[:] = True
+        k, digit = np.divmod(k, 10)
+        out[:, col] = np.where(keep, 48 + digit, _PAD)
+        sign_col -= keep
+
+    neg = np.flatnonzero(np.signbit(values) & ~slow)
+    out[neg, sign_col[neg]] = ord("-")
+
+    for i, text in zip(slow_idx, slow_text):
+        out[i] = _PAD
+        out[i, width - len(text):] = np.frombuffer(text, dtype=np.uint8)
+    return out
+
+
+def format_fdr_rows(values):
+    """ Format an (n, 7) float array into FDR data lines """
+
+    columns = [_format_column(values[:, i], p)
+               for i, p in enumerate(FDR_PRECISION)]
+    if any(c is None for c in columns):
+        return (FDR_ROW_FORMAT * len(values)) % tuple(values.ravel().tolist())
+
+    # Lay the columns out side by side with separators, then squeeze out
+    # the padding to get the variable-width text
+    seps = [np.full((len(values), 1), ord(","), dtype=np.uint8)] * 6
+    seps.append(np.full((len(values), 1), ord("\n"), dtype=np.uint8))
+    rows = np.hstack([part for pair in zip(columns, seps) for part in pair])
+    flat = rows.ravel()
+    return flat[flat != _PAD].tobytes().decode("ascii")
+
+
+def _export_frame(df):
+    return df.rename(columns={
+        "Roll (deg)": "Roll",
+        "Pitch (deg)": "Pitch",
+        "Yaw (deg)": "Yaw"
+    })[FDR_COLUMNS]
+
+
+def _write_rows(f, df, block_rows=BLOCK_ROWS, workers=None):
+    df_export = _export_frame(df)
+    starts = range(0, len(df_export), block_rows)
+
+    def block(start):
+        return df_export.iloc[start:start + block_rows].to_numpy(dtype=np.float64)
+
+    if not workers or workers < 2:
+        for start in starts:
+            f.write(format_fdr_rows(block(start)))
+        return
+
+    with ThreadPoolExecutor(workers) as pool:
+        # A bounded window of blocks in flight keeps memory flat
+        for i in range(0, len(starts), 2 * workers):
+            window = [block(s) for s in starts[i:i + 2 * workers]]
+            for text in pool.map(format_fdr_rows, window):
+                f.write(text)
+
+
+@profiled("write_replay_fdr")
+def write_replay_fdr(df, path, block_rows=BLOCK_ROWS, workers=None):
+    """ Custom .fdr file format. Rows are formatted a block at a time;
+    with workers > 1, blocks are formatted on a thread pool (the numpy
+    work releases the GIL) and still written in order """
+
+    with open(path, "w") as f:
+        f.write("\n".join(FDR_HEADER) + "\n")
+        _write_rows(f, df, block_rows, workers)
+
+
+def write_replay_fdr_chunks(chunks, path):
+    """ Same .fdr file as write_replay_fdr, from an iterator of DataFrame
+    chunks, so a flight never has to be held in memory at once """
+
+    rows = 0
     with open(path, "w") as f:
-        f.write("\n".join([
-            "A",
-            "1000 Version",
-            "FDR Created by Flight Data Replay Project",
-            "I",
-            "Time,Longitude,Latitude,Altitude,Roll,Pitch,Yaw",
-            "DATA"
-        ]) + "\n")
-        
-        df_export = df.rename(columns={
-            "Roll (deg)": "Roll",
-            "Pitch (deg)": "Pitch", 
-            "Yaw (deg)": "Yaw"
-        })
-
-        for row in df_export.itertuples():
-            f.write(
-                f"{row.Time:.3f},{row.Longitude:.6f},{row.Latitude:.6f},"
-                f"{row.Altitude:.2f},{row.Roll:.2f},{row.Pitch:.2f},{row.Yaw:.2f}\n"
-            )
\ No newline at end of file
+        f.write("\n".join(FDR_HEADER) + "\n")
+        for df in chunks:
+            _write_rows(f, df)
+            rows += len(df)
+    return rows
+
+
+def append_replay_fdr(df, path):
+    """ Append rows to a .fdr file, writing the header if it is new;
+    returns the file size afterwards """
+
+    with open(path, "a") as f:
+        if f.tell() == 0:
+            f.write("\n".join(FDR_HEADER) + "\n")
+        _write_rows(f, df)
+        return f.tell()
@@ -0,0 +1,161 @@
+import os
+import struct
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.export_replay_fdr import FDR_COLUMNS, _export_frame
+
+# Layout of a binary .fdrb file (all little-endian):
+#   header        magic, version, column count, record count, record size,
+#                 offset of the first record
+#   column table  per column: name, numpy dtype string, offset in record
+#   padding       up to a DATA_ALIGN boundary
+#   records       record count x record size bytes, fixed layout
+MAGIC = b"FDRB"
+VERSION = 1
+DATA_ALIGN = 64
+NAME_BYTES = 32  # UTF-8 bytes per column name
+
+_HEADER = struct.Struct("<4sHHQII")
+_COLUMN = struct.Struct(f"<{NAME_BYTES}s8sI")
+
+
+def record_dtype(columns=FDR_COLUMNS):
+    for name in columns:
+        if len(name.encode()) > NAME_BYTES:
+            raise ValueError(f"Column name {name!r} is longer than {NAME_BYTES} bytes; "
+                             f"the .fdrb header cannot store it")
+    return np.dtype([(name, "<f8") for name in columns])
+
+
+def _pack_header(dtype, n_records):
+    table = b"".join(
+        _COLUMN.pack(name.encode(), dtype.fields[name][0].str.encode(),
+                     dtype.fields[name][1])
+        for name in dtype.names)
+    size = _HEADER.size + len(table)
+    data_offset = -(-size // DATA_ALIGN) * DATA_ALIGN
+    header = _HEADER.pack(MAGIC, VERSION, len(dtype.names), n_records,
+                          dtype.itemsize, data_offset)
+    return (header + table).ljust(data_offset, b"\0")
+
+
+def read_binary_header(path):
+    """ (record dtype, record count, data offset) of a .fdrb file """
+
+    with open(path, "rb") as f:
+        head = f.read(_HEADER.size)
+        if len(head) < _HEADER.size or head[:4] != MAGIC:
+            raise ValueError(f"{path} is not a binary FDR file")
+        _, version, n_columns, n_records, record_size, data_offset = _HEADER.unpack(head)
+        if version > VERSION:
+            raise ValueError(f"{path} is binary FDR version {version}; "
+                             f"this reader supports up to {VERSION}")
+        table = f.read(n_columns * _COLUMN.size)
+
+    names, formats, offsets = [], [], []
+    for i in range(n_columns):
+        name, fmt, offset = _COLUMN.unpack_from(table, i * _COLUMN.size)
+        names.append(name.rstrip(b"\0").decode())
+        formats.append(fmt.rstrip(b"\0").decode())
+        offsets.append(offset)
+    dtype = np.dtype({"names": names, "formats": formats,
+                      "offsets": offsets, "itemsize": record_size})
+    return dtype, n_records, data_offset
+
+
+class BinaryFDRWriter:
+    """ Append DataFrames to a new .fdrb file; the record count in the
+    header is filled in and the file moved into place on close """
+
+    def __init__(self, path, columns=FDR_COLUMNS):
+        self.path = Path(path)
+        self.columns = list(columns)
+        self.dtype = record_dtype(self.columns)
+        self.rows = 0
+        self._tmp = Path(str(path) + ".tmp")
+        self._file = open(self._tmp, "wb")
+        self._file.write(_pack_header(self.dtype, 0))
+
+    def append(self, df):
+        fdr = _export_frame(df)
+        records = np.empty(len(df), dtype=self.dtype)
+        for name in self.columns:
+            source = fdr if name in FDR_COLUMNS else df
+            records[name] = source[name].to_numpy(dtype=np.float64)
+        self._file.write(records.tobytes())
+        self.rows += len(records)
+
+    def close(self):
+        if self._file is None:
+            return
+        self._file.seek(0)
+        self._file.write(_pack_header(self.dtype, self.rows))
+        self._file.close()
+        self._file = None
+        os.replace(self._tmp, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+            self._file = None
+            self._tmp.unlink(missing_ok=True)
+
+
+def write_binary_fdr(df, path, columns=FDR_COLUMNS):
+    """ Binary counterpart of write_replay_fdr """
+
+    with BinaryFDRWriter(path, columns) as writer:
+        writer.append(df)
+    return path
+
+
+def open_binary_fdr(path):
+    """ The records of a .fdrb file as a read-only memory-mapped structured
+    array; nothing is read until a record is accessed """
+
+    dtype, n_records, data_offset = read_binary_header(path)
+    if n_records == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", offset=data_offset,
+                     shape=(n_records,))
+
+
+def _text_layout(path):
+    """ Rows to skip before the data of a text .fdr, and its column names """
+
+    with open(path) as f:
+        lines = []
+        for line in f:
+            line = line.strip()
+            if line == "DATA":
+                names = lines[-1].split(",") if lines and "," in lines[-1] else FDR_COLUMNS
+                return len(lines) + 1, names
+            lines.append(line)
+    raise ValueError(f"{path} has no DATA line; not a text .fdr file")
+
+
+def read_text_fdr(path, chunksize=None):
+    """ Text .fdr rows as a float64 DataFrame (an iterator of them with
+    chunksize), parsed by the pandas C reader """
+
+    skip, names = _text_layout(path)
+    return pd.read_csv(path, skiprows=skip, header=None, names=names,
+                       dtype=np.float64, chunksize=chunksize)
+
+
+def convert_text_fdr(text_path, binary_path, chunksize=1_000_000):
+    """ Convert a text .fdr to .fdrb in bounded memory; returns the rows """
+
+    with BinaryFDRWriter(binary_path) as writer, \
+            read_text_fdr(text_path, chunksize=chunksize) as chunks:
+        for chunk in chunks:
+            writer.append(chunk)
+    return writer.rows
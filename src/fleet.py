@@ -0,0 +1,149 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from src.loader import ResamplePlan, resample_columns
+from src.replay import FDRFrame, FRAME_COLUMNS, FrameStore, TimeIndex
+
+CHANNELS = [name for name in FRAME_COLUMNS if name != "time"]
+
+
+@dataclass(slots=True)
+class FrameBatch:
+    """ All aircraft airborne at one tick, as arrays aligned with ids """
+
+    time: float
+    ids: np.ndarray
+    lat: np.ndarray
+    lon: np.ndarray
+    alt: np.ndarray
+    roll: np.ndarray
+    pitch: np.ndarray
+    yaw: np.ndarray
+
+    def __len__(self):
+        return len(self.ids)
+
+    def frames(self):
+        """ {aircraft id: FDRFrame}, for consumers that want one record each """
+        columns = [getattr(self, name).tolist() for name in CHANNELS]
+        return {aid: FDRFrame(self.time, *values)
+                for aid, values in zip(self.ids.tolist(), zip(*columns))}
+
+
+class FleetStore:
+    """ Several flights replayed on one shared clock.
+
+    The flights keep their own start times and rates; every channel of
+    every flight is stored end to end in one array. Each tick of the
+    common time base (rate_hz, from the earliest start to the latest
+    end) is a FrameBatch of the aircraft airborne at that moment,
+    linearly interpolated to the tick (heading along the shortest arc).
+    Building a batch is a handful of numpy operations over all aircraft
+    at once, with no Python loop per aircraft. A FleetStore can be
+    passed to ReplayScheduler like a FrameStore. """
+
+    def __init__(self, stores, ids=None, rate_hz=30):
+        stores = list(stores)
+        if not stores or any(len(s) == 0 for s in stores):
+            raise ValueError("FleetStore needs at least one non-empty flight")
+        self.ids = np.asarray(list(ids) if ids is not None else range(len(stores)))
+        if len(self.ids) != len(stores):
+            raise ValueError("One id is needed per flight")
+
+        lengths = np.array([len(s) for s in stores])
+        self.first = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+        self.last = self.first + lengths - 1
+        self.flat_time = np.concatenate([s.time for s in stores])
+        for name in CHANNELS:
+            setattr(self, name, np.concatenate([getattr(s, name) for s in stores]))
+
+        self.start_time = self.flat_time[self.first]
+        self.end_time = self.flat_time[self.last]
+        spans = self.end_time - self.start_time
+        # Each flight's mean sample spacing, for a direct index guess
+        self.step = np.divide(spans, lengths - 1, out=np.zeros(len(stores)),
+                              where=lengths > 1)
+
+        self.rate_hz = rate_hz
+        t0, t1 = self.start_time.min(), self.end_time.max()
+        n_ticks = int(np.floor((t1 - t0) * rate_hz + 1e-9)) + 1
+        self.time = t0 + np.arange(n_ticks) / rate_hz
+        self._index = None
+
+    @classmethod
+    def from_dfs(cls, flights, rate_hz=30):
+        """ From {aircraft id: cleaned DataFrame} """
+        return cls([FrameStore.from_df(df) for df in flights.values()],
+                   ids=list(flights), rate_hz=rate_hz)
+
+    @classmethod
+    def from_caches(cls, paths, rate_hz=30):
+        """ From {aircraft id: column cache path}, memory-mapped """
+        return cls([FrameStore.from_cache(p) for p in paths.values()],
+                   ids=list(paths), rate_hz=rate_hz)
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = TimeIndex(self.time)
+        return self._index
+
+    def __len__(self):
+        return len(self.time)
+
+    def __getitem__(self, i):
+        return self.batch_at(float(self.time[range(len(self))[i]]))
+
+    def __iter__(self):
+        for t in self.time.tolist():
+            yield self.batch_at(t)
+
+    def _locate(self, t, aircraft):
+        """ Flat index of each given aircraft's last sample at or before t """
+
+        first, last = self.first[aircraft], self.last[aircraft]
+        time = self.flat_time
+        step = self.step[aircraft]
+        guess = np.divide(t - self.start_time[aircraft], step,
+                          out=np.zeros(len(aircraft)), where=step > 0)
+        j = first + np.clip(guess, 0, last - first).astype(np.intp)
+
+        # One step either way absorbs rounding; irregular flights may miss
+        j -= (j > first) & (time[j] > t)
+        j += (j < last) & (time[np.minimum(j + 1, last)] <= t)
+        ok = (time[j] <= t) & ((j == last) | (t < time[np.minimum(j + 1, last)]))
+        miss = np.flatnonzero(~ok)
+        if len(miss):
+            j[miss] = self._bisect(t, first[miss], last[miss])
+        return j
+
+    def _bisect(self, t, lo, hi):
+        """ searchsorted(side="right") - 1 within each flight's [lo, hi]
+        samples, all flights in one vectorized bisection: log2(longest
+        flight) numpy steps rather than a Python loop per aircraft.
+        Assumes time[lo] <= t, as for every aircraft airborne at t """
+
+        time = self.flat_time
+        lo, hi = lo.copy(), hi + 1
+        while True:
+            active = hi - lo > 1
+            if not active.any():
+                return lo
+            mid = (lo + hi) // 2
+            right = active & (time[mid] <= t)
+            lo = np.where(right, mid, lo)
+            hi = np.where(active & ~right, mid, hi)
+
+    def batch_at(self, t):
+        """ FrameBatch of the aircraft whose flight spans time t """
+
+        aircraft = np.flatnonzero((self.start_time <= t) & (t <= self.end_time))
+        j = self._locate(t, aircraft)
+        new_time = np.full(len(aircraft), t)
+        plan = ResamplePlan(self.flat_time, new_time, j=j,
+                            bounds=(self.first[aircraft], self.last[aircraft]))
+        values = resample_columns(self.flat_time, new_time,
+                                  {name: getattr(self, name) for name in CHANNELS},
+                                  angle_cols={"yaw": 360.0}, plan=plan)
+        return FrameBatch(t, self.ids[aircraft], **values)
@@ -0,0 +1,311 @@
+""" Spatio-temporal index over an archive of cleaned flights
+
+Each flight's column cache is cut into segments of SEGMENT_SECONDS; a
+segment records its row range, time range and lat/lon bounding box. The
+segments of the whole archive are kept in one array, and a uniform
+lat/lon grid lists the segments touching each cell (CSR layout: cell
+offsets into one array of segment numbers). Everything is saved as .npy
+files next to a small JSON description, and memory-mapped when opened.
+
+A query reads the grid cells under its area, keeps the segments whose
+box and time range overlap, and only then reads those segments' rows
+from the flights' caches to find the exact time windows inside. Query
+areas are not wrapped across the antimeridian.
+"""
+
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.cache import HEADER_NAME, open_columns, read_header
+from src.replay import R_EARTH
+
+INDEX_VERSION = 1
+SEGMENT_SECONDS = 60.0
+CELL_DEG = 1.0
+NAUTICAL_MILE = 1852.0  # m
+
+META_NAME = "index.json"
+
+SEGMENT_DTYPE = np.dtype([
+    ("flight", "<i4"), ("start", "<i8"), ("stop", "<i8"),
+    ("t0", "<f8"), ("t1", "<f8"),
+    ("lat_min", "<f8"), ("lat_max", "<f8"),
+    ("lon_min", "<f8"), ("lon_max", "<f8"),
+])
+
+WINDOW_COLUMNS = ["flight", "start_time", "end_time", "samples"]
+
+
+def _cache_for(path):
+    """ A cache directory, or the .cache written next to a cleaned CSV """
+
+    path = Path(path)
+    if (path / HEADER_NAME).exists():
+        return path
+    sibling = path.with_suffix(".cache")
+    if (sibling / HEADER_NAME).exists():
+        return sibling
+    raise FileNotFoundError(f"No flight data cache for {path}")
+
+
+def _fingerprint(cache):
+    header = read_header(cache)
+    files = {c["name"]: c["file"] for c in header["columns"]}
+    stats = [os.stat(cache / files[name]) for name in ("Time", "Latitude", "Longitude")]
+    return [header["rows"]] + [[st.st_size, st.st_mtime_ns, st.st_ino] for st in stats]
+
+
+def flight_segments(time, lat, lon, seconds=SEGMENT_SECONDS):
+    """ Segment table (SEGMENT_DTYPE, flight 0) of one flight """
+
+    n = len(time)
+    if n == 0:
+        return np.empty(0, dtype=SEGMENT_DTYPE)
+    bucket = np.floor((time - time[0]) / seconds)
+    starts = np.concatenate([[0], np.flatnonzero(np.diff(bucket)) + 1])
+    stops = np.append(starts[1:], n)
+
+    seg = np.zeros(len(starts), dtype=SEGMENT_DTYPE)
+    seg["start"], seg["stop"] = starts, stops
+    seg["t0"], seg["t1"] = time[starts], time[stops - 1]
+    seg["lat_min"] = np.minimum.reduceat(lat, starts)
+    seg["lat_max"] = np.maximum.reduceat(lat, starts)
+    seg["lon_min"] = np.minimum.reduceat(lon, starts)
+    seg["lon_max"] = np.maximum.reduceat(lon, starts)
+    return seg
+
+
+class _Grid:
+    def __init__(self, cell_deg):
+        self.cell_deg = cell_deg
+        self.n_lat = int(round(180 / cell_deg))
+        self.n_lon = int(round(360 / cell_deg))
+
+    def lat_cell(self, lat):
+        return np.clip(np.floor((np.asarray(lat) + 90) / self.cell_deg),
+                       0, self.n_lat - 1).astype(np.int64)
+
+    def lon_cell(self, lon):
+        return np.clip(np.floor((np.asarray(lon) + 180) / self.cell_deg),
+                       0, self.n_lon - 1).astype(np.int64)
+
+    def build(self, segments):
+        """ (cell offsets, segment numbers sorted by cell) """
+
+        i0, i1 = self.lat_cell(segments["lat_min"]), self.lat_cell(segments["lat_max"])
+        j0, j1 = self.lon_cell(segments["lon_min"]), self.lon_cell(segments["lon_max"])
+        width = j1 - j0 + 1
+        counts = (i1 - i0 + 1) * width
+        # One entry per (segment, cell it touches)
+        seg = np.repeat(np.arange(len(segments)), counts)
+        k = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        w = np.repeat(width, counts)
+        cell = ((np.repeat(i0, counts) + k // w) * self.n_lon
+                + np.repeat(j0, counts) + k % w)
+
+        order = np.argsort(cell, kind="stable")
+        offsets = np.searchsorted(cell[order], np.arange(self.n_lat * self.n_lon + 1))
+        return offsets, seg[order].astype(np.int64)
+
+
+def build_index(flights, index_path, seconds=SEGMENT_SECONDS, cell_deg=CELL_DEG):
+    """ Index the given flights ({id: cache or cleaned CSV path}, or paths
+    named by their stem) into the directory index_path.
+
+    Flights already in an existing index there, with unchanged columns,
+    keep their segments; only new or changed flights are read. """
+
+    if not isinstance(flights, dict):
+        flights = {Path(p).stem: p for p in flights}
+    index_path = Path(index_path)
+
+    old, old_entries = None, {}
+    if (index_path / META_NAME).exists():
+        old = FlightIndex.open(index_path)
+        if (old.meta["segment_seconds"], old.meta["cell_deg"]) == (seconds, cell_deg):
+            old_entries = {(e["id"], e["cache"]): (k, e)
+                           for k, e in enumerate(old.meta["flights"])}
+
+    entries, tables = [], []
+    for number, (flight_id, path) in enumerate(flights.items()):
+        cache = _cache_for(path).resolve()
+        fingerprint = _fingerprint(cache)
+        known = old_entries.get((str(flight_id), str(cache)))
+        if known is not None and known[1]["fingerprint"] == fingerprint:
+            k = known[0]
+            seg = np.array(old.segments[old.flight_offsets[k]:old.flight_offsets[k + 1]])
+        else:
+            columns = open_columns(cache)
+            seg = flight_segments(columns["Time"], columns["Latitude"],
+                                  columns["Longitude"], seconds)
+        seg["flight"] = number
+        tables.append(seg)
+
+        entry = {"id": str(flight_id), "cache": str(cache), "fingerprint": fingerprint}
+        if len(seg):
+            entry.update(t0=float(seg["t0"][0]), t1=float(seg["t1"][-1]),
+                         lat_min=float(seg["lat_min"].min()), lat_max=float(seg["lat_max"].max()),
+                         lon_min=float(seg["lon_min"].min()), lon_max=float(seg["lon_max"].max()))
+        entries.append(entry)
+
+    segments = np.concatenate(tables) if tables else np.empty(0, dtype=SEGMENT_DTYPE)
+    offsets, cell_segments = _Grid(cell_deg).build(segments)
+    del old  # release its memory maps before the files are replaced
+
+    index_path.mkdir(parents=True, exist_ok=True)
+    (index_path / META_NAME).unlink(missing_ok=True)
+    for name, array in (("segments", segments), ("cell_offsets", offsets),
+                        ("cell_segments", cell_segments)):
+        tmp = index_path / f"{name}.npy.tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, array, allow_pickle=False)
+        os.replace(tmp, index_path / f"{name}.npy")
+    meta = {"version": INDEX_VERSION, "segment_seconds": seconds,
+            "cell_deg": cell_deg, "flights": entries}
+    with open(index_path / (META_NAME + ".tmp"), "w") as f:
+        json.dump(meta, f)
+    os.replace(index_path / (META_NAME + ".tmp"), index_path / META_NAME)
+    return FlightIndex.open(index_path)
+
+
+class FlightIndex:
+    """ Which flights were where, and when. Times are in the flights' own
+    Time units; positions in degrees """
+
+    def __init__(self, meta, segments, cell_offsets, cell_segments):
+        self.meta = meta
+        self.ids = [e["id"] for e in meta["flights"]]
+        self.caches = [e["cache"] for e in meta["flights"]]
+        self.segments = segments
+        self.cell_offsets = cell_offsets
+        self.cell_segments = cell_segments
+        self.grid = _Grid(meta["cell_deg"])
+        self.flight_offsets = np.searchsorted(segments["flight"],
+                                              np.arange(len(self.ids) + 1))
+
+    @classmethod
+    def open(cls, path):
+        path = Path(path)
+        try:
+            with open(path / META_NAME) as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"No flight index at {path}") from None
+        if meta.get("version") != INDEX_VERSION:
+            raise ValueError(f"{path} is flight index version {meta.get('version')}; "
+                             f"this reader supports {INDEX_VERSION}")
+        arrays = [np.load(path / f"{name}.npy", mmap_mode="r")
+                  for name in ("segments", "cell_offsets", "cell_segments")]
+        return cls(meta, *arrays)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def candidates(self, lat_min, lat_max, lon_min, lon_max, t0=None, t1=None):
+        """ Numbers of the segments whose bounding box and time range
+        overlap the query; no flight data is read """
+
+        grid = self.grid
+        i0, i1 = grid.lat_cell(lat_min), grid.lat_cell(lat_max)
+        j0, j1 = grid.lon_cell(lon_min), grid.lon_cell(lon_max)
+        rows = np.arange(i0, i1 + 1) * grid.n_lon
+        # Each grid row's cells are contiguous in the CSR arrays
+        lo = self.cell_offsets[rows + j0]
+        hi = self.cell_offsets[rows + j1 + 1]
+        if not len(rows) or (hi - lo).sum() == 0:
+            return np.empty(0, dtype=np.int64)
+        ids = np.unique(np.concatenate([self.cell_segments[a:b] for a, b in zip(lo, hi)]))
+
+        seg = self.segments[ids]
+        keep = ((seg["lat_max"] >= lat_min) & (seg["lat_min"] <= lat_max)
+                & (seg["lon_max"] >= lon_min) & (seg["lon_min"] <= lon_max))
+        if t0 is not None:
+            keep &= seg["t1"] >= t0
+        if t1 is not None:
+            keep &= seg["t0"] <= t1
+        return ids[keep]
+
+    def _windows(self, ids, inside, t0, t1):
+        """ Exact time windows where inside(lat, lon) holds, reading only
+        the rows of the given segments """
+
+        tables = []
+        seg = self.segments[ids]
+        flights, first = np.unique(seg["flight"], return_index=True)
+        for flight, a, b in zip(flights, first, np.append(first[1:], len(seg))):
+            start, stop = seg["start"][a:b], seg["stop"][a:b]
+            lengths = stop - start
+            rows = (np.repeat(start - (np.cumsum(lengths) - lengths), lengths)
+                    + np.arange(lengths.sum()))
+
+            columns = open_columns(self.caches[flight])
+            time = columns["Time"][rows]
+            mask = inside(columns["Latitude"][rows], columns["Longitude"][rows])
+            if t0 is not None:
+                mask &= time >= t0
+            if t1 is not None:
+                mask &= time <= t1
+            if not mask.any():
+                continue
+
+            # A window ends where the mask does or the rows stop being contiguous
+            cut = np.diff(rows) != 1
+            begins = mask & np.concatenate([[True], ~mask[:-1] | cut])
+            ends = mask & np.concatenate([~mask[1:] | cut, [True]])
+            b_idx, e_idx = np.flatnonzero(begins), np.flatnonzero(ends)
+            tables.append(pd.DataFrame({
+                "flight": self.ids[flight],
+                "start_time": time[b_idx], "end_time": time[e_idx],
+                "samples": e_idx - b_idx + 1,
+            }))
+
+        if not tables:
+            return pd.DataFrame(columns=WINDOW_COLUMNS)
+        return pd.concat(tables, ignore_index=True)
+
+    def query_box(self, lat_min, lat_max, lon_min, lon_max, t0=None, t1=None):
+        """ Windows (flight, start_time, end_time, samples) spent inside a
+        lat/lon box, optionally between times t0 and t1 """
+
+        ids = self.candidates(lat_min, lat_max, lon_min, lon_max, t0, t1)
+
+        def inside(lat, lon):
+            return ((lat >= lat_min) & (lat <= lat_max)
+                    & (lon >= lon_min) & (lon <= lon_max))
+
+        return self._windows(ids, inside, t0, t1)
+
+    def query_near(self, lat, lon, radius_m, t0=None, t1=None):
+        """ Windows (flight, start_time, end_time, samples) spent within
+        radius_m of a point (great-circle), optionally between t0 and t1 """
+
+        dlat = np.degrees(radius_m / R_EARTH)
+        cos_lat = np.cos(np.radians(min(abs(lat) + dlat, 90.0)))
+        dlon = 180.0 if cos_lat < 1e-9 else min(dlat / cos_lat, 180.0)
+        ids = self.candidates(lat - dlat, lat + dlat, lon - dlon, lon + dlon, t0, t1)
+
+        lat0, lon0 = np.radians(lat), np.radians(lon)
+        limit = np.sin(radius_m / (2 * R_EARTH)) ** 2
+
+        def inside(lat, lon):
+            lat = np.radians(lat)
+            h = (np.sin((lat - lat0) / 2) ** 2
+                 + np.cos(lat0) * np.cos(lat) * np.sin((np.radians(lon) - lon0) / 2) ** 2)
+            return h <= limit
+
+        return self._windows(ids, inside, t0, t1)
+
+    def flights_between(self, t0=None, t1=None):
+        """ Ids of the flights whose time range overlaps [t0, t1] """
+
+        found = []
+        for entry in self.meta["flights"]:
+            if "t0" not in entry:
+                continue
+            if (t0 is None or entry["t1"] >= t0) and (t1 is None or entry["t0"] <= t1):
+                found.append(entry["id"])
+        return found
@@ -0,0 +1,324 @@
+""" Shared-memory ring fanning replay frames out to local processes
+
+A FrameRing producer writes each frame once, as a fixed-width record
+stamped with its sequence number, into a multiprocessing.shared_memory
+segment. Any number of FrameRingReader consumers attach to it by name and
+read zero-copy NumPy views at their own pace; the producer never waits
+for them, and a reader it laps skips ahead and counts what it missed.
+
+Layout (little-endian):
+  header   64 bytes of uint64 words: magic, capacity, record size,
+           reserved, published, closed
+  records  capacity RECORDs of 64 bytes: seq (uint64), then the FDRFrame
+           channels (float64)
+
+While a record is being overwritten its seq is WRITING. Readers accept a
+record only when its seq is the one their cursor expects, so a record
+whose new contents are not visible yet, or that has been lapped, is never
+taken for the frame they asked for, whatever order the CPU makes the
+producer's stores visible in.
+"""
+
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from src.replay import FRAME_COLUMNS, FDRFrame, FrameStore
+
+MAGIC = int.from_bytes(b"FDRRING1", "little")
+HEADER_BYTES = 64
+DEFAULT_CAPACITY = 1 << 16
+
+# One cache line per frame: a sequence stamp and the FDRFrame channels
+RECORD = np.dtype([("seq", "<u8")] + [(name, "<f8") for name in FRAME_COLUMNS])
+
+# The seq of a record being overwritten: never a frame's sequence number
+WRITING = np.iinfo(np.uint64).max
+
+# Header words (uint64)
+_MAGIC, _CAPACITY, _RECORD_SIZE, _RESERVED, _PUBLISHED, _CLOSED = range(6)
+
+_untracked = threading.local()  # set while this thread attaches a ring
+_install_lock = threading.Lock()
+
+
+def _skipping(register):
+    """ resource_tracker.register, except in a thread attaching a ring """
+
+    def skip_attaching(*args, **kwargs):
+        if not getattr(_untracked, "active", False):
+            return register(*args, **kwargs)
+
+    skip_attaching.skips_attaching = True
+    return skip_attaching
+
+
+def _attach(name):
+    """ Open an existing segment without registering it with this process's
+    resource tracker, which would unlink it when the process exits (the
+    track=False argument only exists from Python 3.13). Before that, the
+    tracker's register is wrapped once to skip calls from the attaching
+    thread only, so segments other threads open meanwhile stay tracked """
+
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        pass
+    with _install_lock:
+        if not getattr(resource_tracker.register, "skips_attaching", False):
+            resource_tracker.register = _skipping(resource_tracker.register)
+    _untracked.active = True
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        _untracked.active = False
+
+
+def _views(shm):
+    # frombuffer holds a buffer export on the mapping, so it cannot be
+    # unmapped under a live view: close() raises BufferError instead
+    header = np.frombuffer(shm.buf, dtype="<u8", count=HEADER_BYTES // 8)
+    capacity = int(header[_CAPACITY])
+    records = np.frombuffer(shm.buf, dtype=RECORD, count=capacity, offset=HEADER_BYTES)
+    return header, records
+
+
+class FrameRing:
+    """ Single-producer, multi-consumer ring of replay frames in shared memory.
+
+    The producer writes fixed-width records (RECORD) into a ring of
+    `capacity` slots and never waits for, or even knows about, the
+    readers: each FrameRingReader keeps its own cursor, so a slow one
+    only loses its own frames and adding consumers costs the producer
+    nothing. Two counters in the header bound the writes: `reserved` is
+    raised before slots are overwritten and `published` after they are
+    filled. Each record's seq is set to WRITING before it is overwritten
+    and to its sequence number after, and readers check those stamps
+    rather than trust the counters to become visible in order (x86 keeps
+    stores in program order, weakly ordered CPUs such as ARM do not). """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, name=None):
+        if capacity < 1:
+            raise ValueError(f"capacity must be >= 1, got {capacity}")
+        self.shm = shared_memory.SharedMemory(
+            name=name, create=True, size=HEADER_BYTES + capacity * RECORD.itemsize)
+        header = np.frombuffer(self.shm.buf, dtype="<u8", count=HEADER_BYTES // 8)
+        header[:] = 0
+        header[_MAGIC] = MAGIC
+        header[_CAPACITY] = capacity
+        header[_RECORD_SIZE] = RECORD.itemsize
+        self.header, self.records = _views(self.shm)
+        self.stamps = self.records["seq"]
+        self.capacity = capacity
+        self.seq = 0
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def send(self, frame):
+        """ Publish one FDRFrame """
+
+        seq, slot = self.seq, self.seq % self.capacity
+        self.header[_RESERVED] = seq + 1
+        self.stamps[slot] = WRITING
+        self.records[slot] = (WRITING, *(getattr(frame, name) for name in FRAME_COLUMNS))
+        self.stamps[slot] = seq
+        self.header[_PUBLISHED] = self.seq = seq + 1
+
+    def send_store(self, store, block=4096):
+        """ Publish every frame of a FrameStore, a block of records at a
+        time (column copies instead of one Python object per frame) """
+
+        block = min(block, self.capacity)
+        columns = [(name, getattr(store, name)) for name in FRAME_COLUMNS]
+        for start in range(0, len(store), block):
+            n = min(block, len(store) - start)
+            seq = self.seq
+            self.header[_RESERVED] = seq + n
+            done = 0
+            while done < n:  # at most two runs: up to the end of the ring, then from 0
+                slot = (seq + done) % self.capacity
+                k = min(n - done, self.capacity - slot)
+                part = self.records[slot:slot + k]
+                part["seq"] = WRITING
+                for name, values in columns:
+                    part[name] = values[start + done:start + done + k]
+                part["seq"] = np.arange(seq + done, seq + done + k, dtype=np.uint64)
+                done += k
+            self.header[_PUBLISHED] = self.seq = seq + n
+        return self.seq
+
+    def publish(self, frames, block=4096):
+        """ Publish a FrameStore in blocks, or any iterator of FDRFrame (a
+        ReplayScheduler for real-time pacing) frame by frame """
+
+        if isinstance(frames, FrameStore):
+            return self.send_store(frames, block)
+        for frame in frames:
+            self.send(frame)
+        return self.seq
+
+    def finish(self):
+        """ Mark the stream finished; readers drain what is left and stop """
+        self.header[_CLOSED] = 1
+
+    def close(self):
+        """ Finish and remove the segment. Readers already attached keep
+        their mapping; new ones can no longer attach """
+
+        if self.shm is None:
+            return
+        self.finish()
+        self.header = self.records = self.stamps = None
+        self.shm.close()
+        self.shm.unlink()
+        self.shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class FrameRingReader:
+    """ One consumer of a FrameRing, attached by name from any process.
+
+    read() returns a zero-copy structured view of the next published
+    records (at most up to the end of the ring). The view is only valid
+    until the producer laps it: check valid() after using it. Frames the
+    producer overwrote before they were read are skipped and counted in
+    `lost`. Only records stamped with the sequence number the cursor
+    expects are returned; the rest wait for the next read() """
+
+    def __init__(self, name, from_start=False):
+        self.shm = _attach(name)
+        self.header, self.records = _views(self.shm)
+        if int(self.header[_MAGIC]) != MAGIC or int(self.header[_RECORD_SIZE]) != RECORD.itemsize:
+            self.close()
+            raise ValueError(f"Shared memory {name!r} is not a frame ring")
+        self.capacity = len(self.records)
+        self.cursor = self._oldest() if from_start else int(self.header[_PUBLISHED])
+        self.received = 0
+        self.lost = 0
+        self._start = self.cursor
+        self._stamps = self._expected = np.empty(0, dtype=np.uint64)
+
+    def _oldest(self):
+        """ First sequence number whose slot is not (being) overwritten """
+        return max(int(self.header[_RESERVED]) - self.capacity, 0)
+
+    @property
+    def available(self):
+        return int(self.header[_PUBLISHED]) - self.cursor
+
+    @property
+    def closed(self):
+        return bool(self.header[_CLOSED])
+
+    def read(self, max_records=None):
+        """ View of up to max_records new records (empty if none) """
+
+        while True:
+            # reserved before published: a block is never longer than the
+            # ring, so the oldest intact record is never past the newest
+            oldest = self._oldest()
+            published = int(self.header[_PUBLISHED])
+            if self.cursor < oldest:
+                self.lost += oldest - self.cursor
+                self.cursor = oldest
+            slot = self.cursor % self.capacity
+            n = min(published - self.cursor, self.capacity - slot)
+            if max_records is not None:
+                n = min(n, max_records)
+            view = self.records[slot:slot + n]
+            expected = np.arange(self.cursor, self.cursor + n, dtype=np.uint64)
+            stamped = view["seq"] == expected
+            if not stamped.all():
+                # Keep the records up to the first that is not the expected
+                # frame yet; one stamped with a later frame has been lapped
+                k = int(stamped.argmin())
+                stamp = int(view["seq"][k])
+                if k == 0 and stamp != WRITING and stamp > self.cursor:
+                    skip = stamp + 1 - self.capacity
+                    self.lost += skip - self.cursor
+                    self.cursor = skip
+                    continue
+                view, expected, n = view[:k], expected[:k], k
+            self._start = self.cursor
+            self._stamps, self._expected = view["seq"], expected
+            # The producer may have lapped the cursor while this ran
+            if self.valid():
+                self.cursor += n
+                self.received += n
+                return view
+
+    def valid(self):
+        """ Whether the last view returned by read() is still intact """
+        return (int(self.header[_RESERVED]) - self._start <= self.capacity
+                and bool((self._stamps == self._expected).all()))
+
+    def read_store(self, max_records=None, copy=True):
+        """ The next records as a FrameStore (copied by default, so it
+        stays valid after the producer laps it), or None if none """
+
+        view = self.read(max_records)
+        if not len(view):
+            return None
+        store = FrameStore(**{name: view[name] for name in FRAME_COLUMNS})
+        if copy:
+            store = FrameStore(**{name: np.array(getattr(store, name))
+                                  for name in FRAME_COLUMNS})
+            if not self.valid():
+                # Overwritten mid-copy: drop it and count it as lost
+                self.lost += len(view)
+                self.received -= len(view)
+                return self.read_store(max_records, copy)
+        return store
+
+    def batches(self, max_records=None, poll=0.001, timeout=None):
+        """ Yield views as records arrive until the producer closes the
+        ring and everything is read, or `timeout` seconds pass with
+        nothing new """
+
+        idle_since = time.monotonic()
+        while True:
+            view = self.read(max_records)
+            if len(view):
+                idle_since = time.monotonic()
+                yield view
+                continue
+            if self.closed and not self.available:
+                return
+            if timeout is not None and time.monotonic() - idle_since > timeout:
+                return
+            time.sleep(poll)
+
+    def frames(self, **kwargs):
+        """ FDRFrame objects, like iterating a FrameStore """
+
+        for view in self.batches(**kwargs):
+            values = [view[name].tolist() for name in FRAME_COLUMNS]
+            if not self.valid():
+                self.lost += len(view)
+                self.received -= len(view)
+                continue
+            for row in zip(*values):
+                yield FDRFrame(*row)
+
+    def close(self):
+        self.header = self.records = self._stamps = None
+        try:
+            self.shm.close()
+        except BufferError:
+            raise BufferError("Views returned by read() are still in use; "
+                              "delete them before closing the reader") from None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
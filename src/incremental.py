@@ -0,0 +1,158 @@
+import io
+import json
+import os
+from contextlib import nullcontext
+from pathlib import Path
+
+from src.cache import CacheWriter
+from src.export_replay_fdr import append_replay_fdr
+from src.loader import (ChunkInterpolator, clean_raw_chunk, continue_chunk,
+                        read_raw_csv)
+from src.replay import compute_xyz
+
+STATE_VERSION = 1
+READ_BLOCK = 16 << 20  # bytes of raw CSV parsed at a time
+
+
+def default_state_path(output_path):
+    return Path(str(output_path) + ".state.json")
+
+
+def load_state(state_path):
+    try:
+        with open(state_path) as f:
+            state = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    return state if state.get("version") == STATE_VERSION else None
+
+
+def save_state(state_path, state):
+    tmp = Path(str(state_path) + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, state_path)
+
+
+def _can_resume(state, input_path, rate_hz, earth_model):
+    """ The raw file is the one we were following and has only grown """
+
+    if state is None:
+        return False
+    if (state["input"] != str(Path(input_path).resolve())
+            or state["rate_hz"] != rate_hz
+            or state["earth_model"] != earth_model
+            or state.get("finished")):
+        return False
+    if os.path.getsize(input_path) < state["offset"]:
+        return False
+    with open(input_path, "rb") as f:
+        return f.readline().decode() == state["header"]
+
+
+def _iter_new_blocks(input_path, offset, block_size=READ_BLOCK):
+    """ Complete lines appended after offset, as (bytes, end offset);
+    a partially written last line is left for the next pass """
+
+    with open(input_path, "rb") as f:
+        f.seek(offset)
+        pending = b""
+        while True:
+            data = f.read(block_size)
+            if not data:
+                return
+            data = pending + data
+            cut = data.rfind(b"\n") + 1
+            pending = data[cut:]
+            if cut:
+                offset += cut
+                yield data[:cut], offset
+
+
+def preprocess_incremental(input_path, output_path, rate_hz=30, cache_path=None,
+                           fdr_path=None, state_path=None, earth_model="sphere",
+                           final=False):
+    """ Bring the cleaned CSV (and optional cache and .fdr) up to date with
+    a raw CSV that is still being written.
+
+    Only rows appended since the previous pass are parsed. They are
+    resampled on the existing rate_hz grid, continuing from the saved
+    interpolator state so the boundary is seamless, and appended to the
+    outputs. With final=True the tail of the flight is flushed as well,
+    giving the same result as a full run. Returns the number of new rows. """
+
+    state_path = state_path or default_state_path(output_path)
+    state = load_state(state_path)
+    if (state is not None and state.get("finished")
+            and os.path.getsize(input_path) == state["offset"]):
+        return 0
+
+    if not _can_resume(state, input_path, rate_hz, earth_model):
+        with open(input_path, "rb") as f:
+            header = f.readline()
+        if not header.endswith(b"\n"):
+            return 0  # not even a complete header line yet
+        state = {
+            "version": STATE_VERSION,
+            "input": str(Path(input_path).resolve()),
+            "rate_hz": rate_hz,
+            "earth_model": earth_model,
+            "header": header.decode(),
+            "offset": len(header),
+            "last_time": None,
+            "interp": None,
+            "outputs": {"csv": 0, "fdr": 0, "rows": 0},
+        }
+
+    interp = ChunkInterpolator(rate_hz, state=state["interp"])
+    outputs = state["outputs"]
+    header = state["header"].encode()
+    new_rows = 0
+
+    # Drop anything written after the last committed state
+    for path, size in ((output_path, outputs["csv"]), (fdr_path, outputs["fdr"])):
+        if path is not None and os.path.exists(path):
+            os.truncate(path, size)
+
+    cache = nullcontext()
+    if cache_path is not None:
+        st = os.stat(input_path)
+        source = {"path": state["input"], "size": st.st_size,
+                  "mtime_ns": st.st_mtime_ns, "blake2b": None,
+                  "final": bool(final)}
+        cache = CacheWriter(cache_path, rate_hz=rate_hz, source=source,
+                            attrs={"xyz_model": earth_model},
+                            append_rows=outputs["rows"] or None)
+
+    with cache as writer, open(output_path, "a", newline="") as csv_file:
+
+        def write(parts):
+            nonlocal new_rows
+            for part in parts:
+                part = compute_xyz(part, model=earth_model)
+                part.to_csv(csv_file, header=(csv_file.tell() == 0), index=False)
+                if writer is not None:
+                    writer.append(part)
+                if fdr_path is not None:
+                    outputs["fdr"] = append_replay_fdr(part, fdr_path)
+                new_rows += len(part)
+
+        for block, offset in _iter_new_blocks(input_path, state["offset"]):
+            chunk = clean_raw_chunk(read_raw_csv(io.BytesIO(header + block)))
+            chunk = continue_chunk(chunk, state["last_time"])
+            if not chunk.empty:
+                state["last_time"] = float(chunk["Time"].iloc[-1])
+                write(interp.feed(chunk))
+            state["offset"] = offset
+
+        if final:
+            write(interp.finish())
+            state["finished"] = True
+
+        outputs["csv"] = csv_file.tell()
+
+    outputs["rows"] += new_rows
+    state["interp"] = interp.state()
+    save_state(state_path, state)
+
+    return new_rows
@@ -1,6 +1,16 @@
+import importlib.util
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
 import pandas as pd
 import numpy as np
 
+from src.cache import CacheWriter, source_fingerprint
+from src.profiling import profiled, stage, timed_iter
+from src.quality import check_chunks, check_quality, write_events
+
 COLUMN_MAP = {
     "time": "Time",
     "baroaltitude": "Altitude",
@@ -16,51 +26,355 @@ COLUMN_MAP = {
 REQ_COLS = ['Time', 'Longitude', 'Latitude', 'Altitude',
             'Roll', 'Pitch', 'Yaw']
 
+GMT_COLS = ["GMT_HOUR", "GMT_MINUTE", "GMT_SEC"]
 
+DEFAULT_CHUNKSIZE = 100_000
 
-def load_csv(path):
-    """The flight data is loaded with the required columns only"""
+# Parse dtype of every raw column the pipeline reads; the rest of a wide
+# recorder export is skipped by the parser
+RAW_SCHEMA = {col: np.float64 for col in [*COLUMN_MAP, *GMT_COLS]}
+
+INGEST_ENGINES = ("auto", "c", "threads", "pyarrow")
+HAVE_PYARROW = importlib.util.find_spec("pyarrow") is not None
+PARALLEL_MIN_BYTES = 32 << 20  # smaller files are parsed on one thread
+
+_RAW_COLUMNS = frozenset(RAW_SCHEMA)
 
-    df = pd.read_csv(
-        path,
-        usecols=lambda col: col in list(COLUMN_MAP.keys()) + [
-            "GMT_HOUR", "GMT_MINUTE", "GMT_SEC"
-        ]
-    )
 
-    # --- Step 2: CREATE TIME (ADD HERE) ---
+def _raw_columns(col):
+    return col in _RAW_COLUMNS
+
+
+def _build_frame(df):
+    """ Build the Time column, rename and drop rows missing required values """
+
     df["Time"] = (
         df["GMT_HOUR"] * 3600 +
         df["GMT_MINUTE"] * 60 +
         df["GMT_SEC"]
     )
-            
+
     df = df.rename(columns=COLUMN_MAP)
-    
+
     missing = set(REQ_COLS) - set(df.columns)
     if missing:
         raise ValueError(f"Missing columns: {missing}")
 
-    df = df.dropna(subset=REQ_COLS)
-    df = df.sort_values("Time").reset_index(drop=True)
+    return df.dropna(subset=REQ_COLS)
+
+
+def read_raw_csv(source, **kwargs):
+    """ pd.read_csv restricted to the recorder columns the pipeline uses,
+    parsed straight to the RAW_SCHEMA dtypes. A file with non-numeric
+    values in those columns is re-read untyped for normalize to coerce;
+    chunked readers are always untyped, as they can't be re-read midway """
+
+    if kwargs.get("chunksize") is None:
+        try:
+            return pd.read_csv(source, usecols=_raw_columns, dtype=RAW_SCHEMA,
+                               **kwargs)
+        except ValueError:
+            if hasattr(source, "seek"):
+                source.seek(0)
+    return pd.read_csv(source, usecols=_raw_columns, **kwargs)
+
+
+def _split_lines(path, parts):
+    """ Header line and about `parts` byte ranges of whole data lines """
+
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        header = f.readline()
+        bounds = [f.tell()]
+        for k in range(1, parts):
+            f.seek(max(size * k // parts, bounds[-1]))
+            f.readline()
+            bounds.append(f.tell())
+    bounds.append(size)
+    return header, [(a, b) for a, b in zip(bounds, bounds[1:]) if b > a]
+
+
+def _read_lines(path, header, start, end):
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    return read_raw_csv(io.BytesIO(header + data))
+
+
+def _read_threads(path, workers):
+    """ Parse line ranges of the file concurrently; the C parser releases
+    the GIL while tokenizing. Recorder exports have no quoted newlines, so
+    splitting at line ends gives the same rows as one pass """
+
+    header, ranges = _split_lines(path, workers)
+    with ThreadPoolExecutor(workers) as pool:
+        parts = list(pool.map(lambda r: _read_lines(path, header, *r), ranges))
+    if not parts:
+        return read_raw_csv(path)
+    return pd.concat(parts, ignore_index=True)
+
+
+def _read_pyarrow(path):
+    header = pd.read_csv(path, nrows=0).columns
+    usecols = [col for col in header if col in _RAW_COLUMNS]
+    try:
+        return pd.read_csv(path, engine="pyarrow", usecols=usecols,
+                           dtype={col: RAW_SCHEMA[col] for col in usecols})
+    except ValueError:  # includes pyarrow's ArrowInvalid
+        return read_raw_csv(path)
+
+
+def read_raw_file(path, engine="auto", workers=None):
+    """ Whole raw CSV as a DataFrame of the RAW_SCHEMA columns.
+
+    engine "c" is one pandas parser pass and "threads" splits the file
+    across a thread pool; both give the same frame. "auto" picks threads
+    for large files on multi-core machines, else c. "pyarrow" uses the
+    multi-threaded Arrow reader, which rounds some values to the
+    neighbouring float64 (1 ulp) of the C parser's, so it is only used
+    when asked for. """
+
+    if engine not in INGEST_ENGINES:
+        raise ValueError(f"Unknown ingest engine {engine!r}; use one of {INGEST_ENGINES}")
+    workers = workers or os.cpu_count() or 1
+    if engine == "auto":
+        if workers > 1 and os.path.getsize(path) >= PARALLEL_MIN_BYTES:
+            engine = "threads"
+        else:
+            engine = "c"
+
+    if engine == "pyarrow":
+        if not HAVE_PYARROW:
+            raise ImportError("engine='pyarrow' needs the pyarrow package")
+        return _read_pyarrow(path)
+    if engine == "threads":
+        return _read_threads(path, workers)
+    return read_raw_csv(path)
+
+
+@profiled("clean_chunk")
+def clean_raw_chunk(df):
+    """ Raw recorder rows to normalized REQ_COLS rows """
+
+    return normalize(_build_frame(df)[REQ_COLS])
+
+
+@profiled("load_csv")
+def load_csv(path, engine="auto", workers=None):
+    """The flight data is loaded with the required columns only"""
+
+    df = read_raw_file(path, engine, workers)
+    df = _build_frame(df)
+    df = df.sort_values("Time", kind="stable").reset_index(drop=True)
             
     return df[REQ_COLS]
 
 
+def continue_chunk(chunk, last_time):
+    """ Drop a normalized chunk's overlap with data already seen up to
+    last_time; time may not go backwards across chunks """
+
+    if last_time is None or chunk.empty:
+        return chunk
+    if chunk["Time"].iloc[0] < last_time:
+        raise ValueError(
+            f"Time goes backwards at {chunk['Time'].iloc[0]} "
+            f"(after {last_time}); use the in-memory loader."
+        )
+    if chunk["Time"].iloc[0] == last_time:
+        chunk = chunk.iloc[1:].reset_index(drop=True)
+    return chunk
+
+
+def iter_csv_chunks(path, chunksize=DEFAULT_CHUNKSIZE):
+    """ Stream the flight data in bounded chunks, normalized per chunk """
 
+    last_time = None
+    with read_raw_csv(path, chunksize=chunksize) as reader:
+        for chunk in timed_iter(reader, "read_csv"):
+            chunk = continue_chunk(clean_raw_chunk(chunk), last_time)
+            if chunk.empty:
+                continue
+
+            last_time = chunk["Time"].iloc[-1]
+            yield chunk
+
+
+
+@profiled("normalize")
 def normalize(df):
     """ Clean the data and sort it by time in ascending """
 
-    df = df.apply(pd.to_numeric, errors='coerce')
+    # Typed parses are already numeric; only untyped input needs coercing
+    if not all(pd.api.types.is_numeric_dtype(t) for t in df.dtypes):
+        df = df.apply(pd.to_numeric, errors='coerce')
     
     return (df.dropna()
-             .sort_values("Time")
+             .sort_values("Time", kind="stable")
              .drop_duplicates("Time")
              .reset_index(drop=True))
 
 
 
-def interpolate(df, rate_hz=30):
+class ResamplePlan:
+    """ Search indices and weights from old to new time, computed once and
+    applied to every column.
+
+    Linear columns are evaluated exactly as np.interp does, so results are
+    unchanged; angle columns interpolate along the shortest arc (no sweep
+    across 359 -> 0); "cubic" is a cubic Hermite spline with
+    finite-difference tangents and "hold" keeps the last sample.
+
+    j may be given when the caller already knows, for each new time, the
+    index of the last old sample at or before it. bounds=(first, last)
+    gives per new time the index range of its own series, for old_time
+    made of several series laid end to end; no neighbour is taken from
+    outside it. """
+
+    def __init__(self, old_time, new_time, j=None, bounds=None):
+        old_time = np.asarray(old_time, dtype=np.float64)
+        n = len(old_time)
+        if j is None:
+            j = np.searchsorted(old_time, new_time, side="right") - 1
+        first, last = bounds if bounds is not None else (0, n - 1)
+        j = np.clip(j, first, last)
+        jn = np.minimum(j + 1, last)
+
+        dx = new_time - old_time[j]
+        dxp = old_time[jn] - old_time[j]
+        # Past either end the value is clamped to the edge sample
+        edge = (dxp == 0) | (dx < 0)
+        dx[edge] = 0.0
+        dxp[edge] = 1.0
+
+        self.old_time = old_time
+        self.j, self.jn = j, jn
+        self.first, self.last = first, last
+        self.dx, self.dxp = dx, dxp
+        self._cubic = None
+
+    def _cubic_weights(self):
+        if self._cubic is None:
+            jp = np.maximum(self.j - 1, self.first)
+            jnn = np.minimum(self.jn + 1, self.last)
+            t = self.dx / self.dxp
+            t2 = t * t
+            t3 = t2 * t
+            h = np.stack([2 * t3 - 3 * t2 + 1, t3 - 2 * t2 + t,
+                          -2 * t3 + 3 * t2, t3 - t2])
+            self._cubic = (jp, jnn, h)
+        return self._cubic
+
+    def linear(self, col, out, period=None):
+        """ Resample one column into out, reusing the plan's indices """
+        f0 = col[self.j]
+        np.take(col, self.jn, out=out)
+        out -= f0
+        if period is not None:
+            f1 = out + f0
+            _shortest_arc(out, period)
+        out /= self.dxp
+        out *= self.dx
+        out += f0
+        if period is not None:
+            _wrap_like(out, f0, f1, period)
+        return out
+
+    def hold(self, col, out):
+        return np.take(col, self.j, out=out)
+
+    def cubic(self, col, out, period=None):
+        jp, jnn, h = self._cubic_weights()
+        x = self.old_time
+        p1 = col[self.j]
+        p2 = col[self.jn]
+        d_next = p2 - p1
+        d_prev = p1 - col[jp]
+        d_after = col[jnn] - p2
+        if period is not None:
+            for d in (d_next, d_prev, d_after):
+                _shortest_arc(d, period)
+
+        # Finite-difference tangents, scaled to the segment length
+        span_1 = x[self.jn] - x[jp]
+        span_2 = x[jnn] - x[self.j]
+        span_1[span_1 == 0] = 1.0
+        span_2[span_2 == 0] = 1.0
+        m1 = (d_prev + d_next) / span_1 * self.dxp
+        m2 = (d_next + d_after) / span_2 * self.dxp
+
+        np.multiply(p1, h[0] + h[2], out=out)
+        out += h[1] * m1
+        out += h[2] * d_next
+        out += h[3] * m2
+        if period is not None:
+            _wrap_like(out, p1, p2, period)
+        return out
+
+
+def _shortest_arc(delta, period):
+    half = period / 2
+    delta[delta > half] -= period
+    delta[delta < -half] += period
+
+
+def _wrap_like(out, f0, f1, period):
+    """ Wrap results that left the range back into the convention of the
+    segment's samples: [-p/2, p/2) if either is negative, else [0, p) """
+    lo = np.where(np.minimum(f0, f1) < 0, -period / 2, 0.0)
+    bad = (out < lo) | (out >= lo + period)
+    out[bad] = (out[bad] - lo[bad]) % period + lo[bad]
+
+
+INTERP_METHODS = ("linear", "cubic", "hold")
+
+# Columns holding angles that wrap around, with their period
+ANGLE_COLS = {"Yaw": 360.0, "Yaw (deg)": 360.0}
+
+
+def resample_columns(old_time, new_time, columns, methods=None,
+                     angle_cols=ANGLE_COLS, plan=None, out=None):
+    """ Resample a dict of columns onto new_time with a single search.
+    methods maps column -> "linear" (default), "cubic" or "hold";
+    out is an optional (n_columns, n_new) block to write into """
+
+    methods = methods or {}
+    unknown = set(methods.values()) - set(INTERP_METHODS)
+    if unknown:
+        raise ValueError(f"Unknown interpolation method(s): {unknown}")
+    if plan is None:
+        plan = ResamplePlan(old_time, new_time)
+
+    # One output block for all columns, filled in place column by column
+    if out is None:
+        out = np.empty((len(columns), len(new_time)))
+    result = {}
+    for k, (name, values) in enumerate(columns.items()):
+        values = np.asarray(values, dtype=np.float64)
+        method = methods.get(name, "linear")
+        if method == "hold":
+            plan.hold(values, out[k])
+        elif method == "cubic":
+            plan.cubic(values, out[k], angle_cols.get(name))
+        else:
+            plan.linear(values, out[k], angle_cols.get(name))
+        result[name] = out[k]
+
+    return result
+
+
+def _resample_df(df, new_time, methods, angle_cols):
+    columns = {col: df[col].values for col in df.columns if col != "Time"}
+    block = np.empty((len(columns) + 1, len(new_time)))
+    block[0] = new_time
+    resample_columns(df["Time"].values, new_time, columns, methods,
+                     angle_cols, out=block[1:])
+    # The transposed block becomes the frame's storage without a copy
+    return pd.DataFrame(block.T, columns=["Time", *columns], copy=False)
+
+
+@profiled("interpolate")
+def interpolate(df, rate_hz=30, methods=None, angle_cols=ANGLE_COLS):
     """ Resample the values so that the time intervals are uniform  """
 
     if len(df) < 2:
@@ -69,25 +383,155 @@ def interpolate(df, rate_hz=30):
     start, end = df["Time"].iloc[[0, -1]]
     new_time = np.arange(start, end, 1.0 / rate_hz)
     
-    old_time = df["Time"].values
-    
-    result = {"Time": new_time}
-    for col in df.columns:
-        if col != "Time":
-            result[col] = np.interp(new_time, old_time, df[col].values)
-    
-    return pd.DataFrame(result)
+    return _resample_df(df, new_time, methods, angle_cols)
+
+
+class ChunkInterpolator:
+    """ Resumable state behind interpolate_chunks.
+
+    feed() resamples every grid point that is final given the samples
+    seen so far; finish() flushes the rest once the flight has ended.
+    state() / the state argument round-trip through JSON, so live
+    preprocessing can pick up where the previous pass stopped. """
+
+    def __init__(self, rate_hz=30, block_rows=DEFAULT_CHUNKSIZE, methods=None,
+                 angle_cols=ANGLE_COLS, state=None):
+        self.step = 1.0 / rate_hz
+        self.block_rows = block_rows
+        self.methods = methods
+        self.angle_cols = angle_cols
+        self.start = self.delta = None
+        self.emitted = 0
+        self.n_points = 0
+        self.carry = None
+
+        if state is not None:
+            self.start = state["start"]
+            self.delta = state["delta"]
+            self.emitted = state["emitted"]
+            self.n_points = state["n_points"]
+            if state["carry"] is not None:
+                self.carry = pd.DataFrame(state["carry"])
+
+    def state(self):
+        return {
+            "start": None if self.start is None else float(self.start),
+            "delta": self.delta,
+            "emitted": int(self.emitted),
+            "n_points": self.n_points,
+            "carry": None if self.carry is None else self.carry.to_dict("list"),
+        }
+
+    @property
+    def last_time(self):
+        return None if self.carry is None else self.carry["Time"].iloc[-1]
+
+    def _resample(self, df, stop):
+        while self.emitted < stop:
+            idx = np.arange(self.emitted, min(stop, self.emitted + self.block_rows))
+            new_time = self.start + idx * self.delta
+            self.emitted = int(idx[-1]) + 1
+            with stage("interpolate", rows=len(new_time)):
+                part = _resample_df(df, new_time, self.methods, self.angle_cols)
+            yield part
+
+    def feed(self, chunk):
+        self.n_points += len(chunk)
+        if self.carry is not None:
+            chunk = pd.concat([self.carry, chunk], ignore_index=True)
+        if self.start is None:
+            self.start = chunk["Time"].iloc[0]
+            # Same grid as np.arange(start, end, step)
+            self.delta = float((self.start + self.step) - self.start)
+
+        # Grid points before the second-to-last sample have all their
+        # neighbours in this chunk (cubic needs one beyond the segment)
+        # and are final, as long as they are also within the np.arange
+        # length for this end time
+        if len(chunk) >= 2:
+            start, delta = self.start, self.delta
+            bound = chunk["Time"].iloc[-2]
+            stop = min(int(np.ceil((bound - start) / delta)) + 1,
+                       int(np.ceil((chunk["Time"].iloc[-1] - start) / self.step)))
+            while stop > self.emitted and start + (stop - 1) * delta >= bound:
+                stop -= 1
+            yield from self._resample(chunk, stop)
+        self.carry = chunk.iloc[-3:].reset_index(drop=True)
+
+    def finish(self):
+        if self.n_points < 2:
+            raise ValueError("Need at least 2 data points to interpolate.")
+
+        end = self.carry["Time"].iloc[-1]
+        yield from self._resample(self.carry,
+                                  int(np.ceil((end - self.start) / self.step)))
+
+
+def interpolate_chunks(chunks, rate_hz=30, block_rows=DEFAULT_CHUNKSIZE,
+                       methods=None, angle_cols=ANGLE_COLS):
+    """ Streaming version of interpolate over time-ordered chunks """
+
+    interp = ChunkInterpolator(rate_hz, block_rows, methods, angle_cols)
+    for chunk in chunks:
+        yield from interp.feed(chunk)
+    yield from interp.finish()
+
+
+def preprocess_flight_data(input_path, output_path, rate_hz=30, chunksize=None,
+                           cache_path=None, events_path=None, fix=None):
+    """ Preprocessing pipeline, streamed in chunks when chunksize is set.
+    With cache_path, the cleaned data is also written as a binary column
+    cache keyed on the raw input's fingerprint. With events_path or fix,
+    data-quality checks run between normalize and interpolate (see
+    src.quality) and their event table is saved to events_path. With
+    output_path None only the cache is written (the caller writes the CSV
+    once it has added its own columns) """
 
+    if output_path is None and cache_path is None:
+        raise ValueError("Nothing to write: give output_path or cache_path")
+    check = events_path is not None or fix is not None
+    events = []
 
-def preprocess_flight_data(input_path, output_path, rate_hz=30):
-    """ Preprocessing pipeline  """
+    cache = nullcontext()
+    if cache_path is not None:
+        cache = CacheWriter(cache_path, rate_hz=rate_hz,
+                            source=source_fingerprint(input_path))
 
-    df = load_csv(input_path)
-    df = normalize(df)
-    df = interpolate(df, rate_hz)
-    df.to_csv(output_path, index=False)
+    with cache as writer:
+        if chunksize:
+            n_rows = 0
+            out = nullcontext() if output_path is None else open(output_path, "w", newline="")
+            with out as f:
+                chunks = iter_csv_chunks(input_path, chunksize)
+                if check:
+                    chunks = check_chunks(chunks, events, rate_hz=rate_hz, fix=fix)
+                for part in interpolate_chunks(chunks, rate_hz, chunksize):
+                    if f is not None:
+                        with stage("write_csv", rows=len(part)):
+                            part.to_csv(f, header=(n_rows == 0), index=False)
+                    if writer is not None:
+                        with stage("write_cache", rows=len(part)):
+                            writer.append(part)
+                    n_rows += len(part)
+        else:
+            df = load_csv(input_path)
+            df = normalize(df)
+            if check:
+                df, found = check_quality(df, rate_hz=rate_hz, fix=fix)
+                events = [found]
+            df = interpolate(df, rate_hz)
+            if output_path is not None:
+                with stage("write_csv", rows=len(df)):
+                    df.to_csv(output_path, index=False)
+            if writer is not None:
+                with stage("write_cache", rows=len(df)):
+                    writer.append(df)
+            n_rows = len(df)
     
-    print(f" {len(df)} data points were processed at {rate_hz} Hz")
-    print(f" The values were saved to: {output_path}")
+    print(f" {n_rows} data points were processed at {rate_hz} Hz")
+    print(f" The values were saved to: {output_path or cache_path}")
+    if events_path is not None:
+        n_events = write_events(events, events_path)
+        print(f" {n_events} data-quality events were saved to: {events_path}")
     
     return output_path
@@ -0,0 +1,168 @@
+import numpy as np
+
+MIN_BUCKET = 4  # samples per bucket at the finest pyramid level
+
+
+class LODPyramid:
+    """ Min/max pyramid of one column for shape-preserving decimation.
+
+    Level k splits the samples into buckets of MIN_BUCKET * 2**k and
+    stores the index of each bucket's minimum and maximum, built from the
+    level below in O(n) total. A query keeps the extremes of every bucket
+    in the requested range, at the coarsest level that still has about
+    one bucket per screen pixel, so single-sample spikes survive and the
+    cost depends on the number of pixels, not samples. """
+
+    def __init__(self, values, min_bucket=MIN_BUCKET):
+        self.values = np.asarray(values, dtype=np.float64)
+        self.min_bucket = min_bucket
+        self.levels = []
+
+        n = len(self.values)
+        if n <= min_bucket:
+            return
+
+        n_buckets = -(-n // min_bucket)
+        padded = np.empty(n_buckets * min_bucket)
+        padded[:n] = self.values
+        padded[n:] = self.values[-1]
+        buckets = padded.reshape(n_buckets, min_bucket)
+        offsets = np.arange(0, n_buckets * min_bucket, min_bucket)
+        imin = np.minimum(buckets.argmin(axis=1) + offsets, n - 1)
+        imax = np.minimum(buckets.argmax(axis=1) + offsets, n - 1)
+        self.levels.append((imin, imax))
+
+        while len(imin) > 1:
+            if len(imin) % 2:
+                imin = np.append(imin, imin[-1])
+                imax = np.append(imax, imax[-1])
+            a, b = imin[0::2], imin[1::2]
+            imin = np.where(self.values[a] <= self.values[b], a, b)
+            a, b = imax[0::2], imax[1::2]
+            imax = np.where(self.values[a] >= self.values[b], a, b)
+            self.levels.append((imin, imax))
+
+    def bucket_size(self, level):
+        return self.min_bucket << level
+
+    def extremes(self, i0, i1, max_buckets):
+        """ Sorted indices in [i0, i1) that keep the shape of the column
+        with at most about 2 * max_buckets points """
+
+        count = i1 - i0
+        if count <= 2 * max_buckets or not self.levels:
+            return np.arange(i0, i1)
+
+        # Coarsest level with at least max_buckets buckets in the range
+        level = int(np.log2(max(count / (max_buckets * self.min_bucket), 1)))
+        level = min(level, len(self.levels) - 1)
+        size = self.bucket_size(level)
+        imin, imax = self.levels[level]
+        b0, b1 = i0 // size, (i1 - 1) // size + 1
+
+        idx = np.concatenate([[i0], imin[b0:b1], imax[b0:b1], [i1 - 1]])
+        # Partial buckets at either edge may have extremes outside the range
+        idx = idx[(idx >= i0) & (idx < i1)]
+        return np.unique(idx)
+
+
+def decimate(pyramids, i0, i1, max_buckets):
+    """ Union of the extremes of several columns (e.g. lon and lat of a
+    path, so both coordinates keep their turning points) """
+
+    return np.unique(np.concatenate(
+        [p.extremes(i0, i1, max_buckets) for p in pyramids]))
+
+
+def view_indices(x, pyramids, x0, x1, pixels):
+    """ Indices to draw for the x range [x0, x1] on an axis `pixels` wide.
+    x must be sorted; one sample either side of the range is kept so the
+    line runs to the edge of the view """
+
+    n = len(x)
+    i0 = max(int(np.searchsorted(x, x0, side="right")) - 1, 0)
+    i1 = min(int(np.searchsorted(x, x1, side="left")) + 1, n)
+    if i1 <= i0:
+        return np.empty(0, dtype=np.intp)
+    return decimate(pyramids, i0, i1, max(int(pixels), 1))
+
+
+MAX_PATH_LEVEL = 16  # finest path level: 2**16 times the full-view resolution
+
+
+class PathLOD:
+    """ Decimation of a path through 2 or 3 coordinates by its length on
+    screen.
+
+    The path length is measured with each coordinate divided by its scale
+    (the extent of the axis it is drawn on in the full view). Level k
+    keeps a sample each time the path has gone another 1 / (pixels * 2**k)
+    of that, so the drawn line stays within about a pixel of the full one
+    and, unlike per-coordinate extremes, has no gaps however it turns.
+    Levels are built on first use in O(n) and kept; a zoomed view uses the
+    level fine enough for its scale and only the samples in view. """
+
+    def __init__(self, columns, scales):
+        self.columns = [np.asarray(c, dtype=np.float64) for c in columns]
+        self.scales = [s if s > 0 else 1.0 for s in scales]
+        n = len(self.columns[0])
+        sq = np.zeros(max(n - 1, 0))
+        for c, s in zip(self.columns, self.scales):
+            sq += (np.diff(c) / s) ** 2
+        self.length = np.concatenate([[0.0], np.cumsum(np.sqrt(sq))])
+        self._levels = {}
+
+    def __len__(self):
+        return len(self.length)
+
+    def level(self, pixels, level):
+        """ Indices kept at a level for a full view `pixels` across """
+
+        key = (pixels, level)
+        if key not in self._levels:
+            n = len(self)
+            if n == 0:
+                idx = np.empty(0, dtype=np.intp)
+            else:
+                ticks = np.floor(self.length * (pixels << level))
+                idx = np.unique(np.concatenate([[0], np.flatnonzero(np.diff(ticks)) + 1,
+                                                [n - 1]]))
+            self._levels[key] = idx
+        return self._levels[key]
+
+    def span(self, pixels, start, stop):
+        """ Indices kept in the full view from sample start to stop, both
+        included: a trail drawn up to `stop` ends at the sample itself """
+
+        if stop <= start:
+            return np.array([start], dtype=np.intp)
+        idx = self.level(max(int(pixels), 1), 0)
+        lo = np.searchsorted(idx, start, side="right")
+        hi = np.searchsorted(idx, stop, side="left")
+        return np.concatenate([[start], idx[lo:hi], [stop]]).astype(np.intp)
+
+    def view(self, limits, pixels):
+        """ (indices, connected) to draw for the view with limits
+        [(lo, hi), ...] per coordinate on an axis `pixels` across.
+        connected[i] is False where the path leaves the view between
+        indices[i] and indices[i + 1], so no chord is drawn there """
+
+        pixels = max(int(pixels), 1)
+        zoom = min((hi - lo) / s for (lo, hi), s in zip(limits, self.scales))
+        level = 0
+        if 0 < zoom < 1:
+            level = min(int(np.ceil(np.log2(1 / zoom))), MAX_PATH_LEVEL)
+        idx = self.level(pixels, level)
+        if level == 0:
+            return idx, np.ones(max(len(idx) - 1, 0), dtype=bool)
+
+        inside = np.ones(len(idx), dtype=bool)
+        for c, (lo, hi) in zip(self.columns, limits):
+            values = c[idx]
+            inside &= (values >= min(lo, hi)) & (values <= max(lo, hi))
+        # One sample either side of the view, so the line runs to its edge
+        keep = inside.copy()
+        keep[1:] |= inside[:-1]
+        keep[:-1] |= inside[1:]
+        pos = np.flatnonzero(keep)
+        return idx[pos], np.diff(pos) == 1
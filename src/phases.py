@@ -0,0 +1,238 @@
+""" Flight-phase segmentation and the per-flight phase table
+
+Every sample of a cleaned flight is labelled taxi, takeoff, climb,
+cruise, descent, approach or landing from its height above the
+departure or arrival field, its ground speed and its vertical speed,
+each smoothed with a centred rolling mean. Thresholds come in pairs with
+hysteresis: a state is entered past one value and only left past the
+other, so noise around a threshold cannot make the label flicker. Runs
+shorter than min_seconds are then folded into the run before them.
+
+The result is a compact interval table, a handful of rows per flight
+giving each phase's row range [start, stop) and time range. From a
+column cache, flight_phases keeps the table in the cache header with a
+signature of its inputs, so replay, export and plotting can cut out a
+phase without classifying the flight again.
+
+Altitude is taken as metres and the field elevations as the lowest
+altitude the aircraft is slow at before and after its highest point, so
+one recording is one flight (a touch-and-go shows as a landing followed
+by a takeoff of the arrival side, not as two flights).
+
+Speed is the GroundSpeed derived from the track, as cleaned data has no
+airspeed. Attitude is not used: the recorder's roll and pitch mark a
+rotation or a flare, but not where the phases around them begin or end,
+which height, speed and climb rate already give.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.cache import add_columns, read_header
+from src.derived import DerivedChannels, _digest
+from src.profiling import stage
+from src.replay import FrameStore
+
+PHASES = ("taxi", "takeoff", "climb", "cruise", "descent", "approach", "landing")
+TAXI, TAKEOFF, CLIMB, CRUISE, DESCENT, APPROACH, LANDING = range(len(PHASES))
+
+PHASE_VERSION = 1
+
+# Channels the classification reads (GroundSpeed and VerticalSpeed are derived)
+PHASE_INPUTS = ("Time", "Altitude", "GroundSpeed", "VerticalSpeed")
+
+# Heights in m above the field, speeds in m/s, times in s. Pairs are
+# (low, high) hysteresis bands
+PHASE_LIMITS = {
+    "smooth_seconds": 8.0,
+    "runway_height": (10.0, 20.0),   # on the runway below low, airborne above high
+    "taxi_speed": (15.0, 25.0),      # a takeoff/landing roll above high, taxi below low
+    "climb_rate": (0.75, 1.5),       # climbing (descending) past high, level under low
+    "takeoff_height": 450.0,         # ~1500 ft: end of the takeoff
+    "approach_height": 900.0,        # ~3000 ft: start of the approach
+    "min_seconds": 15.0,
+}
+
+PHASE_COLUMNS = ["phase", "start", "stop", "start_time", "end_time"]
+
+
+def _rolling_mean(values, window):
+    """ Centred mean over `window` samples (made odd) from a running sum;
+    windows shrink at the edges """
+
+    x = np.asarray(values, dtype=np.float64)
+    n = len(x)
+    half = window // 2
+    offset = x[0] if n else 0.0  # keeps the running sum small
+    c = np.empty(n + 1)
+    c[0] = 0.0
+    np.cumsum(x - offset, out=c[1:])
+
+    out = np.empty(n)
+    w = 2 * half + 1
+    if n >= w:
+        out[half:n - half] = (c[w:] - c[:n + 1 - w]) / w
+        edges = np.r_[0:half, n - half:n]
+    else:
+        edges = np.arange(n)
+    lo = np.maximum(edges - half, 0)
+    hi = np.minimum(edges + half + 1, n)
+    out[edges] = (c[hi] - c[lo]) / (hi - lo)
+    return out + offset
+
+
+def _hysteresis(values, low, high, initial=False):
+    """ True from where values rise above high until they drop below low;
+    `initial` until the first value outside the band """
+
+    n = len(values)
+    last = np.where((values > high) | (values < low), np.arange(n), -1)
+    np.maximum.accumulate(last, out=last)
+    state = values[last] > high
+    state[last < 0] = initial
+    return state
+
+
+def _field(alt, speed, slow):
+    """ Field elevation: lowest altitude while taxiing, or -inf if the
+    aircraft never is (the recording starts or ends in the air) """
+    taxiing = speed < slow
+    return alt[taxiing].min() if taxiing.any() else -np.inf
+
+
+def phase_codes(time, altitude, speed, vertical_speed, limits=PHASE_LIMITS):
+    """ Phase of every sample, as an index into PHASES (int8) """
+
+    n = len(time)
+    if n == 0:
+        return np.empty(0, dtype=np.int8)
+    dt = (time[-1] - time[0]) / (n - 1) if n > 1 else 0.0
+    window = max(int(round(limits["smooth_seconds"] / dt)), 1) if dt > 0 else 1
+    alt = _rolling_mean(altitude, window)
+    speed = _rolling_mean(speed, window)
+    vs = _rolling_mean(vertical_speed, window)
+
+    # Departure side up to the highest point, arrival side after it
+    top = int(np.argmax(alt)) + 1
+    slow = limits["taxi_speed"][0]
+    height = np.empty(n)
+    height[:top] = alt[:top] - _field(alt[:top], speed[:top], slow)
+    height[top:] = alt[top:] - _field(alt[top:], speed[top:], slow)
+    departure = np.zeros(n, dtype=bool)
+    departure[:top] = True
+
+    runway = ~_hysteresis(height, *limits["runway_height"])
+    fast = _hysteresis(speed, *limits["taxi_speed"])
+    climbing = _hysteresis(vs, *limits["climb_rate"])
+    descending = _hysteresis(-vs, *limits["climb_rate"])
+
+    # Lowest priority first: each rule overwrites the ones before it
+    codes = np.full(n, CRUISE, dtype=np.int8)
+    codes[descending] = DESCENT
+    codes[climbing] = CLIMB
+    codes[~departure & (height < limits["approach_height"])] = APPROACH
+    codes[departure & (height < limits["takeoff_height"])] = TAKEOFF
+    codes[runway] = np.where(departure[runway], TAKEOFF, LANDING)
+    codes[runway & ~fast] = TAXI
+    return codes
+
+
+def phase_intervals(codes, time, min_seconds=PHASE_LIMITS["min_seconds"]):
+    """ (codes, starts, stops) of the runs of equal phase, with runs
+    shorter than min_seconds folded into the one before (the first
+    kept run, for short runs at the start) """
+
+    n = len(codes)
+    if n == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return codes[:0], empty, empty
+    starts = np.concatenate([[0], np.flatnonzero(np.diff(codes)) + 1])
+    stops = np.append(starts[1:], n)
+    duration = time[np.minimum(stops, n - 1)] - time[starts]
+    keep = duration >= min_seconds
+    if not keep.any():
+        keep[np.argmax(duration)] = True
+
+    owner = np.where(keep, np.arange(len(starts)), -1)
+    np.maximum.accumulate(owner, out=owner)
+    owner[owner < 0] = np.argmax(keep)
+    run_codes = codes[starts][owner]
+
+    first = np.concatenate([[True], run_codes[1:] != run_codes[:-1]])
+    starts = starts[first]
+    return run_codes[first], starts, np.append(starts[1:], n)
+
+
+def segment_phases(data, limits=PHASE_LIMITS):
+    """ Phase table of a flight (DataFrame or DerivedChannels) """
+
+    channels = data if isinstance(data, DerivedChannels) else DerivedChannels.from_df(data)
+    time = np.asarray(channels["Time"], dtype=np.float64)
+    inputs = [channels[name] for name in PHASE_INPUTS[1:]]
+    with stage("phases", rows=len(time)):
+        codes = phase_codes(time, *inputs, limits=limits)
+        codes, starts, stops = phase_intervals(codes, time, limits["min_seconds"])
+    return pd.DataFrame({
+        "phase": np.asarray(PHASES, dtype=object)[codes],
+        "start": starts, "stop": stops,
+        "start_time": time[starts], "end_time": time[stops - 1],
+    }, columns=PHASE_COLUMNS)
+
+
+def _signature(channels, limits):
+    return _digest({"version": PHASE_VERSION, "limits": limits,
+                    "inputs": [channels.signature(name) for name in PHASE_INPUTS]})
+
+
+def flight_phases(source, limits=PHASE_LIMITS, **options):
+    """ Phase table of a flight: a DataFrame, DerivedChannels or column
+    cache. A cache keeps the table in its header and it is reused while
+    the input channels and limits are unchanged """
+
+    if isinstance(source, (str, os.PathLike)):
+        source = DerivedChannels.from_cache(source, **options)
+    if not isinstance(source, DerivedChannels) or source.cache_path is None:
+        return segment_phases(source, limits)
+
+    signature = _signature(source, limits)
+    saved = read_header(source.cache_path).get("attrs", {}).get("phases")
+    if saved is not None and saved["signature"] == signature:
+        return pd.DataFrame(saved["table"], columns=PHASE_COLUMNS)
+
+    table = segment_phases(source, limits)
+    add_columns(source.cache_path, {}, attrs={"phases": {
+        "signature": signature,
+        "table": {name: table[name].tolist() for name in PHASE_COLUMNS},
+    }})
+    return table
+
+
+def phase_slices(table, phase):
+    """ Row slices of every occurrence of a phase in a phase table """
+
+    if phase not in PHASES:
+        raise ValueError(f"Unknown phase {phase!r}; use one of {', '.join(PHASES)}")
+    rows = table[table["phase"] == phase]
+    return [slice(int(start), int(stop)) for start, stop in zip(rows["start"], rows["stop"])]
+
+
+def select_phase(data, table, phase):
+    """ The rows of a flight's DataFrame or FrameStore that are in a phase.
+    One occurrence is a zero-copy slice; several (the two approaches of a
+    go-around) are joined in order """
+
+    slices = phase_slices(table, phase)
+    if isinstance(data, FrameStore):
+        return FrameStore.concat([data[s] for s in slices])
+    if len(slices) == 1:
+        return data.iloc[slices[0]]
+    rows = np.concatenate([np.arange(s.start, s.stop) for s in slices] or [[]])
+    return data.iloc[rows.astype(np.int64)]
+
+
+def phase_store(cache, phase, limits=PHASE_LIMITS, **options):
+    """ Memory-mapped replay frames of one phase of a cached flight """
+    return select_phase(FrameStore.from_cache(cache),
+                        flight_phases(cache, limits, **options), phase)
@@ -0,0 +1,187 @@
+import functools
+import json
+import os
+import platform
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+
+SAMPLE_INTERVAL = 0.005  # seconds between RSS samples while a stage runs
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_active = None  # the StageProfiler inside its `with` block, if any
+
+
+def current_rss():
+    """ Resident set size of this process in bytes (the peak so far where
+    /proc is not available) """
+
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except OSError:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+@dataclass
+class StageStats:
+    name: str
+    calls: int = 0
+    seconds: float = 0.0
+    rows: int = 0
+    start_rss: int = 0
+    peak_rss: int = 0
+
+    def as_dict(self):
+        d = asdict(self)
+        d["seconds"] = round(self.seconds, 6)
+        d["rows_per_s"] = round(self.rows / self.seconds) if self.seconds > 0 else 0
+        d["peak_rss_mb"] = round(self.peak_rss / 1e6, 1)
+        d["rss_growth_mb"] = round((self.peak_rss - self.start_rss) / 1e6, 1)
+        del d["start_rss"], d["peak_rss"]
+        return d
+
+
+class StageProfiler:
+    """ Wall time, rows/s and peak memory per pipeline stage.
+
+    Stages are entered with stage() or the profiled() decorator; repeated
+    calls (e.g. one per chunk) accumulate under the same name. Peak
+    memory is the process RSS, sampled by a background thread while any
+    stage is open, so numpy and pandas allocations are included without
+    slowing the stages down the way tracemalloc would. """
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stages = {}
+        self._open = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._start = None
+        self.seconds = 0.0
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self._update_peaks(current_rss())
+
+    def _update_peaks(self, rss):
+        with self._lock:
+            for stats in self._open:
+                stats.peak_rss = max(stats.peak_rss, rss)
+
+    def __enter__(self):
+        global _active
+        _active = self
+        self._start = time.perf_counter()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        global _active
+        _active = None
+        self._stop.set()
+        self._thread.join()
+        self.seconds = time.perf_counter() - self._start
+
+    @contextmanager
+    def stage(self, name, rows=0):
+        stats = self.stages.setdefault(name, StageStats(name))
+        rss = current_rss()
+        if stats.calls == 0:
+            stats.start_rss = stats.peak_rss = rss
+        with self._lock:
+            self._open.append(stats)
+        start = time.perf_counter()
+        try:
+            yield stats
+        finally:
+            stats.seconds += time.perf_counter() - start
+            stats.calls += 1
+            stats.rows += rows
+            self._update_peaks(current_rss())
+            with self._lock:
+                self._open.remove(stats)
+
+    def report(self):
+        from importlib import metadata
+
+        return {
+            "total_seconds": round(self.seconds, 4),
+            "peak_rss_mb": round(max((s.peak_rss for s in self.stages.values()),
+                                     default=current_rss()) / 1e6, 1),
+            "stages": [s.as_dict() for s in self.stages.values()],
+            "environment": {
+                "python": platform.python_version(),
+                # Read from package metadata: reporting must not import them
+                "numpy": metadata.version("numpy"),
+                "pandas": metadata.version("pandas"),
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+            },
+        }
+
+    def write(self, path, **extra):
+        with open(path, "w") as f:
+            json.dump({**extra, **self.report()}, f, indent=2)
+
+    def summary(self):
+        lines = [f"{'stage':<20}{'calls':>6}{'seconds':>10}{'rows/s':>14}{'peak MB':>10}"]
+        for s in self.report()["stages"]:
+            lines.append(f"{s['name']:<20}{s['calls']:>6}{s['seconds']:>10.3f}"
+                         f"{s['rows_per_s']:>14,}{s['peak_rss_mb']:>10.1f}")
+        return "\n".join(lines)
+
+
+@contextmanager
+def stage(name, rows=0):
+    """ Time a block as a stage of the active profiler (no-op without one) """
+
+    if _active is None:
+        yield None
+    else:
+        with _active.stage(name, rows) as stats:
+            yield stats
+
+
+def _count_rows(result, args):
+    for value in (result, *args[:1]):
+        if hasattr(value, "shape"):
+            return value.shape[0]
+    return 0
+
+
+def profiled(name):
+    """ Decorator recording every call as a stage. Rows are the length of
+    the returned frame/array, or else of the first argument """
+
+    def wrap(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _active is None:
+                return func(*args, **kwargs)
+            with _active.stage(name) as stats:
+                result = func(*args, **kwargs)
+                stats.rows += _count_rows(result, args)
+            return result
+        return wrapper
+    return wrap
+
+
+def timed_iter(iterable, name):
+    """ Yield from an iterable, timing each next() as a call of a stage """
+
+    it = iter(iterable)
+    while True:
+        with stage(name) as stats:
+            item = next(it, None)
+            if stats is not None and item is not None:
+                stats.rows += len(item)
+        if item is None:
+            return
+        yield item
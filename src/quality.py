@@ -0,0 +1,202 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from src.profiling import profiled
+
+# Column -> (max rate of change per second, noise floor for z-scores,
+# wrap period or None). Limits are generous for transport aircraft: a
+# sample has to be physically implausible to be flagged
+CHANNEL_LIMITS = {
+    "Latitude": (0.01, 1e-5, None),
+    "Longitude": (0.01, 1e-5, None),
+    "Altitude": (150.0, 1.0, None),
+    "Roll": (90.0, 0.5, None),
+    "Pitch": (45.0, 0.5, None),
+    "Yaw": (120.0, 1.0, 360.0),
+}
+
+FIXES = ("drop", "repair")
+
+EVENT_COLUMNS = ["channel", "kind", "start_time", "end_time",
+                 "start_index", "end_index", "samples", "value"]
+
+
+def _runs(mask):
+    """ (start, end) indices of each run of True, ends inclusive """
+
+    edges = np.diff(np.concatenate([[0], mask.view(np.int8), [0]]))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1) - 1
+
+
+def _events(mask, values, time, channel, kind):
+    if not mask.any():
+        return None
+    starts, ends = _runs(mask)
+    padded = np.append(values, 0.0)  # reduceat needs ends + 1 in range
+    peak = np.maximum.reduceat(padded, np.ravel(np.column_stack([starts, ends + 1])))[::2]
+    return pd.DataFrame({
+        "channel": channel, "kind": kind,
+        "start_time": time[starts], "end_time": time[ends],
+        "start_index": starts, "end_index": ends,
+        "samples": ends - starts + 1, "value": peak,
+    })
+
+
+def rate_violations(time, values, limit, period=None):
+    """ Spikes (out and straight back) and jumps (a step that stays) in the
+    rate of change; returns (spike mask, jump mask, |rate| into each sample) """
+
+    d = np.diff(values)
+    if period is not None:
+        d = (d + period / 2) % period - period / 2
+    rate = np.abs(d) / np.diff(time)
+    into = np.concatenate([[False], rate > limit])
+    out = np.concatenate([rate > limit, [False]])
+    sign = np.sign(d)
+    opposite = np.concatenate([[False], sign[:-1] != sign[1:], [False]])
+
+    spike = into & out & opposite
+    after_spike = np.concatenate([[False], spike[:-1]])
+    jump = into & ~spike & ~after_spike
+    return spike, jump, np.concatenate([[0.0], rate])
+
+
+def rolling_zscore(values, window=31, floor=0.0, block=1 << 16):
+    """ |x - mean| / std of each sample against the other samples of a
+    centred window (leave-one-out, so a lone outlier can't hide itself).
+    Windows shrink at the edges. Each window's mean and spread come from
+    its own samples, `block` windows at a time, not from running sums:
+    those lose the noise of a long series under its accumulated level """
+
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    half = window // 2
+    if n == 0:
+        return np.zeros(0)
+    pad = np.zeros(half)
+    windows = sliding_window_view(np.concatenate([pad, values, pad]), 2 * half + 1)
+    offsets = np.arange(-half, half + 1)
+    # Which window slots hold other samples: all but the centre, except
+    # within half a window of either end
+    interior = offsets != 0
+
+    z = np.empty(n)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for start in range(0, n, block):
+            stop = min(start + block, n)
+            if start >= half and stop <= n - half:
+                keep, count = interior, np.full(stop - start, 2.0 * half)
+            else:
+                at = np.arange(start, stop)[:, None] + offsets
+                keep = (at >= 0) & (at < n) & interior
+                count = keep.sum(axis=1).astype(np.float64)
+            w = windows[start:stop]
+            mean = np.where(keep, w, 0.0).sum(axis=1) / count
+            dev = np.where(keep, w - mean[:, None], 0.0)
+            std = np.sqrt(np.einsum("ij,ij->i", dev, dev) / count)
+            np.maximum(std, floor, out=std)
+            part = np.abs(values[start:stop] - mean) / std
+            part[count < 3] = 0.0
+            z[start:stop] = part
+    z[~np.isfinite(z)] = 0.0
+    return z
+
+
+def _repair(time, values, bad, period=None):
+    good = ~bad
+    if good.sum() < 2:
+        return values
+    series = np.unwrap(values, period=period) if period else values
+    fixed = series.copy()
+    fixed[bad] = np.interp(time[bad], time[good], series[good])
+    if period:
+        lo = -period / 2 if values.min() < 0 else 0.0
+        fixed = (fixed - lo) % period + lo
+    return fixed
+
+
+@profiled("check_quality")
+def check_quality(df, rate_hz=30, limits=CHANNEL_LIMITS, gap_factor=5.0,
+                  window=31, z_threshold=6.0, fix=None):
+    """ Flag implausible samples in normalized flight data before it is
+    interpolated. Returns (data, events).
+
+    Per channel: rate-of-change spikes and jumps against `limits`, and
+    rolling z-score outliers. Time gaps longer than gap_factor sample
+    periods (the median spacing, or 1/rate_hz if longer) are reported
+    too. Every check is a whole-array numpy pass. events has one row per
+    run of flagged samples. fix="drop" removes rows with a spike or
+    outlier, fix="repair" replaces those values by interpolating the
+    good samples around them; gaps and jumps are only reported. """
+
+    if fix is not None and fix not in FIXES:
+        raise ValueError(f"Unknown fix {fix!r}; use one of {FIXES}")
+    time = df["Time"].to_numpy(dtype=np.float64)
+    tables = []
+    bad_rows = np.zeros(len(df), dtype=bool)
+    repaired = {}
+
+    if len(df) > 1:
+        dt = np.diff(time)
+        max_gap = gap_factor * max(float(np.median(dt)), 1.0 / rate_hz)
+        gap = np.concatenate([[False], dt > max_gap])
+        tables.append(_events(gap, np.concatenate([[0.0], dt]), time, "Time", "gap"))
+
+        for channel, (limit, floor, period) in limits.items():
+            if channel not in df.columns:
+                continue
+            values = df[channel].to_numpy(dtype=np.float64)
+            spike, jump, rate = rate_violations(time, values, limit, period)
+            series = np.unwrap(values, period=period) if period else values
+            z = rolling_zscore(series, window, floor)
+            outlier = (z > z_threshold) & ~spike
+
+            tables.append(_events(spike, rate, time, channel, "spike"))
+            tables.append(_events(jump, rate, time, channel, "jump"))
+            tables.append(_events(outlier, z, time, channel, "outlier"))
+
+            bad = spike | outlier
+            bad_rows |= bad
+            if fix == "repair" and bad.any():
+                repaired[channel] = _repair(time, values, bad, period)
+
+    tables = [t for t in tables if t is not None]
+    events = (pd.concat(tables, ignore_index=True)
+              .sort_values(["start_time", "channel"], kind="stable")
+              .reset_index(drop=True)
+              if tables else pd.DataFrame(columns=EVENT_COLUMNS))
+
+    if fix == "drop":
+        df = df[~bad_rows].reset_index(drop=True)
+    elif fix == "repair" and repaired:
+        df = df.assign(**repaired)
+    return df, events
+
+
+def check_chunks(chunks, events, **kwargs):
+    """ check_quality over a stream of normalized chunks, yielding the
+    (fixed) chunks. Event tables are appended to the `events` list with
+    indices counted from the start of the stream; checks do not look
+    across chunk boundaries """
+
+    offset = 0
+    for chunk in chunks:
+        n = len(chunk)
+        chunk, found = check_quality(chunk, **kwargs)
+        if len(found):
+            found[["start_index", "end_index"]] += offset
+            events.append(found)
+        offset += n
+        if len(chunk):
+            yield chunk
+
+
+def write_events(events, path):
+    """ Save an event table (or a list of them) as CSV; returns the count """
+
+    if isinstance(events, list):
+        events = (pd.concat(events, ignore_index=True) if events
+                  else pd.DataFrame(columns=EVENT_COLUMNS))
+    events.to_csv(path, index=False)
+    return len(events)
@@ -0,0 +1,239 @@
+import os
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from matplotlib import rcParams
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from PIL import Image, ImageSequence
+
+from src.lod import PathLOD
+
+VIDEO_FORMATS = (".mp4", ".gif", ".png")
+
+
+def frame_indices(time, fps=30, speed=1.0):
+    """ Sample shown in each output frame: the last one at or before the
+    frame's replay time, with frames every speed / fps seconds """
+
+    if len(time) == 0:
+        return np.empty(0, dtype=np.intp)
+    times = np.arange(time[0], time[-1] + 1e-9, speed / fps)
+    return np.searchsorted(time, times, side="right") - 1
+
+
+class TrailRenderer:
+    """ Off-screen top-down replay on an Agg canvas (no display needed).
+
+    The trail is baked into a saved background, so each frame restores
+    it, draws only the samples since the previous frame and the aircraft
+    marker on top. Work per frame is independent of how far into the
+    flight it is; long segments are decimated by their length on screen
+    (PathLOD), like the static plots' paths. """
+
+    def __init__(self, x, y, size=(8, 6), dpi=100):
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+        self.lod = PathLOD([self.x, self.y], [np.ptp(self.x), np.ptp(self.y)])
+
+        self.fig = Figure(figsize=size, dpi=dpi)
+        self.canvas = FigureCanvasAgg(self.fig)
+        ax = self.ax = self.fig.add_subplot()
+        ax.set_xlim(self.x.min(), self.x.max())
+        ax.set_ylim(self.y.min(), self.y.max())
+        ax.set_xlabel("X (m)")
+        ax.set_ylabel("Y (m)")
+        ax.set_title("Flight Replay (Top-Down)")
+        self.fig.tight_layout()
+
+        self.path, = ax.plot([], [], "b-", linewidth=1, alpha=0.6, animated=True)
+        self.point, = ax.plot([], [], "ro", markersize=8, animated=True)
+        self.pixels = max(int(ax.bbox.width), int(ax.bbox.height), 1)
+
+        self.canvas.draw()
+        self.background = self.canvas.copy_from_bbox(self.fig.bbox)
+        self.drawn = 0  # trail is in the background up to this sample
+
+    def _bake_trail(self, i0, i1):
+        idx = self.lod.span(self.pixels, i0, i1)
+        self.path.set_data(self.x[idx], self.y[idx])
+        self.ax.draw_artist(self.path)
+        self.background = self.canvas.copy_from_bbox(self.fig.bbox)
+        self.drawn = i1
+
+    def seek(self, i):
+        """ Bake the trail up to sample i in one decimated pass """
+        self.canvas.restore_region(self.background)
+        self._bake_trail(self.drawn, i)
+
+    def render(self, i):
+        """ RGBA image (a view of the canvas buffer) with the aircraft at sample i """
+
+        self.canvas.restore_region(self.background)
+        if i > self.drawn:
+            self._bake_trail(self.drawn, i)
+        self.point.set_data([self.x[i]], [self.y[i]])
+        self.ax.draw_artist(self.point)
+        return np.asarray(self.canvas.buffer_rgba())
+
+
+class _PNGWriter:
+    """ Numbered PNG files: replay.png -> replay_00000.png, ... """
+
+    def __init__(self, path, fps, first=0):
+        path = Path(path)
+        self.pattern = str(path.with_name(path.stem + "_%05d" + path.suffix))
+        self.index = first
+
+    def write(self, frame):
+        # Fast zlib level: encoding, not drawing, dominates the frame time
+        Image.fromarray(frame).save(self.pattern % self.index, compress_level=1)
+        self.index += 1
+
+    def close(self):
+        pass
+
+
+def _to_palette(image):
+    return image.convert("RGB").quantize(256, method=Image.Quantize.FASTOCTREE)
+
+
+class _GIFWriter:
+    """ Frames are kept as 8-bit palette images until close """
+
+    def __init__(self, path, fps, first=0):
+        self.path = path
+        self.duration = 1000 / fps
+        self.frames = []
+
+    def write(self, frame):
+        self.frames.append(_to_palette(Image.fromarray(frame)))
+
+    def close(self):
+        if self.frames:
+            self.frames[0].save(self.path, save_all=True, loop=0,
+                                append_images=self.frames[1:],
+                                duration=self.duration)
+
+
+def _ffmpeg():
+    path = shutil.which(rcParams["animation.ffmpeg_path"])
+    if path is None:
+        raise RuntimeError("MP4 output needs ffmpeg on PATH; "
+                           "use a .gif or .png output instead")
+    return path
+
+
+class _MP4Writer:
+    """ Raw frames piped to ffmpeg (H.264) """
+
+    def __init__(self, path, fps, first=0):
+        self.path = path
+        self.fps = fps
+        self.proc = None
+
+    def write(self, frame):
+        if self.proc is None:
+            height, width = frame.shape[:2]
+            self.proc = subprocess.Popen(
+                [_ffmpeg(), "-y", "-loglevel", "error",
+                 "-f", "rawvideo", "-pix_fmt", "rgba",
+                 "-s", f"{width}x{height}", "-r", str(self.fps), "-i", "-",
+                 # yuv420p needs even dimensions
+                 "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2",
+                 "-c:v", "libx264", "-pix_fmt", "yuv420p", str(self.path)],
+                stdin=subprocess.PIPE)
+        self.proc.stdin.write(frame.tobytes())
+
+    def close(self):
+        if self.proc is not None:
+            self.proc.stdin.close()
+            if self.proc.wait():
+                raise RuntimeError(f"ffmpeg failed writing {self.path}")
+
+
+WRITERS = {".png": _PNGWriter, ".gif": _GIFWriter, ".mp4": _MP4Writer}
+
+
+def _render_range(x, y, indices, output, fps, first, size, dpi):
+    """ Render frames for the given sample indices into one output """
+
+    renderer = TrailRenderer(x, y, size, dpi)
+    if len(indices) and indices[0] > 0:
+        renderer.seek(indices[0])  # a later range starts mid-flight
+    writer = WRITERS[Path(output).suffix.lower()](output, fps, first)
+    try:
+        for i in indices:
+            writer.write(renderer.render(i))
+    finally:
+        writer.close()
+    return len(indices)
+
+
+def _concat(parts, output, fps):
+    suffix = Path(output).suffix.lower()
+    if suffix == ".mp4":
+        with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as f:
+            f.writelines(f"file '{Path(p).resolve()}'\n" for p in parts)
+        try:
+            subprocess.run([_ffmpeg(), "-y", "-loglevel", "error", "-f", "concat",
+                            "-safe", "0", "-i", f.name, "-c", "copy", str(output)],
+                           check=True)
+        finally:
+            os.unlink(f.name)
+    elif suffix == ".gif":
+        writer = _GIFWriter(output, fps)
+        for part in parts:
+            with Image.open(part) as im:
+                writer.frames.extend(_to_palette(frame)
+                                     for frame in ImageSequence.Iterator(im))
+        writer.close()
+
+
+def render_replay(time, x, y, output, fps=30, speed=1.0, workers=1,
+                  size=(8, 6), dpi=100):
+    """ Write a top-down replay video without a display.
+
+    The output format follows the suffix: .mp4 (needs ffmpeg), .gif, or
+    .png for a numbered image sequence. Replay time is sampled at `fps`
+    frames per second of output, `speed` times faster than real time.
+    With workers > 1, contiguous frame ranges are rendered in separate
+    processes and joined. Returns the number of frames. """
+
+    suffix = Path(output).suffix.lower()
+    if suffix not in WRITERS:
+        raise ValueError(f"Unsupported video format {suffix!r}; "
+                         f"use one of {', '.join(VIDEO_FORMATS)}")
+    if suffix == ".mp4":
+        _ffmpeg()
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    indices = frame_indices(np.asarray(time, dtype=np.float64), fps, speed)
+    workers = min(workers or 1, max(len(indices), 1))
+    if workers < 2:
+        return _render_range(x, y, indices, output, fps, 0, size, dpi)
+
+    bounds = np.linspace(0, len(indices), workers + 1).astype(int)
+    ranges = [(lo, hi) for lo, hi in zip(bounds[:-1], bounds[1:])]
+    # PNG frames go straight to their final names; other formats are joined
+    parts = [output if suffix == ".png" else
+             Path(output).with_name(f"{Path(output).stem}.part{k}{suffix}")
+             for k in range(workers)]
+    try:
+        with ProcessPoolExecutor(workers) as pool:
+            futures = [pool.submit(_render_range, x, y, indices[lo:hi], part,
+                                   fps, lo, size, dpi)
+                       for (lo, hi), part in zip(ranges, parts)]
+            frames = sum(f.result() for f in futures)
+        if suffix != ".png":
+            _concat(parts, output, fps)
+    finally:
+        if suffix != ".png":
+            for part in parts:
+                Path(part).unlink(missing_ok=True)
+    return frames
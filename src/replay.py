@@ -1,25 +1,149 @@
-import numpy as np
+import threading
+import time
 from dataclasses import dataclass
+
+import numpy as np
 import pandas as pd
 
+from src.archive import ArchiveReader
+from src.cache import open_columns
+from src.fdr_binary import open_binary_fdr
+from src.loader import ResamplePlan, resample_columns
+from src.profiling import profiled
+
 R_EARTH = 6371000  # Earth radius in meters
 
-def latlon_to_xyz(lat, lon, alt_m):
-    """ Convert the lat, lon, alt values into ECEF XYZ coordinates    """
+# WGS-84 ellipsoid
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+WGS84_E2 = WGS84_F * (2 - WGS84_F)
+WGS84_B = WGS84_A * (1 - WGS84_F)
+
+EARTH_MODELS = {
+    "sphere": (float(R_EARTH), 0.0),
+    "wgs84": (WGS84_A, WGS84_E2),
+}
+
+XYZ_CHUNK = 65536
+
+
+def _geodetic_to_ecef(lat, lon, alt_m, a, e2, chunk=XYZ_CHUNK):
+    """ Chunked ECEF kernel: sin/cos are computed once per point into
+    reusable scratch buffers and results are written straight into the
+    output arrays, so no full-length temporaries are allocated """
+
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    alt_m = np.broadcast_to(np.asarray(alt_m, dtype=np.float64), lat.shape)
+    n = len(lat)
+    x, y, z = np.empty(n), np.empty(n), np.empty(n)
+
+    m = min(chunk, n)
+    sin_lat, cos_lat, sin_lon, cos_lon, r = (np.empty(m) for _ in range(5))
+    for start in range(0, n, chunk):
+        stop = min(start + chunk, n)
+        k = stop - start
+        sl, cl, so, co, rr = sin_lat[:k], cos_lat[:k], sin_lon[:k], cos_lon[:k], r[:k]
+        h = alt_m[start:stop]
+
+        np.radians(lat[start:stop], out=sl)
+        np.cos(sl, out=cl)
+        np.sin(sl, out=sl)
+        np.radians(lon[start:stop], out=so)
+        np.cos(so, out=co)
+        np.sin(so, out=so)
+
+        if e2:
+            # Prime vertical radius N = a / sqrt(1 - e2 sin^2(lat))
+            np.multiply(sl, sl, out=rr)
+            rr *= -e2
+            rr += 1.0
+            np.sqrt(rr, out=rr)
+            np.divide(a, rr, out=rr)
+            # z = (N (1 - e2) + h) sin(lat)
+            zz = z[start:stop]
+            np.multiply(rr, 1.0 - e2, out=zz)
+            zz += h
+            zz *= sl
+            rr += h
+        else:
+            np.add(a, h, out=rr)
+            np.multiply(rr, sl, out=z[start:stop])
+
+        # (N + h) cos(lat) is shared by x and y
+        rr *= cl
+        np.multiply(rr, co, out=x[start:stop])
+        np.multiply(rr, so, out=y[start:stop])
 
-    lat = np.radians(lat)
-    lon = np.radians(lon)
-    r = R_EARTH + alt_m
-    
-    x = r * np.cos(lat) * np.cos(lon)
-    y = r * np.cos(lat) * np.sin(lon)
-    z = r * np.sin(lat)
-    
     return x, y, z
 
 
-def compute_xyz(df, alt_unit="m"):
-    """ Write the X, Y, Z coordinates into a dataframe"""
+def latlon_to_xyz(lat, lon, alt_m, model="sphere"):
+    """ Convert the lat, lon, alt values into ECEF XYZ coordinates    """
+
+    if model not in EARTH_MODELS:
+        raise ValueError(f"Unknown earth model {model!r}, expected one of {list(EARTH_MODELS)}")
+    a, e2 = EARTH_MODELS[model]
+    return _geodetic_to_ecef(lat, lon, alt_m, a, e2)
+
+
+def ecef_to_latlon(x, y, z):
+    """ Convert WGS-84 ECEF XYZ back into lat, lon (deg) and alt (m)
+    (Bowring's method, sub-millimetre at aircraft altitudes) """
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    z = np.asarray(z, dtype=np.float64)
+    ep2 = (WGS84_A ** 2 - WGS84_B ** 2) / WGS84_B ** 2
+
+    p = np.hypot(x, y)
+    theta = np.arctan2(z * WGS84_A, p * WGS84_B)
+    st, ct = np.sin(theta), np.cos(theta)
+    lat = np.arctan2(z + ep2 * WGS84_B * st ** 3, p - WGS84_E2 * WGS84_A * ct ** 3)
+    lon = np.arctan2(y, x)
+
+    sl, cl = np.sin(lat), np.cos(lat)
+    alt = p * cl + z * sl - WGS84_A * np.sqrt(1.0 - WGS84_E2 * sl * sl)
+    return np.degrees(lat), np.degrees(lon), alt
+
+
+def _enu_rotation(lat0, lon0):
+    sl, cl = np.sin(np.radians(lat0)), np.cos(np.radians(lat0))
+    so, co = np.sin(np.radians(lon0)), np.cos(np.radians(lon0))
+    return np.array([
+        [-so, co, 0.0],
+        [-sl * co, -sl * so, cl],
+        [cl * co, cl * so, sl],
+    ])
+
+
+def ecef_to_enu(x, y, z, lat0, lon0, alt0=0.0):
+    """ East/North/Up (m) of WGS-84 ECEF points relative to a reference point """
+
+    origin = np.array(latlon_to_xyz([lat0], [lon0], [alt0], model="wgs84"))[:, 0]
+    d = np.stack([np.asarray(x, dtype=np.float64),
+                  np.asarray(y, dtype=np.float64),
+                  np.asarray(z, dtype=np.float64)])
+    d -= origin[:, None]
+    e, n, u = _enu_rotation(lat0, lon0) @ d
+    return e, n, u
+
+
+def enu_to_ecef(e, n, u, lat0, lon0, alt0=0.0):
+    """ Inverse of ecef_to_enu """
+
+    origin = np.array(latlon_to_xyz([lat0], [lon0], [alt0], model="wgs84"))[:, 0]
+    d = _enu_rotation(lat0, lon0).T @ np.stack([np.asarray(e, dtype=np.float64),
+                                                np.asarray(n, dtype=np.float64),
+                                                np.asarray(u, dtype=np.float64)])
+    d += origin[:, None]
+    return d[0], d[1], d[2]
+
+
+@profiled("compute_xyz")
+def compute_xyz(df, alt_unit="m", model="sphere"):
+    """ Write the X, Y, Z coordinates into a dataframe
+    (model="wgs84" for ellipsoidal ECEF, "sphere" for the legacy R_EARTH) """
 
     alt = df["Altitude"].values
     if alt_unit == "ft":
@@ -28,36 +152,23 @@ def compute_xyz(df, alt_unit="m"):
     x, y, z = latlon_to_xyz(
         df["Latitude"].values,
         df["Longitude"].values,
-        alt
+        alt,
+        model=model
     )
     
     return df.assign(X=x, Y=y, Z=z)  
 
 
 def generate_replay_frames(df):
-    """ Convert the flight data into FDRFrame objects    """
+    """ Convert the flight data into a FrameStore of FDRFrame records """
 
     if df is None or df.empty:
-        return []
-
-    frames = []
-    for r in df[["Time", "Latitude", "Longitude", "Altitude",
-        "Roll (deg)", "Pitch (deg)", "Yaw (deg)"]].itertuples(index=False):
-
-        frames.append(FDRFrame(
-            time=float(r[0]),
-            lat=float(r[1]),
-            lon=float(r[2]),
-            alt=float(r[3]),
-            roll=float(r[4]),
-            pitch=float(r[5]),
-            yaw=float(r[6])
-        ))
+        return FrameStore.empty()
 
-    return frames
+    return FrameStore.from_df(df)
 
 
-@dataclass
+@dataclass(slots=True)
 class FDRFrame:
     time: float
     lat: float
@@ -67,6 +178,232 @@ class FDRFrame:
     pitch: float
     yaw: float
 
+
+# FrameStore array name -> DataFrame column (first match wins)
+FRAME_COLUMNS = {
+    "time": ("Time",),
+    "lat": ("Latitude",),
+    "lon": ("Longitude",),
+    "alt": ("Altitude",),
+    "roll": ("Roll (deg)", "Roll"),
+    "pitch": ("Pitch (deg)", "Pitch"),
+    "yaw": ("Yaw (deg)", "Yaw"),
+}
+OPTIONAL_COLUMNS = {"x": ("X",), "y": ("Y",), "z": ("Z",)}
+
+_ITER_BLOCK = 4096
+
+
+class TimeIndex:
+    """ Timestamp -> row lookup over a sorted time array.
+
+    On a uniform grid (the output of interpolate) the row is computed
+    from the start time and step and only checked against its two
+    neighbours; where that check fails (raw, irregular data) it falls
+    back to a binary search. Either way only a handful of elements are
+    read, so the time array can be memory-mapped. """
+
+    __slots__ = ("time", "start", "step")
+
+    def __init__(self, time):
+        self.time = time
+        n = len(time)
+        self.start = float(time[0]) if n else 0.0
+        self.step = (float(time[-1]) - self.start) / (n - 1) if n > 1 else 0.0
+
+    def index(self, t):
+        """ Row of the last sample at or before t, -1 if t is before the start """
+
+        time, n = self.time, len(self.time)
+        if self.step > 0:
+            g = (t - self.start) / self.step
+            if 0 <= g < n:
+                g = int(g)
+                # One step either way absorbs rounding in the division
+                if g > 0 and time[g] > t:
+                    g -= 1
+                elif g + 1 < n and time[g + 1] <= t:
+                    g += 1
+                if time[g] <= t and (g + 1 == n or t < time[g + 1]):
+                    return g
+        return int(np.searchsorted(time, t, side="right")) - 1
+
+    def indices(self, t):
+        """ index() for an array of timestamps """
+
+        time, n = self.time, len(self.time)
+        t = np.asarray(t, dtype=np.float64)
+        if self.step <= 0:
+            return np.searchsorted(time, t, side="right") - 1
+
+        with np.errstate(invalid="ignore"):
+            g = (t - self.start) / self.step
+            valid = (g >= 0) & (g < n)
+        g = np.where(valid, g, 0).astype(np.intp)
+        g -= (g > 0) & (time[g] > t)
+        after = np.minimum(g + 1, n - 1)
+        g += (g + 1 < n) & (time[after] <= t)
+        after = np.minimum(g + 1, n - 1)
+        ok = valid & (time[g] <= t) & ((g + 1 == n) | (t < time[after]))
+        if not ok.all():
+            g[~ok] = np.searchsorted(time, t[~ok], side="right") - 1
+        return g
+
+    def left(self, t):
+        """ Row of the first sample at or after t (len if past the end) """
+
+        i = self.index(t)
+        if i >= 0 and self.time[i] == t:
+            if i > 0 and self.time[i - 1] == t:  # repeated timestamps
+                return int(np.searchsorted(self.time, t, side="left"))
+            return i
+        return i + 1
+
+
+class FrameStore:
+    """ Struct-of-arrays container of replay frames.
+
+    Each channel is one contiguous float64 array. Slicing returns a new
+    store over views of the same arrays, lookups by timestamp are a
+    TimeIndex lookup, and iteration creates one slotted FDRFrame at a
+    time instead of keeping a Python object per row. Stores opened with
+    from_cache or from_fdr are memory-mapped, so seeking in a long flight only reads
+    the pages around the requested time. """
+
+    __slots__ = ("time", "lat", "lon", "alt", "roll", "pitch", "yaw",
+                 "x", "y", "z", "_index")
+
+    def __init__(self, time, lat, lon, alt, roll, pitch, yaw,
+                 x=None, y=None, z=None):
+        self.time = time
+        self.lat = lat
+        self.lon = lon
+        self.alt = alt
+        self.roll = roll
+        self.pitch = pitch
+        self.yaw = yaw
+        self.x = x
+        self.y = y
+        self.z = z
+        self._index = None
+
+    @classmethod
+    def empty(cls):
+        return cls(*(np.empty(0) for _ in FRAME_COLUMNS))
+
+    @classmethod
+    def concat(cls, stores):
+        """ The frames of several stores in order (a copy, unless there is
+        only one); X/Y/Z are kept if every store has them """
+
+        stores = list(stores)
+        if len(stores) <= 1:
+            return stores[0] if stores else cls.empty()
+        names = list(FRAME_COLUMNS)
+        if all(s.has_xyz for s in stores):
+            names += list(OPTIONAL_COLUMNS)
+        return cls(**{k: np.concatenate([getattr(s, k) for s in stores]) for k in names})
+
+    @classmethod
+    def from_df(cls, df):
+        """ Wrap the columns of a DataFrame or a dict of arrays
+        (no copy when already float64) """
+
+        def column(names, required=True):
+            for name in names:
+                if name in df:
+                    return np.asarray(df[name], dtype=np.float64)
+            if required:
+                raise KeyError(f"Missing column: {names[0]}")
+            return None
+
+        arrays = {k: column(v) for k, v in FRAME_COLUMNS.items()}
+        arrays.update({k: column(v, required=False)
+                       for k, v in OPTIONAL_COLUMNS.items()})
+        return cls(**arrays)
+
+    @classmethod
+    def from_cache(cls, path):
+        """ Read-only store over the memory-mapped columns of a cache """
+        return cls.from_df(open_columns(path))
+
+    @classmethod
+    def from_fdr(cls, path):
+        """ Read-only store over the memory-mapped records of a binary
+        .fdrb file; each channel is a strided view, nothing is copied """
+        records = open_binary_fdr(path)
+        return cls.from_df({name: records[name] for name in records.dtype.names})
+
+    @classmethod
+    def from_archive(cls, path, t0=None, t1=None, workers=None):
+        """ Store over a compressed .fda archive (or the part of it between
+        t0 and t1); only the replay channels' blocks are decoded """
+        reader = ArchiveReader(path)
+        wanted = {c for names in (*FRAME_COLUMNS.values(), *OPTIONAL_COLUMNS.values())
+                  for c in names}
+        return cls.from_df(reader.read([c for c in reader.columns if c in wanted],
+                                       t0, t1, workers))
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = TimeIndex(self.time)
+        return self._index
+
+    @property
+    def has_xyz(self):
+        return self.x is not None
+
+    def _channels(self):
+        names = list(FRAME_COLUMNS) + (list(OPTIONAL_COLUMNS) if self.has_xyz else [])
+        return {name: getattr(self, name) for name in names}
+
+    def __len__(self):
+        return len(self.time)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return FrameStore(**{k: v[key] for k, v in self._channels().items()})
+
+        i = range(len(self))[key]
+        return FDRFrame(*(float(getattr(self, k)[i]) for k in FRAME_COLUMNS))
+
+    def __iter__(self):
+        arrays = [getattr(self, k) for k in FRAME_COLUMNS]
+        for start in range(0, len(self), _ITER_BLOCK):
+            block = [a[start:start + _ITER_BLOCK].tolist() for a in arrays]
+            for values in zip(*block):
+                yield FDRFrame(*values)
+
+    def index_at(self, t):
+        """ Index of the last frame at or before time t (first if before start) """
+        return min(max(self.index.index(t), 0), len(self) - 1)
+
+    def frame_at(self, t):
+        return self[self.index_at(t)]
+
+    def window(self, t0, t1):
+        """ Zero-copy store of the frames with t0 <= time < t1 """
+        return self[self.index.left(t0):self.index.left(t1)]
+
+    between = window
+
+    def sample(self, t):
+        """ Frame(s) linearly interpolated at arbitrary timestamps, yaw
+        along the shortest arc. A scalar t gives an FDRFrame, an array a
+        new FrameStore; times outside the flight hold the edge frame """
+
+        scalar = np.ndim(t) == 0
+        t = np.atleast_1d(np.asarray(t, dtype=np.float64))
+        channels = self._channels()
+        del channels["time"]
+        plan = ResamplePlan(self.time, t, j=self.index.indices(t))
+        values = resample_columns(self.time, t, channels,
+                                  angle_cols={"yaw": 360.0}, plan=plan)
+        store = FrameStore(time=t, **values)
+        return store[0] if scalar else store
+
+
 def generate_fdr_frames(df):
     if df is None or df.empty:
         return iter(())
@@ -76,4 +413,159 @@ def generate_fdr_frames(df):
             time=float(r[0]), lat=float(r[2]), lon=float(r[1]),
             alt=float(r[3]), roll=float(r[4]), pitch=float(r[5]),
             yaw=float(r[6])
-        )
\ No newline at end of file
+        )
+
+
+@dataclass
+class ReplayStats:
+    """ Pacing statistics of a real-time replay (seconds) """
+
+    frames: int = 0
+    late: int = 0
+    max_jitter: float = 0.0
+    sum_jitter: float = 0.0
+    sum_sq_jitter: float = 0.0
+
+    def record(self, error, late_threshold):
+        self.frames += 1
+        if error > late_threshold:
+            self.late += 1
+        error = abs(error)
+        self.max_jitter = max(self.max_jitter, error)
+        self.sum_jitter += error
+        self.sum_sq_jitter += error * error
+
+    @property
+    def mean_jitter(self):
+        return self.sum_jitter / self.frames if self.frames else 0.0
+
+    @property
+    def rms_jitter(self):
+        return (self.sum_sq_jitter / self.frames) ** 0.5 if self.frames else 0.0
+
+
+class ReplayScheduler:
+    """ Emit frames against a monotonic clock at a given speed multiplier.
+
+    Every deadline is computed from a fixed anchor (wall time, media time)
+    instead of sleeping frame-to-frame, so sleep errors never accumulate.
+    The coarse wait is an interruptible sleep and the last `spin` seconds
+    are busy-waited for sub-millisecond accuracy. pause/resume/seek and
+    set_speed may be called from another thread while iterating. """
+
+    def __init__(self, frames, speed=1.0, spin=0.001, late_threshold=0.001,
+                 clock=time.perf_counter):
+        if speed <= 0:
+            raise ValueError("speed must be positive")
+
+        self.frames = frames
+        if isinstance(getattr(frames, "time", None), np.ndarray):
+            # FrameStore, or anything else indexable with a time array
+            self.times = frames.time
+        else:
+            self.times = np.array([f.time for f in frames], dtype=np.float64)
+        self.speed = speed
+        self.spin = spin
+        self.late_threshold = late_threshold
+        self.clock = clock
+        self.stats = ReplayStats()
+
+        self._index = 0
+        self._paused = False
+        self._anchor = None  # (wall time, media time)
+        self._generation = 0
+        self._cond = threading.Condition()
+
+    @property
+    def position(self):
+        """ Media time of the next frame to be emitted """
+        with self._cond:
+            if self._index < len(self.times):
+                return float(self.times[self._index])
+            return float(self.times[-1]) if len(self.times) else 0.0
+
+    @property
+    def paused(self):
+        return self._paused
+
+    def _reanchor(self, media_time):
+        self._anchor = (self.clock(), media_time)
+        self._generation += 1
+        self._cond.notify_all()
+
+    def pause(self):
+        with self._cond:
+            self._paused = True
+            self._generation += 1
+            self._cond.notify_all()
+
+    def resume(self):
+        with self._cond:
+            if self._paused:
+                self._paused = False
+                self._anchor = None
+                self._generation += 1
+                self._cond.notify_all()
+
+    def seek(self, t):
+        """ Continue playback from the first frame at or after media time t """
+        with self._cond:
+            if isinstance(getattr(self.frames, "index", None), TimeIndex):
+                self._index = self.frames.index.left(t)
+            else:
+                self._index = int(np.searchsorted(self.times, t, side="left"))
+            self._reanchor(t)
+
+    def set_speed(self, speed):
+        """ Change the speed multiplier without jumping the media position """
+        if speed <= 0:
+            raise ValueError("speed must be positive")
+        with self._cond:
+            if self._anchor is not None and self._index < len(self.times):
+                wall, media = self._anchor
+                position = media + (self.clock() - wall) * self.speed
+                self.speed = speed
+                self._reanchor(min(position, float(self.times[self._index])))
+            else:
+                self.speed = speed
+
+    def _wait_until(self, deadline, generation):
+        """ Sleep until the deadline; False if pause/seek interrupted it """
+        with self._cond:
+            while True:
+                if self._generation != generation:
+                    return False
+                remaining = deadline - self.clock() - self.spin
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+        while self.clock() < deadline:
+            pass
+        return True
+
+    def __iter__(self):
+        while True:
+            with self._cond:
+                while self._paused:
+                    self._cond.wait()
+                if self._index >= len(self.frames):
+                    return
+
+                frame = self.frames[self._index]
+                if self._anchor is None:
+                    self._reanchor(frame.time)
+                wall, media = self._anchor
+                deadline = wall + (frame.time - media) / self.speed
+                generation = self._generation
+
+            if not self._wait_until(deadline, generation):
+                continue
+
+            with self._cond:
+                if self._generation != generation:
+                    continue
+                self._index += 1
+
+            self.stats.record(self.clock() - deadline, self.late_threshold)
+            yield frame
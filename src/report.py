@@ -0,0 +1,238 @@
+import html
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.archive import read_archive
+from src.cache import read_header
+from src.derived import DerivedChannels
+from src.fdr_binary import open_binary_fdr, read_text_fdr
+from src.profiling import stage
+from src.visualize import PLOTS
+
+REPORT_FORMATS = ("png", "svg")
+INDEX_NAME = "index.html"
+
+_templates = {}  # plot name -> PlotTemplate, one set per process
+
+
+def _template(name):
+    if name not in _templates:
+        _templates[name] = PLOTS[name]()
+    return _templates[name]
+
+
+def _is_cache(path):
+    return (isinstance(path, (str, os.PathLike)) and Path(path).is_dir()
+            and read_header(path) is not None)
+
+
+def load_flight(source, columns=None, earth_model="sphere"):
+    """ The given columns of a flight as a DataFrame, from a DataFrame,
+    column cache, .fda archive, .fdrb/.fdr file or cleaned CSV. X, Y and
+    Z are derived when asked for and not stored (from a cache they are
+    reused, and saved there if missing) """
+
+    if isinstance(source, pd.DataFrame):
+        channels = DerivedChannels.from_df(source, earth_model=earth_model)
+    elif _is_cache(source):
+        channels = DerivedChannels.from_cache(source, earth_model=earth_model)
+    else:
+        path = Path(source)
+        suffix = path.suffix.lower()
+        if suffix == ".fda":
+            df = read_archive(path)
+        elif suffix == ".fdrb":
+            df = pd.DataFrame(np.asarray(open_binary_fdr(path)))
+        elif suffix == ".fdr":
+            df = read_text_fdr(path)
+        else:
+            df = pd.read_csv(path)
+        channels = DerivedChannels.from_df(df, earth_model=earth_model)
+
+    names = channels.columns if columns is None else columns
+    return channels.frame([name for name in names if name in channels])
+
+
+def _columns_for(plots):
+    columns = ["Time", "Altitude"]
+    for name in plots:
+        columns += [c for c in PLOTS[name].columns if c not in columns]
+    return columns
+
+
+def flight_summary(df):
+    """ A few headline figures of a flight for its report page """
+
+    summary = {"rows": len(df)}
+    if len(df) and "Time" in df:
+        t = df["Time"].values
+        summary["duration_s"] = round(float(t[-1] - t[0]), 1)
+    for name in ("Altitude", "Latitude", "Longitude"):
+        if len(df) and name in df:
+            summary[f"{name.lower()}_min"] = round(float(np.nanmin(df[name].values)), 5)
+            summary[f"{name.lower()}_max"] = round(float(np.nanmax(df[name].values)), 5)
+    return summary
+
+
+def render_plots(source, plots, out_dir, fmt="png", dpi=100, earth_model="sphere"):
+    """ Render some plots of one flight to out_dir/<plot>.<fmt> off-screen.
+    Figures are built once per process and only updated with the data,
+    so a worker pays for the matplotlib setup once, not once per flight.
+    Returns {plot: file name} and the flight's summary """
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    with stage("report_load"):
+        df = load_flight(source, _columns_for(plots), earth_model)
+
+    files = {}
+    for name in plots:
+        with stage(f"report_{name}", rows=len(df)):
+            fig = _template(name).update(df)
+            path = out_dir / f"{name}.{fmt}"
+            fig.savefig(path, format=fmt, dpi=dpi)
+        files[name] = path.name
+    return files, flight_summary(df)
+
+
+def _prepare(source, plots, earth_model):
+    """ Derive X/Y/Z into a cache once, before the workers read it, so
+    they never race to write the same columns """
+
+    if "trajectory" in plots and _is_cache(source):
+        channels = DerivedChannels.from_cache(source, earth_model=earth_model)
+        if "Latitude" in channels:
+            channels["X"]
+
+
+def _tasks(flights, plots, workers):
+    """ One task per flight when there are enough of them to keep every
+    worker busy, otherwise one per plot so a single flight uses them all """
+
+    if len(flights) >= workers:
+        return [(fid, tuple(plots)) for fid in flights]
+    return [(fid, (name,)) for fid in flights for name in plots]
+
+
+def _write_flight_index(path, fid, record):
+    rows = "".join(f"<tr><th>{html.escape(k)}</th><td>{v}</td></tr>"
+                   for k, v in record.get("summary", {}).items())
+    images = "".join(f'<h2>{html.escape(name)}</h2><img src="{html.escape(file)}" '
+                     f'alt="{html.escape(name)}">'
+                     for name, file in record.get("files", {}).items())
+    errors = "".join(f"<p>{html.escape(e)}</p>" for e in record.get("errors", []))
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    Path(path).write_text(
+        f"<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\">"
+        f"<title>Flight {html.escape(str(fid))}</title></head><body>\n"
+        f"<h1>Flight {html.escape(str(fid))}</h1>\n<table>{rows}</table>\n"
+        f"{errors}{images}\n</body></html>\n")
+
+
+def _write_archive_index(path, records):
+    rows = "".join(
+        f'<tr><td><a href="{html.escape(str(fid))}/{INDEX_NAME}">{html.escape(str(fid))}</a>'
+        f'</td><td>{r["status"]}</td><td>{r.get("summary", {}).get("rows", "")}</td>'
+        f'<td>{r.get("summary", {}).get("duration_s", "")}</td></tr>'
+        for fid, r in records.items())
+    Path(path).write_text(
+        "<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\">"
+        "<title>Flight reports</title></head><body>\n<h1>Flight reports</h1>\n"
+        "<table><tr><th>flight</th><th>status</th><th>rows</th><th>duration (s)</th></tr>"
+        f"{rows}</table>\n</body></html>\n")
+
+
+def _render_all(flights, out_dirs, plots, fmt, dpi, workers, earth_model):
+    """ Render every (flight, plots) task, inline or across a process pool;
+    returns a record per flight with its files, summary and any errors """
+
+    plots = list(PLOTS) if plots is None else list(plots)
+    unknown = [p for p in plots if p not in PLOTS]
+    if unknown:
+        raise ValueError(f"Unknown plot(s): {', '.join(unknown)}; "
+                         f"use {', '.join(PLOTS)}")
+    if fmt not in REPORT_FORMATS:
+        raise ValueError(f"Unsupported report format {fmt!r}; "
+                         f"use one of {', '.join(REPORT_FORMATS)}")
+
+    workers = workers or os.cpu_count()
+    for source in flights.values():
+        _prepare(source, plots, earth_model)
+
+    records = {fid: {"status": "ok", "files": {}, "errors": []} for fid in flights}
+
+    def collect(fid, result=None, error=None):
+        record = records[fid]
+        if error is not None:
+            record["status"] = "failed"
+            record["errors"].append(f"{type(error).__name__}: {error}")
+            return
+        files, summary = result
+        record["files"].update(files)
+        record["summary"] = summary
+
+    tasks = _tasks(flights, plots, workers)
+    if workers < 2 or len(tasks) < 2:
+        for fid, names in tasks:
+            try:
+                collect(fid, render_plots(flights[fid], names, out_dirs[fid],
+                                          fmt, dpi, earth_model))
+            except Exception as e:
+                collect(fid, error=e)
+    else:
+        # Workers live for the whole run so their figure templates are reused
+        with ProcessPoolExecutor(min(workers, len(tasks))) as pool:
+            futures = {pool.submit(render_plots, flights[fid], names, out_dirs[fid],
+                                   fmt, dpi, earth_model): fid
+                       for fid, names in tasks}
+            for future in as_completed(futures):
+                try:
+                    collect(futures[future], future.result())
+                except Exception as e:
+                    collect(futures[future], error=e)
+
+    for fid, record in records.items():
+        # Keep the page order fixed whatever order the tasks finished in
+        record["files"] = {p: record["files"][p] for p in plots if p in record["files"]}
+        _write_flight_index(Path(out_dirs[fid]) / INDEX_NAME, fid, record)
+    return records
+
+
+def write_report(source, out_dir, plots=None, fmt="png", dpi=100, workers=1,
+                 earth_model="sphere"):
+    """ Static report of one flight: an image per plot and an index.html
+    in out_dir, rendered without a display. With workers > 1 the plots
+    are drawn in parallel. Returns the flight's record """
+
+    records = _render_all({Path(out_dir).name: source}, {Path(out_dir).name: out_dir},
+                          plots, fmt, dpi, workers, earth_model)
+    return next(iter(records.values()))
+
+
+def write_reports(flights, out_dir, plots=None, fmt="png", dpi=100, workers=None,
+                  earth_model="sphere"):
+    """ Static reports of many flights ({flight id: source}), one directory
+    per flight under out_dir plus an index.html linking them all, rendered
+    across a process pool. A flight that fails is recorded, not raised.
+    Returns a run summary """
+
+    start = time.perf_counter()
+    out_dir = Path(out_dir)
+    out_dirs = {fid: out_dir / str(fid) for fid in flights}
+    records = _render_all(flights, out_dirs, plots, fmt, dpi, workers, earth_model)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    _write_archive_index(out_dir / INDEX_NAME, records)
+
+    elapsed = time.perf_counter() - start
+    return {
+        "flights": len(records),
+        "ok": sum(r["status"] == "ok" for r in records.values()),
+        "failed": sum(r["status"] == "failed" for r in records.values()),
+        "images": sum(len(r["files"]) for r in records.values()),
+        "seconds": round(elapsed, 3),
+    }
@@ -0,0 +1,107 @@
+import asyncio
+import struct
+from dataclasses import dataclass, field
+
+from src.replay import FDRFrame
+
+# Little-endian: sequence, time, lat, lon (float64), alt, roll, pitch, yaw (float32)
+PACKET = struct.Struct("<Idddffff")
+
+MAX_BUFFERED = 64 * 1024  # bytes queued per subscriber before frames are dropped
+
+
+def unpack_frame(data):
+    """ Decode a datagram into (sequence, FDRFrame) """
+
+    seq, t, lat, lon, alt, roll, pitch, yaw = PACKET.unpack_from(data)
+    return seq, FDRFrame(time=t, lat=lat, lon=lon, alt=alt,
+                         roll=roll, pitch=pitch, yaw=yaw)
+
+
+@dataclass
+class Subscriber:
+    """ One UDP consumer; receives every `decimation`-th frame """
+
+    host: str
+    port: int
+    decimation: int = 1
+    sent: int = 0
+    dropped: int = 0
+    transport: asyncio.DatagramTransport = field(default=None, repr=False)
+
+
+class UDPStreamer:
+    """ Send replayed frames as packed datagrams to several subscribers.
+
+    Each subscriber has its own connected socket, so a consumer whose
+    socket backs up only loses its own frames (counted in `dropped`)
+    and never delays the others. Frames are packed once into a
+    pre-allocated buffer that is reused for every frame. """
+
+    def __init__(self, subscribers, max_buffered=MAX_BUFFERED):
+        self.subscribers = list(subscribers)
+        self.max_buffered = max_buffered
+        self.seq = 0
+        self._buf = bytearray(PACKET.size)
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        for sub in self.subscribers:
+            if sub.decimation < 1:
+                raise ValueError(f"decimation must be >= 1, got {sub.decimation}")
+            sub.transport, _ = await loop.create_datagram_endpoint(
+                asyncio.DatagramProtocol, remote_addr=(sub.host, sub.port))
+        return self
+
+    def send(self, frame):
+        """ Pack one frame and send it to every subscriber due for it """
+
+        PACKET.pack_into(self._buf, 0, self.seq & 0xFFFFFFFF, frame.time,
+                         frame.lat, frame.lon, frame.alt,
+                         frame.roll, frame.pitch, frame.yaw)
+        for sub in self.subscribers:
+            if self.seq % sub.decimation:
+                continue
+            if sub.transport.get_write_buffer_size() > self.max_buffered:
+                sub.dropped += 1
+                continue
+            # The transport sends immediately or copies, so the buffer can be reused
+            sub.transport.sendto(self._buf)
+            sub.sent += 1
+        self.seq += 1
+
+    async def stream(self, frames, blocking=False, yield_every=64):
+        """ Send every frame of an iterator from src.replay.
+
+        Use blocking=True for iterators that sleep between frames (such
+        as ReplayScheduler); they are then advanced in a worker thread so
+        the event loop keeps running. """
+
+        loop = asyncio.get_running_loop()
+        it = iter(frames)
+        while True:
+            if blocking:
+                frame = await loop.run_in_executor(None, next, it, None)
+            else:
+                frame = next(it, None)
+            if frame is None:
+                break
+
+            self.send(frame)
+            if not blocking and self.seq % yield_every == 0:
+                # Let the loop flush any queued datagrams
+                await asyncio.sleep(0)
+        return self.seq
+
+    async def close(self):
+        for sub in self.subscribers:
+            if sub.transport is not None:
+                sub.transport.close()
+                sub.transport = None
+        await asyncio.sleep(0)
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
@@ -2,91 +2,305 @@
 # Animation functionality is currently experimental and under development.
 # The replay pipeline and plot generation are stable.
 
-import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib import rcParams
 from matplotlib.animation import FuncAnimation
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
 
+from src.lod import LODPyramid, PathLOD, view_indices
+from src.profiling import profiled
+from src.render import frame_indices, render_replay
 
-def plot_trajectory(df):
-    """ Plotting the 3D Flight path """
 
-    fig = plt.figure()
-    ax = fig.add_subplot(111, projection="3d")
-    
-    ax.plot(df["X"].values, df["Y"].values, df["Z"].values)
-    ax.set_xlabel("X (m)")
-    ax.set_ylabel("Y (m)")
-    ax.set_zlabel("Z (m)")
-    ax.set_title("3D Flight Path")
-    ax.set_box_aspect([1, 1, 1])
-    
-    plt.tight_layout()
-    plt.show()
+def _column(df, *names):
+    for name in names:
+        if name in df.columns:
+            return df[name].values
+    raise KeyError(f"Missing column: {names[0]}")
 
 
+def _axis_pixels(ax):
+    return max(int(ax.bbox.width), 1)
 
-def plot_attitude(df):
-    """ Plot roll, pitch and yaw with respect to time   """
 
-    fig, (ax1, ax2, ax3) = plt.subplots(3, 1, figsize=(10, 6), sharex=True)
-    
-    time = df["Time"].values
-    roll = df["Roll (deg)"].values
-    pitch = df["Pitch (deg)"].values
-    yaw = df["Yaw (deg)"].values
-    
-    ax1.plot(time, roll)
-    ax1.set_ylabel("Roll (deg)")
+def _padded_range(y):
+    lo, hi = float(np.nanmin(y)), float(np.nanmax(y))
+    pad = (hi - lo) * 0.05 or 1.0
+    return lo - pad, hi + pad
 
-    ax2.plot(time, pitch)
-    ax2.set_ylabel("Pitch (deg)")
 
-    ax3.plot(time, yaw)
-    ax3.set_ylabel("Yaw (deg)")
-    ax3.set_xlabel("Time (s)")
-    
-    plt.tight_layout()
+class _LODLine:
+    """ A line of y against sorted x showing only the samples visible at
+    the current resolution; re-decimated whenever the x range changes """
+
+    def __init__(self, ax, **kwargs):
+        self.ax = ax
+        self.line, = ax.plot([], [], **kwargs)
+        self.x = self.y = self.pyramid = None
+        # A closure, not the bound method: the registry only holds bound
+        # methods weakly and the line must live as long as its axes
+        ax.callbacks.connect("xlim_changed", lambda ax: self._update(ax))
+
+    def set_data(self, x, y):
+        self.x, self.y, self.pyramid = x, y, LODPyramid(y)
+        if len(x):
+            self.ax.set_xlim(x[0], x[-1])
+            self.ax.set_ylim(*_padded_range(y))
+        self._update(self.ax)
+
+    def _update(self, ax):
+        if self.pyramid is None:
+            return
+        x0, x1 = ax.get_xlim()
+        idx = view_indices(self.x, [self.pyramid], x0, x1, _axis_pixels(ax))
+        self.line.set_data(self.x[idx], self.y[idx])
+
+
+class _LODPath:
+    """ A path through 2 or 3 coordinates decimated by its length on
+    screen (see PathLOD); re-decimated whenever the view limits change.
+    draw(idx, connected) puts the kept samples on the artist """
+
+    def __init__(self, ax, draw):
+        self.ax = ax
+        self.draw = draw
+        self.lod = None
+        for signal in ("xlim_changed", "ylim_changed", "zlim_changed"):
+            ax.callbacks.connect(signal, lambda ax: self._update())
+
+    def _setters(self):
+        return [self.ax.set_xlim, self.ax.set_ylim, getattr(self.ax, "set_zlim", None)]
+
+    def _limits(self):
+        getters = [self.ax.get_xlim, self.ax.get_ylim, getattr(self.ax, "get_zlim", None)]
+        return [get() for get in getters[:len(self.lod.columns)]]
+
+    def set_data(self, columns, limits):
+        """ New path, shown in full within limits [(lo, hi), ...] """
+        self.lod = None  # setting the limits must not redraw the previous path
+        if len(columns[0]):
+            for set_lim, lim in zip(self._setters(), limits):
+                set_lim(*lim)
+        self.lod = PathLOD(columns, [hi - lo for lo, hi in limits])
+        self._update()
+
+    def _update(self):
+        if self.lod is None:
+            return
+        pixels = max(_axis_pixels(self.ax), int(self.ax.bbox.height))
+        self.draw(*self.lod.view(self._limits(), pixels))
+
+
+def _with_breaks(values, connected):
+    """ values with NaN where the path leaves the view, so a line stops there """
+    return np.insert(values.astype(np.float64), np.flatnonzero(~connected) + 1, np.nan)
+
+
+_SUBPLOT_DEFAULTS = {k: rcParams[f"figure.subplot.{k}"]
+                     for k in ("left", "right", "bottom", "top", "wspace", "hspace")}
+
+
+class PlotTemplate:
+    """ A figure laid out once (axes, labels, colour bar) and redrawn with
+    each flight's data by update(), so a process rendering many flights
+    pays for the matplotlib setup only once per plot type. Without a
+    figure, an off-screen Agg figure is used: no pyplot, no display """
+
+    figsize = (8, 6)
+    columns = ()
+    margins = None  # fixed subplot margins instead of a tight layout
+
+    def __init__(self, fig=None):
+        if fig is None:
+            fig = Figure(figsize=self.figsize)
+            FigureCanvasAgg(fig)
+        self.fig = fig
+        self.build()
+        if self.margins is not None:
+            fig.subplots_adjust(**self.margins)
+
+    def build(self):
+        raise NotImplementedError
+
+    def draw(self, df):
+        raise NotImplementedError
+
+    def update(self, df):
+        self.draw(df)
+        if self.margins is None:
+            # Lay out from the defaults, not from the previous flight's margins
+            self.fig.subplots_adjust(**_SUBPLOT_DEFAULTS)
+            self.fig.tight_layout()
+        return self.fig
+
+
+class TrajectoryPlot(PlotTemplate):
+    """ 3D flight path """
+
+    columns = ("X", "Y", "Z")
+    # What a tight layout gives a fresh figure; on a reused one it would be
+    # measured against the previous flight's tick labels
+    margins = {"left": 0.02, "right": 0.98, "bottom": 0.06, "top": 0.94}
+
+    def build(self):
+        ax = self.ax = self.fig.add_subplot(111, projection="3d")
+        self.line, = ax.plot([], [], [])
+        self.path = _LODPath(ax, self._draw_path)
+        self.xyz = None
+        ax.set_xlabel("X (m)")
+        ax.set_ylabel("Y (m)")
+        ax.set_zlabel("Z (m)")
+        ax.set_title("3D Flight Path")
+        ax.set_box_aspect([1, 1, 1])
+
+    def _draw_path(self, idx, connected):
+        self.line.set_data_3d(*(_with_breaks(c[idx], connected) for c in self.xyz))
+
+    def draw(self, df):
+        self.xyz = [df["X"].values, df["Y"].values, df["Z"].values]
+        limits = [_padded_range(c) if len(c) else (0.0, 1.0) for c in self.xyz]
+        self.path.set_data(self.xyz, limits)
+
+
+class AttitudePlot(PlotTemplate):
+    """ Roll, pitch and yaw against time """
+
+    figsize = (10, 6)
+    columns = ("Time", "Roll", "Pitch", "Yaw")
+
+    def build(self):
+        axes = self.fig.subplots(3, 1, sharex=True)
+        self.lines = [_LODLine(ax) for ax in axes]
+        for ax, label in zip(axes, ("Roll (deg)", "Pitch (deg)", "Yaw (deg)")):
+            ax.set_ylabel(label)
+        axes[-1].set_xlabel("Time (s)")
+
+    def draw(self, df):
+        time = df["Time"].values
+        for line, name in zip(self.lines, ("Roll", "Pitch", "Yaw")):
+            line.set_data(time, _column(df, f"{name} (deg)", name))
+
+
+class MapPlot(PlotTemplate):
+    """ 2D flight map coloured by altitude """
+
+    columns = ("Longitude", "Latitude", "Altitude")
+
+    def build(self):
+        ax = self.ax = self.fig.add_subplot()
+        # Segments coloured by the altitude at their start
+        self.segments = LineCollection([], cmap="viridis", linewidths=1.5)
+        self.segments.set_array(np.empty(0))
+        ax.add_collection(self.segments)
+        self.fig.colorbar(self.segments, ax=ax, label="Altitude (m)")
+        self.path = _LODPath(ax, self._draw_path)
+        self.lonlat = self.alt = None
+        ax.set_xlabel("Longitude (deg)")
+        ax.set_ylabel("Latitude (deg)")
+        ax.set_title("2D Flight Path (Altitude-Colored)")
+        ax.grid(True, alpha=0.3)
+        ax.set_aspect("equal", adjustable="box")
+
+    def _draw_path(self, idx, connected):
+        points = np.column_stack([c[idx] for c in self.lonlat])
+        self.segments.set_segments(np.stack([points[:-1], points[1:]], axis=1)[connected])
+        self.segments.set_array(self.alt[idx][:-1][connected])
+
+    def draw(self, df):
+        self.lonlat = [df["Longitude"].values, df["Latitude"].values]
+        self.alt = df["Altitude"].values
+
+        limits = [(0.0, 1.0), (0.0, 1.0)]
+        if len(self.alt):
+            self.segments.set_clim(*_padded_range(self.alt))
+            # Same span on both axes: the equal-aspect box keeps its shape
+            # (and the layout its room) whatever direction the flight went
+            (x0, x1), (y0, y1) = (_padded_range(c) for c in self.lonlat)
+            half = max(x1 - x0, y1 - y0) / 2
+            limits = [((x0 + x1) / 2 - half, (x0 + x1) / 2 + half),
+                      ((y0 + y1) / 2 - half, (y0 + y1) / 2 + half)]
+        self.path.set_data(self.lonlat, limits)
+
+
+class AltitudePlot(PlotTemplate):
+    """ Altitude against time """
+
+    figsize = (8, 4)
+    columns = ("Time", "Altitude")
+
+    def build(self):
+        ax = self.fig.add_subplot()
+        self.line = _LODLine(ax)
+        ax.set_xlabel("Time (s)")
+        ax.set_ylabel("Altitude (m)")
+        ax.set_title("Altitude Over Time")
+        ax.grid(True)
+
+    def draw(self, df):
+        self.line.set_data(df["Time"].values, df["Altitude"].values)
+
+
+PLOTS = {
+    "map": MapPlot,
+    "attitude": AttitudePlot,
+    "trajectory": TrajectoryPlot,
+    "altitude": AltitudePlot,
+}
+
+
+def _show(template, df):
+    import matplotlib.pyplot as plt  # a GUI backend; only for on-screen plots
+
+    plot = template(plt.figure(figsize=template.figsize))
+    fig = plot.update(df)
     plt.show()
+    return fig
 
 
+@profiled("plot_trajectory")
+def plot_trajectory(df):
+    """ Plotting the 3D Flight path """
+
+    return _show(TrajectoryPlot, df)
+
+
+@profiled("plot_attitude")
+def plot_attitude(df):
+    """ Plot roll, pitch and yaw with respect to time   """
+
+    return _show(AttitudePlot, df)
+
+
+@profiled("plot_map")
 def plot_map(df):
     """ Plot a 2D flight map that is altitude coloured  """
 
-    fig, ax = plt.subplots(figsize=(8, 6))
-    
-    lon = df["Longitude"].values
-    lat = df["Latitude"].values
-    alt = df["Altitude"].values
-    
-    sc = ax.scatter(lon, lat, c=alt, s=2, cmap="viridis", rasterized=True) 
-    plt.colorbar(sc, ax=ax, label="Altitude (m)")
-    
-    ax.set_xlabel("Longitude (deg)")
-    ax.set_ylabel("Latitude (deg)")
-    ax.set_title("2D Flight Path (Altitude-Colored)")
-    ax.grid(True, alpha=0.3)
-    ax.set_aspect("equal", adjustable="box")
-    
-    plt.tight_layout()
-    plt.show()
+    return _show(MapPlot, df)
 
 
+@profiled("plot_altitude")
 def plot_altitude(df):
     """ Plot altitude with respect to time   """
 
-    plt.figure(figsize=(8, 4))
-    
-    plt.plot(df["Time"].values, df["Altitude"].values)
-    plt.xlabel("Time (s)")
-    plt.ylabel("Altitude (m)")
-    plt.title("Altitude Over Time")
-    plt.grid(True)
-    
-    plt.tight_layout()
-    plt.show()
+    return _show(AltitudePlot, df)
+
+
+@profiled("animate_trajectory")
+def animate_trajectory(df, output=None, fps=30, speed=1.0, workers=1):
+    """ Animate flight path replay in top-down view.
+
+    With an output path (.mp4, .gif or .png sequence) the replay is
+    rendered off-screen by src.render and the frame count is returned;
+    otherwise it is shown interactively. Either way one frame is drawn
+    per 1/fps of output, `speed` times real time. """
 
+    if output is not None:
+        return render_replay(df["Time"].values, df["X"].values, df["Y"].values,
+                             output, fps=fps, speed=speed, workers=workers)
 
-def animate_trajectory(df):
-    """ Animate flight path replay in top-down view """
+    import matplotlib.pyplot as plt
 
     fig, ax = plt.subplots(figsize=(8, 6))
     
@@ -101,12 +315,18 @@ def animate_trajectory(df):
     
     point, = ax.plot([], [], "ro", markersize=8)
     path, = ax.plot([], [], "b-", linewidth=1, alpha=0.6)
+    lod = PathLOD([x_data, y_data], [np.ptp(x_data), np.ptp(y_data)])
     
     def update(i):
         point.set_data([x_data[i]], [y_data[i]])
-        path.set_data(x_data[:i+1], y_data[:i+1])
+        # The trail is decimated by its length on screen, like the static
+        # plots' paths, so drawing it costs the same at the end of the
+        # flight as at the start
+        idx = lod.span(max(_axis_pixels(ax), int(ax.bbox.height)), 0, i)
+        path.set_data(x_data[idx], y_data[idx])
         return point, path
     
-    anim = FuncAnimation(fig, update, frames=len(df), interval=30, blit=True)
+    frames = frame_indices(df["Time"].values, fps, speed)
+    anim = FuncAnimation(fig, update, frames=frames, interval=1000 / fps, blit=True)
     plt.show()
-    return anim
\ No newline at end of file
+    return anim
@@ -0,0 +1,112 @@
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from src.archive import (CODECS, ArchiveReader, ArchiveWriter, decode_column, encode_column,
+                         read_archive, write_archive)
+from src.loader import interpolate, normalize
+from src.replay import FrameStore
+
+
+def make_clean(n=40_000, rate_hz=30):
+    rng = np.random.default_rng(4)
+    t = np.sort(rng.uniform(0, n / 8, n))
+    raw = pd.DataFrame({
+        "Time": t,
+        "Longitude": 10 + 1e-4 * t, "Latitude": 20 + 5e-5 * t,
+        "Altitude": 1000 + 5 * t + rng.normal(0, 0.5, n),
+        "Roll": 10 * np.sin(t / 60), "Pitch": rng.normal(2, 0.3, n),
+        "Yaw": (0.5 * t) % 360,
+    })
+    return interpolate(normalize(raw), rate_hz)
+
+
+def test_codecs_are_lossless():
+    rng = np.random.default_rng(5)
+    for values in (np.cumsum(rng.normal(size=1000)), np.full(17, 3.25),
+                   np.array([0.0, -0.0, np.inf, -np.inf, np.nan, 1e-308, -1e308]),
+                   rng.normal(size=1)):
+        for forced in (None, *CODECS):
+            codec, data = encode_column(values, codec=forced)
+            back = decode_column(codec, data, len(values))
+            assert np.array_equal(back.view("<u8"), values.view("<u8"))
+    print("[OK] test_codecs_are_lossless")
+
+
+def test_archive_round_trip_and_size():
+    df = make_clean()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "flight.fda"
+        write_archive(df, path, block_rows=10_000)
+        reader = ArchiveReader(path)
+        assert reader.implicit and "Time" not in reader.stored
+        assert len(reader) == len(df) and reader.columns == list(df.columns)
+        for workers in (None, 3):
+            assert read_archive(path, workers=workers).equals(df)
+
+        df.to_csv(Path(tmp) / "flight.csv", index=False)
+        assert os.path.getsize(path) * 5 < os.path.getsize(Path(tmp) / "flight.csv")
+    print("[OK] test_archive_round_trip_and_size")
+
+
+def test_archive_time_range_and_columns():
+    df = make_clean()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "flight.fda"
+        write_archive(df, path, block_rows=4096)
+        reader = ArchiveReader(path)
+        t = df["Time"].values
+        for t0, t1 in [(t[5000], t[5000]), (t[4095] + 1e-9, t[20000]), (-1.0, 100.0),
+                       (t[-1] - 0.5, t[-1] + 10), (t[-1] + 1, None), (None, t[0] - 1)]:
+            expected = df[((t >= t0) if t0 is not None else True)
+                          & ((t <= t1) if t1 is not None else True)].reset_index(drop=True)
+            got = reader.read(["Time", "Yaw"], t0, t1, workers=2)
+            assert got.equals(expected[["Time", "Yaw"]]), (t0, t1)
+
+        store = FrameStore.from_archive(path, t0=t[1000], t1=t[1999])
+        assert len(store) == 1000 and np.array_equal(store.yaw, df["Yaw"].values[1000:2000])
+        try:
+            reader.read(["Airspeed"])
+            assert False, "unknown column accepted"
+        except KeyError:
+            pass
+    print("[OK] test_archive_time_range_and_columns")
+
+
+def test_archive_streamed_and_irregular_time():
+    df = make_clean()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "flight.fda"
+        with ArchiveWriter(path, rate_hz=30, block_rows=5000) as writer:
+            for i in range(0, len(df), 3333):
+                writer.append(df.iloc[i:i + 3333])
+        assert read_archive(path).equals(df)
+
+        # Time off the grid is stored as a channel instead
+        irregular = df.iloc[::7].reset_index(drop=True)
+        irregular.loc[3, "Time"] += 1e-3
+        write_archive(irregular, path, block_rows=1000)
+        assert not ArchiveReader(path).implicit
+        assert read_archive(path).equals(irregular)
+        t = irregular["Time"].values
+        assert read_archive(path, t0=t[10], t1=t[2500]).equals(
+            irregular.iloc[10:2501].reset_index(drop=True))
+
+        try:
+            with ArchiveWriter(path, rate_hz=30) as writer:
+                writer.append(df.iloc[:100])
+                writer.append(df.iloc[200:300])
+            assert False, "gap in implicit time accepted"
+        except ValueError:
+            pass
+    print("[OK] test_archive_streamed_and_irregular_time")
+
+
+if __name__ == "__main__":
+    test_codecs_are_lossless()
+    test_archive_round_trip_and_size()
+    test_archive_time_range_and_columns()
+    test_archive_streamed_and_irregular_time()
+    print("\nAll tests passed.\n")
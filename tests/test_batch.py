@@ -0,0 +1,62 @@
+import json
+import tempfile
+from pathlib import Path
+
+from src.batch import run_batch
+from src.export_replay_fdr import write_replay_fdr
+from src.loader import interpolate, load_csv, normalize
+from src.replay import compute_xyz
+from tests.test_loader import make_raw_csv
+
+
+def test_batch_processes_archive():
+    with tempfile.TemporaryDirectory() as tmp:
+        raw = Path(tmp) / "raw"
+        raw.mkdir()
+        make_raw_csv(raw / "a.csv")
+        make_raw_csv(raw / "b.csv", n=100)
+        (raw / "corrupt.csv").write_text("not,a\nflight,file\n")
+        out = Path(tmp) / "out"
+
+        summary = run_batch(str(raw), out, workers=2, chunksize=64)
+        assert (summary["ok"], summary["failed"]) == (2, 1), summary
+
+        manifest = json.loads((out / "manifest.json").read_text())
+        status = {Path(r["input"]).name: r["status"] for r in manifest["files"]}
+        assert status == {"a.csv": "ok", "b.csv": "ok", "corrupt.csv": "failed"}
+        assert not (out / "corrupt.fdr").exists()
+
+        # Same bytes as the single-file, in-memory pipeline
+        expected = Path(tmp) / "expected.fdr"
+        write_replay_fdr(compute_xyz(interpolate(normalize(load_csv(raw / "a.csv")))),
+                         expected)
+        assert (out / "a.fdr").read_bytes() == expected.read_bytes()
+
+        summary = run_batch(str(raw / "*.csv"), out, workers=2)
+        assert (summary["skipped"], summary["failed"]) == (2, 1), summary
+
+        # Asking for videos redoes flights that have none yet
+        video = {"video": ".gif", "fps": 5, "speed": 20}
+        summary = run_batch(str(raw / "a.csv"), out, workers=1, **video)
+        assert summary["ok"] == 1 and (out / "a.gif").exists(), summary
+        assert run_batch(str(raw / "a.csv"), out, workers=1, **video)["skipped"] == 1
+
+        # A failed video leaves no .fdr behind, so the next run retries it
+        summary = run_batch(str(raw / "a.csv"), out, workers=1, video=".avi")
+        assert summary["failed"] == 1 and not (out / "a.fdr").exists()
+        assert run_batch(str(raw / "a.csv"), out, workers=1)["ok"] == 1
+
+        # Same-named recordings in different directories keep their own outputs
+        for day in ("day1", "day2"):
+            (raw / day).mkdir()
+            make_raw_csv(raw / day / "a.csv", n=100 if day == "day1" else 120)
+        summary = run_batch(str(raw / "**" / "a.csv"), out, workers=2, chunksize=64)
+        assert summary["skipped"] == 1 and summary["ok"] == 2, summary
+        one, two = ((out / day / "a.fdr").read_bytes() for day in ("day1", "day2"))
+        assert one != two and (out / "a.fdr").read_bytes() == expected.read_bytes()
+        print("[OK] test_batch_processes_archive")
+
+
+if __name__ == "__main__":
+    test_batch_processes_archive()
+    print("\nAll tests passed.\n")
@@ -0,0 +1,73 @@
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from src.cache import (add_columns, cache_is_fresh, read_cache,
+                       source_fingerprint, write_cache)
+
+
+def make_clean_df(n=100):
+    """Small cleaned flight on a 30 Hz grid."""
+    return pd.DataFrame({
+        "Time": np.arange(n) / 30.0,
+        "Longitude": np.linspace(10, 11, n),
+        "Latitude": np.linspace(20, 21, n),
+        "Altitude": np.linspace(100, 200, n),
+        "Roll": np.zeros(n),
+        "Pitch": np.ones(n),
+        "Yaw": np.linspace(0, 90, n),
+    })
+
+
+def test_cache_roundtrip():
+    with tempfile.TemporaryDirectory() as tmp:
+        df = make_clean_df()
+        write_cache(df, Path(tmp) / "flight.cache", rate_hz=30)
+        out = read_cache(Path(tmp) / "flight.cache")
+        pd.testing.assert_frame_equal(out, df)
+        print("[OK] test_cache_roundtrip")
+
+
+def test_cache_add_columns():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "flight.cache"
+        df = make_clean_df()
+        write_cache(df, path)
+        reader = read_cache(path)
+        add_columns(path, {"X": np.arange(len(df), dtype=float)})
+        add_columns(path, {"Altitude": np.full(len(df), 5.0)})
+
+        out = read_cache(path)
+        assert list(out.columns) == list(df.columns) + ["X"]
+        assert (out["Altitude"] == 5.0).all()
+        # Frames opened before the update keep their own view of the data
+        assert reader["Altitude"].iloc[-1] == 200.0
+        print("[OK] test_cache_add_columns")
+
+
+def test_cache_freshness():
+    with tempfile.TemporaryDirectory() as tmp:
+        raw = Path(tmp) / "raw.csv"
+        raw.write_text("a,b\n1,2\n")
+        path = Path(tmp) / "flight.cache"
+        write_cache(make_clean_df(), path, source=source_fingerprint(raw))
+        assert cache_is_fresh(path, raw)
+
+        # Same content with a new mtime is still fresh
+        os.utime(raw, ns=(0, 0))
+        assert cache_is_fresh(path, raw)
+
+        # Same size, different content is stale
+        raw.write_text("a,b\n3,4\n")
+        assert not cache_is_fresh(path, raw)
+        assert not cache_is_fresh(Path(tmp) / "missing.cache", raw)
+        print("[OK] test_cache_freshness")
+
+
+if __name__ == "__main__":
+    test_cache_roundtrip()
+    test_cache_add_columns()
+    test_cache_freshness()
+    print("\nAll tests passed.\n")
@@ -0,0 +1,109 @@
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from src.cache import add_columns, read_header, write_cache
+from src.derived import DERIVED, DerivedChannels
+from src.replay import R_EARTH, compute_xyz
+
+
+def make_turn(n=3001, speed=100.0, bank=30.0):
+    """Level coordinated turn at constant speed and bank, flown east of Greenwich"""
+    t = np.arange(n) / 30.0
+    rate = np.degrees(9.80665 * np.tan(np.radians(bank)) / speed)  # deg/s
+    heading = (80.0 + rate * t) % 360
+    track = np.radians(80.0 + rate * t)
+    # Integrate the ground track on a local flat earth (small area)
+    north = np.cumsum(speed * np.cos(track)) / 30.0
+    east = np.cumsum(speed * np.sin(track)) / 30.0
+    lat0 = 45.0
+    return pd.DataFrame({
+        "Time": t,
+        "Longitude": 2.0 + np.degrees(east / (R_EARTH * np.cos(np.radians(lat0)))),
+        "Latitude": lat0 + np.degrees(north / R_EARTH),
+        "Altitude": np.full(n, 3000.0),
+        "Roll": np.full(n, bank),
+        "Pitch": np.zeros(n),
+        "Yaw": heading,
+    })
+
+
+def test_derived_values():
+    df = make_turn()
+    ch = DerivedChannels.from_df(df)
+    inner = slice(10, -10)
+    assert np.allclose(ch["GroundSpeed"][inner], 100.0, rtol=2e-3)
+    assert np.allclose(ch["TurnRate"], ch["TurnRate"][0], rtol=1e-6)
+    turn = np.unwrap(np.radians(ch["Track"]) - np.radians(df["Yaw"].values))
+    assert np.abs(turn[inner]).max() < 0.05
+    assert np.allclose(ch["VerticalSpeed"], 0.0)
+    assert np.allclose(ch["LoadFactor"][inner], 1 / np.cos(np.radians(30.0)), rtol=5e-3)
+    assert np.isclose(ch["Distance"][-1], 100.0 * df["Time"].iloc[-1], rtol=2e-3)
+
+    xyz = compute_xyz(df)
+    for name in ("X", "Y", "Z"):
+        assert np.array_equal(ch[name], xyz[name].values)
+    print("[OK] test_derived_values")
+
+
+def test_derived_is_lazy():
+    calls = []
+    param = DERIVED["VerticalSpeed"]
+    ch = DerivedChannels.from_df(make_turn(100))
+    ch.base["Altitude"] = np.linspace(0, 99, 100)
+    original = param.func
+    try:
+        object.__setattr__(param, "func", lambda *a: calls.append(1) or original(*a))
+        ch["GroundSpeed"]
+        assert calls == []
+        ch["VerticalSpeed"]
+        ch["VerticalSpeed"]
+        assert calls == [1]
+    finally:
+        object.__setattr__(param, "func", original)
+    assert "LoadFactor" in ch and "Airspeed" not in ch
+    assert set(ch.columns) >= set(DERIVED)
+    print("[OK] test_derived_is_lazy")
+
+
+def test_derived_cached_and_invalidated():
+    df = make_turn(500)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "flight.cache"
+        write_cache(df, path)
+
+        ch = DerivedChannels.from_cache(path)
+        assert not ch.is_cached("LoadFactor")
+        load = np.array(ch["LoadFactor"])
+        # Dependencies computed on the way are stored too
+        header = read_header(path)
+        assert {"LoadFactor", "GroundSpeed", "Track", "TurnRate",
+                "VerticalSpeed"} <= set(header["attrs"]["derived"])
+
+        again = DerivedChannels.from_cache(path)
+        assert again.is_cached("LoadFactor") and not again.is_cached("X")
+        assert isinstance(again["LoadFactor"], np.memmap)
+        assert np.array_equal(again["LoadFactor"], load)
+
+        # A changed input invalidates everything computed from it, only
+        add_columns(path, {"Altitude": np.linspace(3000, 3500, len(df))})
+        changed = DerivedChannels.from_cache(path)
+        assert not changed.is_cached("VerticalSpeed")
+        assert not changed.is_cached("LoadFactor")
+        assert changed.is_cached("GroundSpeed")
+        assert np.allclose(changed["VerticalSpeed"], 500 / df["Time"].iloc[-1])
+
+        # So does an option the channel depends on
+        DerivedChannels.from_cache(path)["X"]
+        assert DerivedChannels.from_cache(path).is_cached("X")
+        wgs84 = DerivedChannels.from_cache(path, earth_model="wgs84")
+        assert not wgs84.is_cached("X") and wgs84.is_cached("GroundSpeed")
+    print("[OK] test_derived_cached_and_invalidated")
+
+
+if __name__ == "__main__":
+    test_derived_values()
+    test_derived_is_lazy()
+    test_derived_cached_and_invalidated()
+    print("\nAll tests passed.\n")
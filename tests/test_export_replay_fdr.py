@@ -1,4 +1,5 @@
 from src.export_replay_fdr import write_replay_fdr
+import numpy as np
 import pandas as pd
 
 HEADER = [
@@ -35,4 +36,26 @@ def test_fdr_data_format(tmp_path):
     parts = data.split(",")
     
     expected = ["1.235", "12.345678", "98.765432", "123.46", "1.11", "2.22", "3.33"]
-    assert parts == expected, f"Expected {expected}, got {parts}"
\ No newline at end of file
+    assert parts == expected, f"Expected {expected}, got {parts}"
+
+def reference_lines(df):
+    """Per-row f-string formatting the block writer has to reproduce."""
+    return [
+        f"{r.Time:.3f},{r.Longitude:.6f},{r.Latitude:.6f},"
+        f"{r.Altitude:.2f},{r._5:.2f},{r._6:.2f},{r._7:.2f}"
+        for r in df.itertuples()
+    ]
+
+def test_fdr_matches_per_row_formatting(tmp_path):
+    rng = np.random.default_rng(0)
+    values = rng.normal(size=(2000, 7)) * [1e3, 1e2, 1e1, 1e4, 1, 1e-3, 1e6]
+    values[:500] = np.round(values[:500], 2) + 0.005  # near rounding ties
+    values[10] = [np.nan, np.inf, -np.inf, -0.0, -0.001, 1e300, 2.675]
+    df = pd.DataFrame(values, columns=TEST_DF_SIMPLE.columns)
+
+    for workers in (None, 4):
+        fdr_path = tmp_path / f"out_{workers}.fdr"
+        write_replay_fdr(df, fdr_path, block_rows=300, workers=workers)
+        lines = fdr_path.read_text().splitlines()
+        assert lines[:6] == HEADER
+        assert lines[6:] == reference_lines(df)
\ No newline at end of file
@@ -0,0 +1,101 @@
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from src.export_replay_fdr import write_replay_fdr
+from src.fdr_binary import (BinaryFDRWriter, convert_text_fdr, open_binary_fdr,
+                            read_binary_header, read_text_fdr, write_binary_fdr)
+from src.replay import FrameStore
+
+
+def make_clean_df(n=500):
+    t = np.arange(n) / 30.0
+    return pd.DataFrame({
+        "Time": t, "Longitude": 10 + t / 100, "Latitude": 20 + t / 100,
+        "Altitude": 1000 + t, "Roll": np.sin(t), "Pitch": np.cos(t),
+        "Yaw": (t * 10) % 360, "X": t, "Y": -t, "Z": 2 * t,
+    })
+
+
+def test_binary_fdr_roundtrip_as_frame_source():
+    df = make_clean_df()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "flight.fdrb"
+        write_binary_fdr(df, path)
+
+        dtype, rows, offset = read_binary_header(path)
+        assert rows == len(df) and offset % 64 == 0
+        assert dtype.names == ("Time", "Longitude", "Latitude", "Altitude",
+                               "Roll", "Pitch", "Yaw")
+        assert path.stat().st_size == offset + rows * dtype.itemsize
+
+        store = FrameStore.from_fdr(path)
+        assert isinstance(store.time.base, np.memmap)
+        assert list(store) == list(FrameStore.from_df(df))
+        assert store.frame_at(5.0).time == df["Time"].iloc[150]
+        del store
+        print("[OK] test_binary_fdr_roundtrip_as_frame_source")
+
+
+def test_binary_fdr_chunks_and_extra_columns():
+    df = make_clean_df()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "flight.fdrb"
+        columns = ["Time", "Latitude", "Longitude", "Altitude", "Roll",
+                   "Pitch", "Yaw", "X", "Y", "Z"]
+        with BinaryFDRWriter(path, columns) as writer:
+            for start in range(0, len(df), 128):
+                writer.append(df.iloc[start:start + 128])
+        records = open_binary_fdr(path)
+        for name in columns:
+            assert np.array_equal(records[name], df[name].values)
+        assert FrameStore.from_fdr(path).has_xyz
+        del records
+
+        write_binary_fdr(df.iloc[:0], Path(tmp) / "empty.fdrb")
+        assert len(open_binary_fdr(Path(tmp) / "empty.fdrb")) == 0
+
+        # Names the header cannot hold are refused, not truncated
+        long_name = "Engine 1 exhaust gas temperature (degC)"
+        try:
+            BinaryFDRWriter(Path(tmp) / "long.fdrb", columns + [long_name])
+            assert False, "accepted an overlong column name"
+        except ValueError:
+            pass
+        assert not (Path(tmp) / "long.fdrb.tmp").exists()
+        print("[OK] test_binary_fdr_chunks_and_extra_columns")
+
+
+def test_text_fdr_reader_and_conversion():
+    df = make_clean_df(1000)
+    with tempfile.TemporaryDirectory() as tmp:
+        text = Path(tmp) / "flight.fdr"
+        write_replay_fdr(df, text)
+        parsed = read_text_fdr(text)
+        assert len(parsed) == len(df)
+        assert np.allclose(parsed["Latitude"], df["Latitude"], atol=1e-6)
+        assert np.allclose(parsed["Yaw"], df["Yaw"], atol=0.005)
+
+        rows = convert_text_fdr(text, Path(tmp) / "flight.fdrb", chunksize=300)
+        records = open_binary_fdr(Path(tmp) / "flight.fdrb")
+        assert rows == len(df)
+        assert all(np.array_equal(records[c], parsed[c]) for c in parsed.columns)
+        del records
+
+        bad = Path(tmp) / "bad.fdrb"
+        bad.write_bytes(b"not an fdr file")
+        try:
+            open_binary_fdr(bad)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("expected ValueError for a non-FDR file")
+        print("[OK] test_text_fdr_reader_and_conversion")
+
+
+if __name__ == "__main__":
+    test_binary_fdr_roundtrip_as_frame_source()
+    test_binary_fdr_chunks_and_extra_columns()
+    test_text_fdr_reader_and_conversion()
+    print("\nAll tests passed.\n")
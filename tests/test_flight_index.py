@@ -0,0 +1,105 @@
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from src.cache import add_columns, write_cache
+from src.flight_index import NAUTICAL_MILE, FlightIndex, build_index
+from src.replay import R_EARTH
+
+
+def make_flight(rng, t0, minutes=40):
+    """Straight leg at ~200 m/s from a random point, one sample per second"""
+    t = t0 + np.arange(minutes * 60.0)
+    lat0, lon0 = rng.uniform(44, 50), rng.uniform(0, 10)
+    heading = rng.uniform(0, 2 * np.pi)
+    step = np.degrees(200.0 / R_EARTH) * np.arange(len(t))
+    return pd.DataFrame({
+        "Time": t,
+        "Longitude": lon0 + step * np.sin(heading) / np.cos(np.radians(lat0)),
+        "Latitude": lat0 + step * np.cos(heading),
+        "Altitude": np.full(len(t), 10000.0),
+    })
+
+
+def brute_force_near(flights, lat, lon, radius, t0, t1):
+    rows = []
+    for fid, df in flights.items():
+        la, lo = np.radians(df["Latitude"].values), np.radians(df["Longitude"].values)
+        h = (np.sin((la - np.radians(lat)) / 2) ** 2
+             + np.cos(la) * np.cos(np.radians(lat)) * np.sin((lo - np.radians(lon)) / 2) ** 2)
+        t = df["Time"].values
+        mask = (2 * R_EARTH * np.arcsin(np.sqrt(h)) <= radius) & (t >= t0) & (t <= t1)
+        if mask.any():
+            rows.append((fid, t[mask].min(), t[mask].max(), int(mask.sum())))
+    return sorted(rows)
+
+
+def write_archive(tmp, n=40):
+    rng = np.random.default_rng(3)
+    flights = {f"F{i:03d}": make_flight(rng, 50_000 + rng.uniform(0, 7200)) for i in range(n)}
+    paths = {}
+    for fid, df in flights.items():
+        paths[fid] = write_cache(df, Path(tmp) / f"{fid}.cache")
+    return flights, paths
+
+
+def test_query_near_matches_brute_force():
+    with tempfile.TemporaryDirectory() as tmp:
+        flights, paths = write_archive(tmp)
+        index = build_index(paths, Path(tmp) / "index")
+        # A point some flights actually pass close to
+        lat, lon = flights["F007"][["Latitude", "Longitude"]].iloc[1200]
+        for radius, t0, t1 in [(5 * NAUTICAL_MILE, 0, 1e9), (50 * NAUTICAL_MILE, 51_000, 53_000)]:
+            found = index.query_near(lat, lon, radius, t0, t1)
+            got = sorted((r.flight, r.start_time, r.end_time, r.samples)
+                         for r in found.itertuples())
+            expected = brute_force_near(flights, lat, lon, radius, t0, t1)
+            assert got == expected, (got, expected)
+            assert len(index.candidates(lat - 1, lat + 1, lon - 1, lon + 1)) < len(index.segments)
+
+        assert FlightIndex.open(Path(tmp) / "index").query_near(0.0, 0.0, 1000).empty
+    print("[OK] test_query_near_matches_brute_force")
+
+
+def test_query_box_splits_windows():
+    with tempfile.TemporaryDirectory() as tmp:
+        t = np.arange(600.0)
+        df = pd.DataFrame({"Time": t, "Latitude": 45 + 0.01 * np.sin(t / 50),
+                           "Longitude": np.linspace(5, 6, len(t))})
+        write_cache(df, Path(tmp) / "wave.cache")
+        index = build_index([Path(tmp) / "wave.cache"], Path(tmp) / "index",
+                            seconds=30.0)
+        found = index.query_box(45.005, 45.02, 5.0, 6.0)
+        inside = (df["Latitude"] >= 45.005).values
+        starts = np.flatnonzero(inside & ~np.concatenate([[False], inside[:-1]]))
+        assert list(found["flight"].unique()) == ["wave"]
+        assert list(found["start_time"]) == list(t[starts])
+        assert found["samples"].sum() == inside.sum()
+        assert index.flights_between(100, 200) == ["wave"]
+        assert index.flights_between(700, None) == []
+    print("[OK] test_query_box_splits_windows")
+
+
+def test_rebuild_reads_only_changed_flights():
+    with tempfile.TemporaryDirectory() as tmp:
+        flights, paths = write_archive(tmp, n=5)
+        first = build_index(paths, Path(tmp) / "index")
+        before = np.array(first.segments)
+        del first
+
+        # Move one flight far away; the others keep their segments
+        df = flights["F002"]
+        add_columns(paths["F002"], {"Latitude": df["Latitude"].values - 20})
+        index = build_index(paths, Path(tmp) / "index")
+        moved = index.segments["flight"] == 2
+        assert np.array_equal(index.segments[~moved], before[~moved])
+        assert np.allclose(index.segments["lat_max"][moved], before["lat_max"][moved] - 20)
+    print("[OK] test_rebuild_reads_only_changed_flights")
+
+
+if __name__ == "__main__":
+    test_query_near_matches_brute_force()
+    test_query_box_splits_windows()
+    test_rebuild_reads_only_changed_flights()
+    print("\nAll tests passed.\n")
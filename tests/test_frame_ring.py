@@ -0,0 +1,172 @@
+import multiprocessing as mp
+import threading
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+import src.frame_ring
+from src.frame_ring import RECORD, WRITING, FrameRing, FrameRingReader
+from src.replay import FRAME_COLUMNS, FDRFrame, FrameStore
+
+
+def make_store(n, start=0):
+    t = np.arange(start, start + n, dtype=np.float64)
+    return FrameStore(time=t / 30, lat=20 + t * 1e-5, lon=10 + t * 1e-5,
+                      alt=1000 + t, roll=np.sin(t), pitch=np.cos(t), yaw=t % 360)
+
+
+def same_frames(store, expected):
+    return all(np.array_equal(getattr(store, k), getattr(expected, k)) for k in FRAME_COLUMNS)
+
+
+def test_ring_round_trip():
+    store = make_store(700)
+    with FrameRing(capacity=1000) as ring:
+        reader = FrameRingReader(ring.name, from_start=True)
+        assert len(reader.read()) == 0
+
+        ring.publish(store, block=128)
+        view = reader.read(max_records=500)
+        assert view.dtype == RECORD and len(view) == 500
+        assert np.shares_memory(view, reader.records)  # zero-copy
+        assert np.array_equal(view["seq"], np.arange(500)) and reader.valid()
+        rest = reader.read_store()
+        assert same_frames(rest, store[500:])
+        del view
+
+        frames = list(make_store(5, start=700))
+        ring.publish(iter(frames))
+        late = FrameRingReader(ring.name)  # joins at the newest frame
+        ring.send(FDRFrame(1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0))
+        ring.finish()
+        assert list(reader.frames(timeout=1)) == frames + [FDRFrame(1.0, 2.0, 3.0, 4.0,
+                                                                    5.0, 6.0, 7.0)]
+        assert [f.time for f in late.frames(timeout=1)] == [1.0]
+        assert (reader.received, reader.lost) == (706, 0)
+        reader.close()
+        late.close()
+    print("[OK] test_ring_round_trip")
+
+
+def test_ring_overrun_is_detected():
+    with FrameRing(capacity=100) as ring:
+        reader = FrameRingReader(ring.name, from_start=True)
+        ring.publish(make_store(350), block=64)
+        view = reader.read()
+        assert reader.lost == 250 and np.array_equal(view["seq"], np.arange(250, 300))
+        assert reader.valid()
+
+        # The producer laps the view while it is held
+        ring.publish(make_store(60, start=350))
+        assert not reader.valid()
+        del view
+        view = reader.read()
+        assert view["seq"][0] == 310 and reader.lost == 260
+        del view
+        reader.close()
+
+        other = shared_memory.SharedMemory(create=True, size=4096)
+        try:
+            FrameRingReader(other.name)
+            assert False, "attached to a segment that is not a ring"
+        except ValueError:
+            pass
+        finally:
+            other.close()
+            other.unlink()
+    print("[OK] test_ring_overrun_is_detected")
+
+
+def test_reader_checks_record_stamps():
+    # Counters visible before the records they cover, as a weakly ordered
+    # CPU may show them: the reader goes by each record's seq instead
+    with FrameRing(capacity=100) as ring:
+        reader = FrameRingReader(ring.name, from_start=True)
+        ring.publish(make_store(40))
+        ring.stamps[30] = WRITING
+        view = reader.read()
+        assert np.array_equal(view["seq"], np.arange(30)) and reader.valid()
+        assert len(reader.read()) == 0
+        ring.stamps[30] = 30
+        view = reader.read()
+        assert np.array_equal(view["seq"], np.arange(30, 40))
+
+        # Records lapped before `reserved` shows it: in a held view, and
+        # at the cursor, which skips past the lapped frame
+        ring.stamps[35] = 135
+        assert not reader.valid()
+        del view
+        ring.stamps[40] = 140
+        ring.header[src.frame_ring._PUBLISHED] = 41
+        assert len(reader.read()) == 0 and (reader.cursor, reader.lost) == (41, 1)
+        reader.close()
+    print("[OK] test_reader_checks_record_stamps")
+
+
+def test_attach_leaves_other_threads_tracked():
+    registered = []
+    register = resource_tracker.register
+
+    def record(name, rtype):
+        registered.append(name)
+        if name != "other":  # the ring is unregistered again when it is unlinked
+            register(name, rtype)
+
+    resource_tracker.register = record
+    try:
+        with FrameRing(capacity=8) as ring:
+            FrameRingReader(ring.name).close()
+            assert registered == [ring.shm._name]  # created here, attached untracked
+
+            # Another thread opening a segment while this one attaches
+            src.frame_ring._untracked.active = True
+            try:
+                other = threading.Thread(
+                    target=lambda: resource_tracker.register("other", "shared_memory"))
+                other.start()
+                other.join()
+            finally:
+                src.frame_ring._untracked.active = False
+            assert registered[-1] == "other"
+    finally:
+        resource_tracker.register = register
+    print("[OK] test_attach_leaves_other_threads_tracked")
+
+
+def _consume(name, results):
+    with FrameRingReader(name, from_start=True) as reader:
+        stores = []
+        while True:
+            store = reader.read_store()
+            if store is not None:
+                stores.append(store)
+            elif reader.closed and not reader.available:
+                break
+        total = sum(float(s.alt.sum()) for s in stores)
+        results.put((sum(len(s) for s in stores), reader.lost, total))
+
+
+def test_ring_fans_out_to_processes():
+    store = make_store(20_000)
+    ctx = mp.get_context("spawn")
+    results = ctx.Queue()
+    with FrameRing(capacity=len(store)) as ring:
+        readers = [ctx.Process(target=_consume, args=(ring.name, results))
+                   for _ in range(3)]
+        for p in readers:
+            p.start()
+        ring.publish(store, block=1000)
+        ring.finish()
+        got = [results.get(timeout=60) for _ in readers]
+        for p in readers:
+            p.join()
+    assert got == [(len(store), 0, float(store.alt.sum()))] * 3
+    print("[OK] test_ring_fans_out_to_processes")
+
+
+if __name__ == "__main__":
+    test_ring_round_trip()
+    test_ring_overrun_is_detected()
+    test_reader_checks_record_stamps()
+    test_attach_leaves_other_threads_tracked()
+    test_ring_fans_out_to_processes()
+    print("\nAll tests passed.\n")
@@ -0,0 +1,87 @@
+import tempfile
+from pathlib import Path
+
+import numpy as np
+from src.cache import cache_is_fresh, read_cache, read_header
+from src.derived import DerivedChannels
+from src.export_replay_fdr import write_replay_fdr
+from src.incremental import preprocess_incremental
+from src.loader import interpolate, load_csv, normalize
+from src.replay import compute_xyz
+from tests.test_loader import make_raw_csv
+
+
+def test_incremental_matches_full_run():
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        raw = make_raw_csv(tmp / "full.csv", n=1000).read_bytes()
+        live = tmp / "live.csv"
+        out = {"output_path": tmp / "clean.csv", "cache_path": tmp / "clean.cache",
+               "fdr_path": tmp / "out.fdr"}
+
+        # The recorder appends in uneven pieces, sometimes mid-line
+        cuts = sorted(np.random.default_rng(0).integers(0, len(raw), 8))
+        total = 0
+        for cut in [*cuts, len(raw)]:
+            live.write_bytes(raw[:cut])
+            total += preprocess_incremental(live, **out)
+        # Without its tail the cache is not fresh for a normal run
+        assert not cache_is_fresh(out["cache_path"], live)
+        assert cache_is_fresh(out["cache_path"], live, partial=True)
+        total += preprocess_incremental(live, final=True, **out)
+        assert cache_is_fresh(out["cache_path"], live)
+        assert preprocess_incremental(live, final=True, **out) == 0
+
+        expected = compute_xyz(interpolate(normalize(load_csv(tmp / "full.csv"))))
+        expected.to_csv(tmp / "expected.csv", index=False)
+        write_replay_fdr(expected, tmp / "expected.fdr")
+
+        assert total == len(expected)
+        assert out["output_path"].read_bytes() == (tmp / "expected.csv").read_bytes()
+        assert out["fdr_path"].read_bytes() == (tmp / "expected.fdr").read_bytes()
+        assert read_cache(out["cache_path"]).equals(expected)
+        print("[OK] test_incremental_matches_full_run")
+
+
+def test_incremental_append_after_deriving():
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        raw = make_raw_csv(tmp / "full.csv", n=1000).read_bytes()
+        live = tmp / "live.csv"
+        out = {"output_path": tmp / "clean.csv", "cache_path": tmp / "clean.cache"}
+        live.write_bytes(raw[:len(raw) // 2])
+        preprocess_incremental(live, **out)
+        assert len(DerivedChannels.from_cache(out["cache_path"])["GroundSpeed"]) > 0
+
+        # The derived column can't be extended: it is dropped, then derived again
+        live.write_bytes(raw)
+        preprocess_incremental(live, final=True, **out)
+        header = read_header(out["cache_path"])
+        assert "GroundSpeed" not in [c["name"] for c in header["columns"]]
+        assert "GroundSpeed" not in header["attrs"].get("derived", {})
+        channels = DerivedChannels.from_cache(out["cache_path"])
+        assert not channels.is_cached("GroundSpeed")
+        expected = DerivedChannels.from_df(read_cache(out["cache_path"]))["GroundSpeed"]
+        assert np.array_equal(channels["GroundSpeed"], expected)
+        print("[OK] test_incremental_append_after_deriving")
+
+
+def test_incremental_restarts_on_new_file():
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        live = make_raw_csv(tmp / "live.csv", n=300)
+        first = preprocess_incremental(live, tmp / "clean.csv")
+
+        # A shorter file is a new recording, not an append
+        make_raw_csv(live, n=100)
+        second = preprocess_incremental(live, tmp / "clean.csv", final=True)
+        expected = interpolate(normalize(load_csv(live)))
+        assert first > 0 and second == len(expected)
+        print("[OK] test_incremental_restarts_on_new_file")
+
+
+if __name__ == "__main__":
+    test_incremental_matches_full_run()
+    test_incremental_append_after_deriving()
+    test_incremental_restarts_on_new_file()
+    print("\nAll tests passed.\n")
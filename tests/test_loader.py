@@ -1,6 +1,8 @@
 import pandas as pd
 import numpy as np
-from src.loader import load_csv, normalize, interpolate
+import src.loader
+from src.loader import (load_csv, normalize, interpolate, interpolate_chunks,
+                        preprocess_flight_data, read_raw_file)
 from pathlib import Path
 import tempfile
 
@@ -18,6 +20,28 @@ def make_basic_csv(path):
     }).to_csv(path, index=False)
     return path
 
+def make_raw_csv(path, n=300):
+    """Create a recorder-style CSV with GMT time columns and raw names"""
+    rng = np.random.default_rng(0)
+    t = 36000 + np.round(np.sort(rng.uniform(0, 60, n)), 1)
+    hour = (t // 3600).astype(int)
+    minute = ((t % 3600) // 60).astype(int)
+    df = pd.DataFrame({
+        "GMT_HOUR": hour,
+        "GMT_MINUTE": minute,
+        "GMT_SEC": t - hour * 3600 - minute * 60,
+        "LONP": rng.normal(10, 1, n),
+        "LATP": rng.normal(20, 1, n),
+        "baroaltitude": rng.normal(1000, 10, n),
+        "ROLL": rng.normal(0, 5, n),
+        "PTCH": rng.normal(0, 5, n),
+        "HDGS": rng.uniform(0, 360, n),
+        "UNUSED": 1,
+    })
+    df.loc[[3, 50, 51], "ROLL"] = np.nan
+    df.to_csv(path, index=False)
+    return path
+
 # === tests ===
 def test_load_csv_required_columns():
     with tempfile.TemporaryDirectory() as tmp:
@@ -55,9 +79,87 @@ def test_interpolate():
     assert len(out) == 10 and np.isclose(out["Longitude"].iloc[5], 5), "Interpolate failed"
     print("[OK] test_interpolate")
 
+def test_preprocess_chunked_matches_in_memory():
+    with tempfile.TemporaryDirectory() as tmp:
+        raw = make_raw_csv(Path(tmp) / "raw.csv")
+        full = Path(tmp) / "full.csv"
+        preprocess_flight_data(raw, full)
+        for chunksize in (3, 64, 10_000):
+            streamed = Path(tmp) / f"stream_{chunksize}.csv"
+            preprocess_flight_data(raw, streamed, chunksize=chunksize)
+            assert streamed.read_bytes() == full.read_bytes(), \
+                f"Chunked output differs (chunksize={chunksize})"
+        print("[OK] test_preprocess_chunked_matches_in_memory")
+
+def test_interpolate_heading_wrap():
+    out = interpolate(pd.DataFrame({
+        "Time": [0.0, 1.0, 2.0],
+        "Yaw": [350.0, 10.0, 30.0],
+        "Roll": [0.0, 10.0, 20.0],
+    }), rate_hz=4)
+    assert np.allclose(out["Yaw"], [350, 355, 0, 5, 10, 15, 20, 25]), \
+        f"Heading swept the long way round: {out['Yaw'].tolist()}"
+    assert np.allclose(out["Roll"], np.arange(8) * 2.5)
+    print("[OK] test_interpolate_heading_wrap")
+
+def test_interpolate_methods():
+    t = np.linspace(0, 10, 21)
+    df = pd.DataFrame({"Time": t, "Sine": np.sin(t), "Flag": np.floor(t)})
+    out = interpolate(df, rate_hz=10, methods={"Sine": "cubic", "Flag": "hold"})
+    linear = interpolate(df, rate_hz=10)
+
+    cubic_err = np.abs(out["Sine"] - np.sin(out["Time"])).max()
+    linear_err = np.abs(linear["Sine"] - np.sin(linear["Time"])).max()
+    assert cubic_err < linear_err / 2, "Cubic should beat linear on a smooth signal"
+    assert (out["Flag"] == np.floor(df["Time"].values[
+        np.searchsorted(t, out["Time"], side="right") - 1])).all(), "Hold mismatch"
+
+    # Streaming gives the same result as the in-memory engine
+    chunks = (df.iloc[i:i + 4].reset_index(drop=True) for i in range(0, len(df), 4))
+    methods = {"Sine": "cubic", "Flag": "hold"}
+    streamed = pd.concat(list(interpolate_chunks(chunks, 10, methods=methods)),
+                         ignore_index=True)
+    assert streamed.equals(out), "Chunked cubic/hold differs"
+    print("[OK] test_interpolate_methods")
+
+
+def test_load_csv_engines_match():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = make_raw_csv(Path(tmp) / "raw.csv", n=2000)
+        expected = normalize(load_csv(path, engine="c"))
+        for workers in (2, 3, 7):
+            out = normalize(load_csv(path, engine="threads", workers=workers))
+            assert out.equals(expected), f"threads x{workers} differs"
+
+        # "auto" never picks pyarrow, whose floats may differ by an ulp
+        have_pyarrow, read_pyarrow = src.loader.HAVE_PYARROW, src.loader._read_pyarrow
+        src.loader.HAVE_PYARROW, src.loader._read_pyarrow = True, None
+        try:
+            assert normalize(load_csv(path, engine="auto", workers=2)).equals(expected)
+        finally:
+            src.loader.HAVE_PYARROW, src.loader._read_pyarrow = have_pyarrow, read_pyarrow
+        if have_pyarrow:
+            raw, arrow = read_raw_file(path, "c"), read_raw_file(path, "pyarrow")
+            assert sorted(arrow.columns) == sorted(raw.columns) and len(arrow) == len(raw)
+            for name in raw.columns:
+                np.testing.assert_array_max_ulp(arrow[name].values, raw[name].values, 1)
+
+        # Junk in a used column falls back to untyped parsing and coercion
+        raw = pd.read_csv(path, dtype={"ROLL": object})
+        raw.loc[10, "ROLL"] = "n/a"
+        raw.to_csv(path, index=False)
+        expected = normalize(load_csv(path, engine="c"))
+        assert expected["Roll"].dtype == np.float64
+        assert normalize(load_csv(path, engine="threads", workers=3)).equals(expected)
+        print("[OK] test_load_csv_engines_match")
+
 # === run tests ===
 if __name__ == "__main__":
     test_load_csv_required_columns()
     test_normalize()
     test_interpolate()
+    test_preprocess_chunked_matches_in_memory()
+    test_interpolate_heading_wrap()
+    test_interpolate_methods()
+    test_load_csv_engines_match()
     print("\nAll tests passed.\n")
\ No newline at end of file
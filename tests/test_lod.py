@@ -0,0 +1,98 @@
+import matplotlib
+
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+from src.lod import LODPyramid, PathLOD, view_indices
+from src.visualize import MapPlot, plot_attitude
+
+
+def test_lod_keeps_range_extremes():
+    rng = np.random.default_rng(0)
+    y = np.cumsum(rng.normal(size=100_003))
+    pyramid = LODPyramid(y)
+    for i0, i1 in [(0, len(y)), (17, 90_000), (5_000, 5_900), (40, 60)]:
+        idx = pyramid.extremes(i0, i1, max_buckets=200)
+        assert idx[0] == i0 and idx[-1] == i1 - 1
+        assert np.all(np.diff(idx) > 0)
+        assert y[idx].min() == y[i0:i1].min() and y[idx].max() == y[i0:i1].max()
+        assert len(idx) <= 4 * 200 + 2
+    print("[OK] test_lod_keeps_range_extremes")
+
+
+def test_lod_keeps_spikes():
+    t = np.arange(1_000_000) / 30.0
+    roll = np.zeros(len(t))
+    roll[[1234, 500_001, 777_777]] = [35.0, -40.0, 12.0]
+    idx = view_indices(t, [LODPyramid(roll)], t[0], t[-1], pixels=800)
+    assert len(idx) < 4000
+    assert {1234, 500_001, 777_777} <= set(idx.tolist())
+    print("[OK] test_lod_keeps_spikes")
+
+
+def test_plot_attitude_is_decimated_and_follows_zoom():
+    n = 200_000
+    t = np.arange(n) / 30.0
+    df = pd.DataFrame({"Time": t, "Roll": np.sin(t), "Pitch": np.cos(t),
+                       "Yaw": (t * 3) % 360})
+    fig = plot_attitude(df)
+    ax = fig.axes[0]
+    line = ax.lines[0]
+    full = len(line.get_xdata())
+    assert full < 4 * ax.bbox.width + 2
+
+    # Zooming in to a few seconds shows every sample again
+    ax.set_xlim(100.0, 103.0)
+    x = line.get_xdata()
+    assert np.array_equal(x, t[3000:3091])
+    plt.close(fig)
+    print("[OK] test_plot_attitude_is_decimated_and_follows_zoom")
+
+
+def test_path_follows_zoom_without_gaps():
+    n = 1_000_000
+    angle = np.linspace(0, 6 * np.pi, n)
+    lon, lat = np.cos(angle), np.sin(angle)  # three laps of a unit circle
+    lod = PathLOD([lon, lat], [2.0, 2.0])
+    idx, connected = lod.view([(-1, 1), (-1, 1)], pixels=500)
+    # About one point per pixel of path, and no step longer than ~2 pixels
+    assert len(idx) < 3 * 2 * np.pi / 2 * 500 * 1.1 and connected.all()
+    assert np.hypot(np.diff(lon[idx]), np.diff(lat[idx])).max() < 2 * 2 / 500
+
+    plot = MapPlot()
+    plot.update(pd.DataFrame({"Longitude": lon, "Latitude": lat, "Altitude": angle}))
+    full = plot.segments.get_segments()
+    assert len(full) < 3 * len(idx)
+    # Zoomed in 100x, the visible arc is drawn at the finer resolution
+    plot.ax.set_xlim(0.99, 1.01)
+    plot.ax.set_ylim(-0.01, 0.01)
+    zoomed = np.asarray(plot.segments.get_segments())
+    step = np.hypot(*(zoomed[:, 1] - zoomed[:, 0]).T)
+    assert len(zoomed) > 100 and step.max() < 2 * 0.02 / 400
+    print("[OK] test_path_follows_zoom_without_gaps")
+
+
+def test_trail_span_ends_at_its_sample():
+    n = 200_000
+    angle = np.linspace(0, 6 * np.pi, n)
+    lod = PathLOD([np.cos(angle), np.sin(angle)], [2.0, 2.0])
+    full = lod.level(500, 0)
+    trail = lod.span(500, 0, 123_457)
+    assert trail[0] == 0 and trail[-1] == 123_457
+    assert (np.diff(trail) > 0).all() and len(trail) <= np.searchsorted(full, 123_457) + 2
+    # Baked piece by piece, a trail keeps the same samples as in one go
+    pieces = [lod.span(500, a, b) for a, b in [(0, 5000), (5000, 5001), (5001, 123_457)]]
+    assert np.array_equal(np.unique(np.concatenate(pieces)), np.union1d(trail, [5000, 5001]))
+    assert np.array_equal(lod.span(500, 7, 7), [7])
+    print("[OK] test_trail_span_ends_at_its_sample")
+
+
+if __name__ == "__main__":
+    test_lod_keeps_range_extremes()
+    test_lod_keeps_spikes()
+    test_plot_attitude_is_decimated_and_follows_zoom()
+    test_path_follows_zoom_without_gaps()
+    test_trail_span_ends_at_its_sample()
+    print("\nAll tests passed.\n")
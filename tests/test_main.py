@@ -0,0 +1,96 @@
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+import main
+from src.cache import read_header
+from src.fdr_binary import open_binary_fdr, read_text_fdr
+from tests.test_loader import make_raw_csv
+
+
+def _modules_after(code):
+    """ Heavy packages loaded by running code in a fresh interpreter """
+    probe = (f"import sys\n{code}\n"
+             "print(*[m for m in ('numpy', 'pandas', 'matplotlib', 'matplotlib.pyplot')"
+             " if m in sys.modules])")
+    out = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True,
+                         check=True, cwd=Path(__file__).resolve().parent.parent)
+    return out.stdout.split()
+
+
+def test_parse_args_defaults_to_run():
+    args = main.parse_args(["--input", "raw.csv", "--skip-viz"])
+    assert args.command == "run" and args.input == "raw.csv" and args.skip_viz
+    args = main.parse_args(["export", "--clean", "c.csv", "--fdr", "out.fdrb"])
+    assert args.command == "export" and args.fdr == "out.fdrb"
+    for argv in (["export", "--input", "raw.csv"], ["preprocess"],
+                 ["--input", "raw.csv", "--earth-model", "flat"],
+                 ["preprocess", "--input", "raw.csv", "--derived", "Nope"],
+                 ["export", "--phase", "hover"], ["--batch", "raw", "--phase", "approach"],
+                 ["--batch", "raw", "--video", "flight.mp4"]):
+        try:
+            main.parse_args(argv)
+            assert False, f"accepted {argv}"
+        except SystemExit:
+            pass
+    print("[OK] test_parse_args_defaults_to_run")
+
+
+def test_startup_imports_stay_light():
+    assert _modules_after("import main; main.parse_args(['plot', '--report', 'r'])") == []
+    assert "matplotlib" not in _modules_after(
+        "import main; main.parse_args(['export']); import src.batch")
+    assert "matplotlib.pyplot" not in _modules_after("import src.report")
+    print("[OK] test_startup_imports_stay_light")
+
+
+def test_subcommands_chain():
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        raw = make_raw_csv(tmp / "raw.csv")
+        clean = str(tmp / "clean.csv")
+        writes = []
+        to_csv = pd.DataFrame.to_csv
+        pd.DataFrame.to_csv = lambda df, path, *a, **kw: (writes.append(str(path)),
+                                                          to_csv(df, path, *a, **kw))
+        try:
+            main.main(["preprocess", "--input", str(raw), "--clean", clean,
+                       "--derived", "GroundSpeed"])
+        finally:
+            pd.DataFrame.to_csv = to_csv
+        assert (tmp / "clean.cache").is_dir()
+        assert writes == [clean] and "X" in pd.read_csv(clean)  # written once, with X/Y/Z
+        # Flight phases are only classified when --phase asks for them
+        header = read_header(tmp / "clean.cache")
+        assert "phases" not in header["attrs"]
+        assert "VerticalSpeed" not in [c["name"] for c in header["columns"]]
+
+        main.main(["export", "--clean", clean, "--fdr", str(tmp / "a.fdr")])
+        main.main(["export", "--clean", clean, "--fdr", str(tmp / "a.fdrb"),
+                   "--archive", str(tmp / "a.fda")])
+        text = read_text_fdr(tmp / "a.fdr")
+        binary = open_binary_fdr(tmp / "a.fdrb")
+        assert len(text) == len(binary) > 0 and (tmp / "a.fda").exists()
+
+        main.main(["replay", "--clean", clean, "--video", str(tmp / "v.gif"),
+                   "--speed", "20"])
+        main.main(["plot", "--clean", clean, "--report", str(tmp / "report"),
+                   "--workers", "1"])
+        assert (tmp / "v.gif").exists() and (tmp / "report" / "index.html").exists()
+
+        try:
+            main.main(["export", "--clean", str(tmp / "missing.csv")])
+            assert False, "exported without a cache"
+        except SystemExit as e:
+            assert "preprocess" in str(e)
+    print("[OK] test_subcommands_chain")
+
+
+if __name__ == "__main__":
+    test_parse_args_defaults_to_run()
+    test_startup_imports_stay_light()
+    test_subcommands_chain()
+    print("\nAll tests passed.\n")
@@ -0,0 +1,123 @@
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import main
+import src.phases
+from src.cache import add_columns, read_header, write_cache
+from src.fdr_binary import open_binary_fdr
+from src.phases import (PHASES, flight_phases, phase_codes, phase_intervals,
+                        phase_slices, phase_store, segment_phases, select_phase)
+from src.replay import R_EARTH, FrameStore
+
+# (seconds, ground speed from, to (m/s), vertical speed (m/s))
+LEGS = [(300, 5, 5, 0), (40, 5, 75, 0), (1200, 75, 230, 8), (3600, 230, 230, 0),
+        (1500, 230, 90, -6), (300, 90, 70, -3.5), (30, 70, 15, 0), (200, 8, 8, 0)]
+
+
+def make_flight(rate_hz=8, noise=2.0, seed=0):
+    """ Cleaned-data columns of a whole flight, gate to gate, flown north """
+    rng = np.random.default_rng(seed)
+    k = [int(sec * rate_hz) for sec, *_ in LEGS]
+    speed = np.concatenate([np.linspace(a, b, n) for n, (_, a, b, _) in zip(k, LEGS)])
+    vs = np.repeat([v for *_, v in LEGS], k).astype(float)
+    n = len(speed)
+    alt = 100 + np.cumsum(vs) / rate_hz + rng.normal(0, noise, n)
+    return pd.DataFrame({
+        "Time": 36000 + np.arange(n) / rate_hz,
+        "Longitude": np.full(n, 10.0),
+        "Latitude": 20 + np.degrees(np.cumsum(speed) / rate_hz / R_EARTH),
+        "Altitude": alt,
+        "Roll": np.zeros(n), "Pitch": np.zeros(n), "Yaw": np.zeros(n),
+    })
+
+
+def test_segment_phases_gate_to_gate():
+    df = make_flight()
+    table = segment_phases(df)
+    assert list(table["phase"]) == list(PHASES) + ["taxi"]
+
+    # Contiguous, covering every row, each run at least min_seconds long
+    assert table["start"].iloc[0] == 0 and table["stop"].iloc[-1] == len(df)
+    assert (table["start"].values[1:] == table["stop"].values[:-1]).all()
+    assert (table["end_time"] - table["start_time"]).min() > 15
+
+    # Boundaries close to the profile's: the climb starts with the climb
+    # leg, the approach below ~900 m above the arrival field
+    t = table.set_index("phase")["start_time"] - 36000
+    assert abs(t["climb"] - 340) < 60 and abs(t["cruise"] - 1540) < 15
+    assert abs(t["descent"] - 5140) < 15
+    field = df["Altitude"].values[-400:].mean()
+    at = np.searchsorted(df["Time"].values, t["approach"] + 36000)
+    assert abs(df["Altitude"].values[at] - field - 900) < 30
+
+    # Noise around the climb-rate threshold does not make the label flicker
+    noisy = segment_phases(make_flight(noise=6.0, seed=1))
+    assert list(noisy["phase"]) == list(table["phase"])
+    raw = phase_codes(df["Time"].values, df["Altitude"].values,
+                      np.full(len(df), 230.0), np.zeros(len(df)))
+    assert (raw == PHASES.index("cruise")).all()  # never slow: no field, no ground
+    print("[OK] test_segment_phases_gate_to_gate")
+
+
+def test_phase_intervals_fold_short_runs():
+    time = np.arange(12, dtype=float)
+    codes = np.array([3, 1, 2, 2, 2, 4, 2, 2, 5, 5, 5, 5], dtype=np.int8)
+    out, starts, stops = phase_intervals(codes, time, min_seconds=2)
+    assert out.tolist() == [2, 5] and starts.tolist() == [0, 8]
+    assert stops.tolist() == [8, 12]
+    out, starts, stops = phase_intervals(codes[:0], time[:0])
+    assert len(out) == len(starts) == len(stops) == 0
+    print("[OK] test_phase_intervals_fold_short_runs")
+
+
+def test_phase_table_is_cached_and_selected():
+    df = make_flight(rate_hz=4)
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = Path(tmp) / "clean.cache"
+        write_cache(df, cache)
+        table = flight_phases(cache)
+        saved = read_header(cache)["attrs"]["phases"]
+        assert saved["table"]["phase"] == list(table["phase"])
+
+        segment = src.phases.segment_phases
+        src.phases.segment_phases = None  # a reused table is not recomputed
+        try:
+            assert flight_phases(cache).equals(table)
+        finally:
+            src.phases.segment_phases = segment
+
+        approach = phase_slices(table, "approach")[0]
+        store = phase_store(cache, "approach")
+        assert len(store) == approach.stop - approach.start
+        assert np.array_equal(store.alt, df["Altitude"].values[approach])
+        taxi = select_phase(df, table, "taxi")
+        assert len(taxi) == sum(s.stop - s.start for s in phase_slices(table, "taxi"))
+        both = select_phase(FrameStore.from_df(df), table, "taxi")
+        assert np.array_equal(both.time, taxi["Time"].values)
+        try:
+            phase_slices(table, "hover")
+            assert False, "accepted an unknown phase"
+        except ValueError:
+            pass
+
+        # A rewritten input channel invalidates the table
+        add_columns(cache, {"Altitude": df["Altitude"].values + 5000})
+        flight_phases(cache)
+        assert read_header(cache)["attrs"]["phases"]["signature"] != saved["signature"]
+
+        add_columns(cache, {"Altitude": df["Altitude"].values})
+        main.main(["export", "--clean", str(Path(tmp) / "clean.csv"), "--phase", "approach",
+                   "--fdr", str(Path(tmp) / "approach.fdrb")])
+        records = open_binary_fdr(Path(tmp) / "approach.fdrb")
+        assert len(records) == len(store)
+    print("[OK] test_phase_table_is_cached_and_selected")
+
+
+if __name__ == "__main__":
+    test_segment_phases_gate_to_gate()
+    test_phase_intervals_fold_short_runs()
+    test_phase_table_is_cached_and_selected()
+    print("\nAll tests passed.\n")
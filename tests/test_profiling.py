@@ -0,0 +1,59 @@
+import json
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from src.loader import interpolate, normalize
+from src.profiling import StageProfiler, profiled, stage
+
+
+def make_df(n=1000):
+    t = np.arange(n) / 10.0
+    return pd.DataFrame({"Time": t, "Longitude": t, "Latitude": t, "Altitude": t,
+                         "Roll": t, "Pitch": t, "Yaw": t % 360})
+
+
+def test_profiler_records_stages():
+    with StageProfiler() as profiler:
+        df = interpolate(normalize(make_df()), 30)
+        for _ in range(3):
+            with stage("chunk", rows=10):
+                pass
+
+    stages = {s["name"]: s for s in profiler.report()["stages"]}
+    assert stages["normalize"]["rows"] == 1000
+    assert stages["interpolate"]["rows"] == len(df)
+    assert stages["chunk"]["calls"] == 3 and stages["chunk"]["rows"] == 30
+    assert stages["interpolate"]["peak_rss_mb"] > 0
+    assert profiler.seconds >= stages["interpolate"]["seconds"]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        profiler.write(Path(tmp) / "profile.json", args={"input": "x.csv"})
+        report = json.loads((Path(tmp) / "profile.json").read_text())
+        assert report["args"] == {"input": "x.csv"} and len(report["stages"]) == 3
+    print("[OK] test_profiler_records_stages")
+
+
+def test_profiling_is_inert_without_profiler():
+    calls = []
+
+    @profiled("noop")
+    def work(x):
+        calls.append(x)
+        return x
+
+    with stage("outside") as stats:
+        assert stats is None
+    assert work(5) == 5 and calls == [5]
+
+    with StageProfiler() as profiler:
+        work(np.zeros(7))
+    assert profiler.stages["noop"].rows == 7
+    print("[OK] test_profiling_is_inert_without_profiler")
+
+
+if __name__ == "__main__":
+    test_profiler_records_stages()
+    test_profiling_is_inert_without_profiler()
+    print("\nAll tests passed.\n")
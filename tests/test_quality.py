@@ -0,0 +1,156 @@
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from src.loader import preprocess_flight_data
+from src.quality import check_chunks, check_quality, rolling_zscore
+
+
+def make_flight(n=20_000, rate_hz=8):
+    """Smooth climbing turn with a little sensor noise"""
+    rng = np.random.default_rng(1)
+    t = np.arange(n) / rate_hz
+    return pd.DataFrame({
+        "Time": t,
+        "Longitude": 10.0 + 1e-4 * t + rng.normal(0, 2e-6, n),
+        "Latitude": 20.0 + 5e-5 * t + rng.normal(0, 2e-6, n),
+        "Altitude": 1000.0 + 5.0 * t + rng.normal(0, 0.5, n),
+        "Roll": 10.0 * np.sin(t / 60) + rng.normal(0, 0.1, n),
+        "Pitch": 2.0 + rng.normal(0, 0.1, n),
+        "Yaw": (350.0 + 0.5 * t) % 360,
+    })
+
+
+def test_clean_flight_has_no_events():
+    _, events = check_quality(make_flight())
+    assert len(events) == 0, events
+    print("[OK] test_clean_flight_has_no_events")
+
+
+def test_detects_spikes_jumps_gaps_and_outliers():
+    df = make_flight()
+    df.loc[1000, "Altitude"] += 800.0           # one-sample spike
+    df.loc[5000:, "Latitude"] += 0.05           # position jump that stays
+    df.loc[9000, "Pitch"] += 5.0                # in rate, but out of family
+    df.loc[12000, "Yaw"] = (df.loc[12000, "Yaw"] + 100) % 360
+    df = df.drop(index=range(15000, 15100)).reset_index(drop=True)
+
+    _, events = check_quality(df)
+    found = {(e.channel, e.kind, e.start_index) for e in events.itertuples()}
+    assert ("Altitude", "spike", 1000) in found
+    assert ("Latitude", "jump", 5000) in found
+    assert ("Pitch", "outlier", 9000) in found
+    assert ("Yaw", "spike", 12000) in found
+    assert ("Time", "gap", 15000) in found
+    # Yaw wrapping through north is not a fault, nor the sample after a spike
+    assert not ((events.channel == "Yaw") & (events.kind == "jump")).any()
+    assert len(events) == 5, events
+    gap = events[events.kind == "gap"].iloc[0]
+    assert np.isclose(gap.value, 101 / 8)
+    print("[OK] test_detects_spikes_jumps_gaps_and_outliers")
+
+
+def test_repair_and_drop():
+    clean = make_flight()
+    df = clean.copy()
+    df.loc[[1000, 7000], "Altitude"] += 800.0
+    df.loc[3000, "Roll"] = 80.0
+
+    repaired, events = check_quality(df, fix="repair")
+    assert len(repaired) == len(df)
+    assert np.abs(repaired["Altitude"] - clean["Altitude"]).max() < 3.0
+    assert np.abs(repaired["Roll"] - clean["Roll"]).max() < 1.0
+    assert repaired["Longitude"].equals(df["Longitude"])
+
+    dropped, _ = check_quality(df, fix="drop")
+    assert len(dropped) == len(df) - 3
+    assert not dropped["Time"].isin(df["Time"][[1000, 3000, 7000]]).any()
+
+    try:
+        check_quality(df, fix="smooth")
+        assert False, "unknown fix accepted"
+    except ValueError:
+        pass
+    print("[OK] test_repair_and_drop")
+
+
+def test_zscore_matches_direct_window():
+    rng = np.random.default_rng(2)
+    x = np.cumsum(rng.normal(size=500)) + 1e4
+    z = rolling_zscore(x, window=11)
+    for i in (0, 3, 250, 499):
+        window = np.delete(x[max(i - 5, 0):i + 6], min(i, 5))
+        expected = abs(x[i] - window.mean()) / window.std()
+        assert np.isclose(z[i], expected, rtol=1e-6)
+    print("[OK] test_zscore_matches_direct_window")
+
+
+def test_long_series_has_no_false_outliers():
+    # Running sums over 2M samples far from zero swamp 2e-6 of noise
+    n = 2_000_000
+    rng = np.random.default_rng(3)
+    df = pd.DataFrame({"Time": np.arange(n) / 30.0,
+                       "Longitude": np.linspace(-70, 50, n) + rng.normal(0, 2e-6, n)})
+    fixed, events = check_quality(df, fix="drop")
+    assert len(events) == 0, events
+    assert len(fixed) == n
+
+    x = df["Longitude"].values
+    z = rolling_zscore(x, window=11)
+    for i in (n // 2, n - 7):
+        window = np.delete(x[i - 5:i + 6], 5)
+        expected = abs(x[i] - window.mean()) / window.std()
+        assert np.isclose(z[i], expected, rtol=1e-6)
+    print("[OK] test_long_series_has_no_false_outliers")
+
+
+def test_chunks_count_indices_from_stream_start():
+    df = make_flight()
+    df.loc[[1000, 13000], "Altitude"] += 800.0
+    chunks = [df.iloc[i:i + 5000].reset_index(drop=True) for i in range(0, len(df), 5000)]
+    events = []
+    out = list(check_chunks(iter(chunks), events, fix="drop"))
+    events = pd.concat(events)
+    assert sorted(events.start_index) == [1000, 13000]
+    assert sum(len(c) for c in out) == len(df) - 2
+    print("[OK] test_chunks_count_indices_from_stream_start")
+
+
+def test_preprocess_writes_events():
+    df = make_flight(4000)
+    t = 36000 + df["Time"]
+    raw = pd.DataFrame({
+        "GMT_HOUR": (t // 3600).astype(int),
+        "GMT_MINUTE": ((t % 3600) // 60).astype(int),
+        "GMT_SEC": t % 60,
+        "LONP": df["Longitude"], "LATP": df["Latitude"],
+        "baroaltitude": df["Altitude"], "ROLL": df["Roll"],
+        "PTCH": df["Pitch"], "HDGS": df["Yaw"],
+    })
+    raw.loc[2000, "baroaltitude"] += 800.0
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        raw.to_csv(tmp / "raw.csv", index=False)
+        for chunksize in (None, 1500):
+            events_path = tmp / f"events_{chunksize}.csv"
+            preprocess_flight_data(tmp / "raw.csv", tmp / "clean.csv",
+                                   chunksize=chunksize, events_path=events_path,
+                                   fix="repair")
+            events = pd.read_csv(events_path)
+            assert list(events[["channel", "kind"]].itertuples(index=False, name=None)) \
+                == [("Altitude", "spike")]
+            clean = pd.read_csv(tmp / "clean.csv")
+            assert clean["Altitude"].max() < df["Altitude"].max() + 10
+    print("[OK] test_preprocess_writes_events")
+
+
+if __name__ == "__main__":
+    test_clean_flight_has_no_events()
+    test_detects_spikes_jumps_gaps_and_outliers()
+    test_repair_and_drop()
+    test_zscore_matches_direct_window()
+    test_long_series_has_no_false_outliers()
+    test_chunks_count_indices_from_stream_start()
+    test_preprocess_writes_events()
+    print("\nAll tests passed.\n")
@@ -0,0 +1,67 @@
+import tempfile
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+from src.render import TrailRenderer, frame_indices, render_replay
+
+
+def make_track(n=3000):
+    t = np.arange(n) / 30.0
+    return t, np.cos(t / 10) * 1000, np.sin(t / 10) * 1000
+
+
+def test_frame_indices_follow_output_fps():
+    t = np.arange(300) / 30.0  # 10 s of data
+    idx = frame_indices(t, fps=10, speed=2.0)
+    assert len(idx) == 50
+    assert np.allclose(t[idx], np.arange(50) * 0.2)
+    print("[OK] test_frame_indices_follow_output_fps")
+
+
+def test_render_png_sequence_and_gif():
+    t, x, y = make_track()
+    with tempfile.TemporaryDirectory() as tmp:
+        frames = render_replay(t, x, y, Path(tmp) / "replay.png", fps=5,
+                               speed=10.0, size=(4, 3), dpi=50)
+        pngs = sorted(Path(tmp).glob("replay_*.png"))
+        assert frames == len(pngs) == 50
+        assert Image.open(pngs[0]).size == (200, 150)
+
+        frames = render_replay(t, x, y, Path(tmp) / "replay.gif", fps=5,
+                               speed=10.0, size=(4, 3), dpi=50, workers=2)
+        with Image.open(Path(tmp) / "replay.gif") as gif:
+            assert gif.n_frames == frames == 50
+        assert not list(Path(tmp).glob("*.part*"))
+        print("[OK] test_render_png_sequence_and_gif")
+
+
+def test_trail_is_drawn_incrementally():
+    t, x, y = make_track()
+    renderer = TrailRenderer(x, y, size=(4, 3), dpi=50)
+    renderer.render(100)
+    assert renderer.drawn == 100
+    # A later frame only adds the samples since the previous one
+    late = renderer.render(2000).copy()
+    fresh = TrailRenderer(x, y, size=(4, 3), dpi=50)
+    assert np.abs(fresh.render(2000).astype(int) - late).mean() < 1.0
+    print("[OK] test_trail_is_drawn_incrementally")
+
+
+def test_render_rejects_unknown_format():
+    t, x, y = make_track(10)
+    try:
+        render_replay(t, x, y, "replay.avi")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("expected ValueError for .avi")
+    print("[OK] test_render_rejects_unknown_format")
+
+
+if __name__ == "__main__":
+    test_frame_indices_follow_output_fps()
+    test_render_png_sequence_and_gif()
+    test_trail_is_drawn_incrementally()
+    test_render_rejects_unknown_format()
+    print("\nAll tests passed.\n")
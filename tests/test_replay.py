@@ -1,6 +1,14 @@
+import tempfile
+import threading
+import time
+from pathlib import Path
+
 import pandas as pd
 import numpy as np
-from src.replay import FDRFrame, generate_replay_frames
+from src.cache import write_cache
+from src.replay import (FDRFrame, FrameStore, ReplayScheduler, TimeIndex, WGS84_A, WGS84_B,
+                        compute_xyz, ecef_to_enu, ecef_to_latlon, enu_to_ecef,
+                        generate_replay_frames, latlon_to_xyz)
 
 
 def make_dummy_df():
@@ -119,6 +127,163 @@ def test_generate_fdr_frames_large_dataset():
     print(f"[OK] Large dataset ({n} rows) processed correctly")
 
 
+def test_frame_store_slicing_and_lookup():
+    """Test zero-copy slices and lookup by timestamp."""
+    df = make_dummy_df()
+    store = FrameStore.from_df(df)
+
+    head = store[:2]
+    assert len(head) == 2 and np.shares_memory(head.lat, store.lat), "Slice copied"
+    assert store[-1] == FDRFrame(2.0, 22.0, 12.0, 120.0, 2.0, 7.0, 12.0)
+    assert store.frame_at(1.5).time == 1.0, "frame_at should return the frame at or before t"
+    assert store.frame_at(-5).time == 0.0
+    assert [f.time for f in store.between(0.5, 2.0)] == [1.0]
+    print("[OK] FrameStore slicing and lookup correct")
+
+
+def test_frame_store_loader_columns():
+    """Test that cleaned loader output (Roll/Pitch/Yaw, X/Y/Z) is accepted."""
+    df = make_dummy_df().rename(columns={
+        "Roll (deg)": "Roll", "Pitch (deg)": "Pitch", "Yaw (deg)": "Yaw"
+    }).assign(X=1.0, Y=2.0, Z=3.0)
+    store = FrameStore.from_df(df)
+    assert store.has_xyz and store[1:].z[0] == 3.0
+    assert list(store) == list(generate_replay_frames(make_dummy_df()))
+    print("[OK] FrameStore accepts loader columns")
+
+
+def test_time_index_matches_binary_search():
+    """Test grid and irregular lookups against np.searchsorted."""
+    rng = np.random.default_rng(0)
+    grids = [np.arange(3.2, 400, 1 / 30), np.sort(rng.uniform(0, 400, 5000)),
+             np.repeat(np.arange(0.0, 50.0), 2)]
+    for times in grids:
+        index = TimeIndex(times)
+        queries = np.concatenate([times, rng.uniform(-10, 410, 2000), [np.nan]])
+        expected = np.searchsorted(times, queries, side="right") - 1
+        assert np.array_equal(index.indices(queries), expected)
+        assert [index.index(t) for t in queries[::50]] == list(expected[::50])
+        assert ([index.left(t) for t in queries[::50]]
+                == list(np.searchsorted(times, queries[::50], side="left")))
+    print("[OK] TimeIndex matches binary search")
+
+
+def test_frame_store_from_cache_seek():
+    """Test seeking, windows and sampling on a memory-mapped store."""
+    times = np.arange(0.0, 600.0, 1 / 30)
+    df = pd.DataFrame({
+        "Time": times, "Latitude": times / 100, "Longitude": -times / 100,
+        "Altitude": times * 2, "Roll": np.sin(times), "Pitch": np.cos(times),
+        "Yaw": (times * 10) % 360,
+    })
+    with tempfile.TemporaryDirectory() as tmp:
+        write_cache(df, Path(tmp) / "flight.cache")
+        store = FrameStore.from_cache(Path(tmp) / "flight.cache")
+        assert isinstance(store.time.base, np.memmap)
+
+        assert store.frame_at(123.45).time == times[3703]
+        window = store.window(10.0, 11.0)
+        assert len(window) == 30 and window.time[0] == times[300]
+
+        frame = store.sample(100.0 + 1 / 60)
+        assert abs(frame.alt - (200.0 + 1 / 30)) < 1e-9
+        # Heading interpolates across north, not back through 180
+        wrap = store.sample([35.95, 36.05])
+        assert np.all((wrap.yaw > 359) | (wrap.yaw < 1)), wrap.yaw
+        del store, window, wrap  # release the memmaps before cleanup
+    print("[OK] Memory-mapped FrameStore seek correct")
+
+
+def test_wgs84_ecef():
+    """Test WGS-84 ECEF against known points and the inverse conversion."""
+    x, y, z = latlon_to_xyz([0.0, 90.0], [0.0, 0.0], [0.0, 0.0], model="wgs84")
+    assert np.isclose(x[0], WGS84_A) and np.isclose(z[1], WGS84_B), "Reference points wrong"
+
+    rng = np.random.default_rng(0)
+    lat = rng.uniform(-89, 89, 10_000)
+    lon = rng.uniform(-180, 180, 10_000)
+    alt = rng.uniform(0, 15_000, 10_000)
+    x, y, z = latlon_to_xyz(lat, lon, alt, model="wgs84")
+    lat2, lon2, alt2 = ecef_to_latlon(x, y, z)
+    assert np.allclose(lat2, lat, atol=1e-9) and np.allclose(lon2, lon, atol=1e-9)
+    assert np.allclose(alt2, alt, atol=1e-3), "Inverse altitude mismatch"
+
+    df = make_dummy_df()
+    sphere = compute_xyz(df)
+    wgs84 = compute_xyz(df, model="wgs84")
+    assert not np.allclose(sphere["Z"], wgs84["Z"]), "Models should differ"
+    print("[OK] WGS-84 ECEF correct")
+
+
+def test_enu_roundtrip():
+    """Test ENU around a reference point."""
+    x, y, z = latlon_to_xyz([50.0, 50.0], [10.0, 10.0], [1000.0, 1100.0], model="wgs84")
+    e, n, u = ecef_to_enu(x, y, z, 50.0, 10.0, 1000.0)
+    assert np.allclose([e[0], n[0], u[0]], 0, atol=1e-6)
+    assert np.isclose(u[1], 100.0, atol=1e-6), "Up should be the altitude difference"
+    x2, y2, z2 = enu_to_ecef(e, n, u, 50.0, 10.0, 1000.0)
+    assert np.allclose(x2, x) and np.allclose(z2, z)
+    print("[OK] ENU roundtrip correct")
+
+
+def make_timed_frames(n=60, rate_hz=30):
+    return [FDRFrame(time=i / rate_hz, lat=0.0, lon=0.0, alt=0.0,
+                     roll=0.0, pitch=0.0, yaw=0.0) for i in range(n)]
+
+
+def test_scheduler_pacing():
+    """Test that frames are emitted on time at a speed multiplier."""
+    frames = make_timed_frames()
+    scheduler = ReplayScheduler(frames, speed=10.0)
+
+    start = time.perf_counter()
+    emitted = [(f, time.perf_counter() - start) for f in scheduler]
+    elapsed = time.perf_counter() - start
+
+    assert [f for f, _ in emitted] == frames, "Frames out of order"
+    expected = frames[-1].time / 10.0
+    assert abs(elapsed - expected) < 0.02, f"Expected ~{expected}s, took {elapsed}s"
+    # Each frame is released at its own deadline, not just at the end
+    assert abs(emitted[30][1] - frames[30].time / 10.0) < 0.01
+    assert scheduler.stats.frames == len(frames)
+    print(f"[OK] Pacing correct (rms jitter {scheduler.stats.rms_jitter * 1e6:.0f} us)")
+
+
+def test_scheduler_seek():
+    """Test that seek skips ahead to the first frame at or after t."""
+    frames = make_timed_frames()
+    scheduler = ReplayScheduler(frames, speed=50.0)
+    scheduler.seek(1.5)
+    emitted = list(scheduler)
+    assert emitted[0].time == 1.5 and len(emitted) == 15, "Seek failed"
+    print("[OK] Seek correct")
+
+
+def test_scheduler_pause_resume():
+    """Test that a pause holds playback and resume continues without a jump."""
+    frames = make_timed_frames()
+    scheduler = ReplayScheduler(frames, speed=10.0)
+    emitted = []
+
+    def play():
+        for f in scheduler:
+            emitted.append(f)
+
+    worker = threading.Thread(target=play)
+    worker.start()
+    time.sleep(0.05)
+    scheduler.pause()
+    time.sleep(0.02)
+    count = len(emitted)
+    time.sleep(0.1)
+    assert len(emitted) == count, "Frames emitted while paused"
+    scheduler.resume()
+    worker.join(timeout=2)
+
+    assert emitted == frames, "Frames lost or repeated across pause"
+    print("[OK] Pause/resume correct")
+
+
 def run_all_tests():
     """Run all tests and report results."""
     tests = [
@@ -128,6 +293,15 @@ def run_all_tests():
         ("Empty DataFrame", test_generate_fdr_frames_empty),
         ("Single Row", test_generate_fdr_frames_single_row),
         ("Large Dataset", test_generate_fdr_frames_large_dataset),
+        ("FrameStore Slicing", test_frame_store_slicing_and_lookup),
+        ("FrameStore Columns", test_frame_store_loader_columns),
+        ("TimeIndex Lookup", test_time_index_matches_binary_search),
+        ("FrameStore Cache Seek", test_frame_store_from_cache_seek),
+        ("WGS-84 ECEF", test_wgs84_ecef),
+        ("ENU Roundtrip", test_enu_roundtrip),
+        ("Scheduler Pacing", test_scheduler_pacing),
+        ("Scheduler Seek", test_scheduler_seek),
+        ("Scheduler Pause/Resume", test_scheduler_pause_resume),
     ]
     
     print("=" * 60)
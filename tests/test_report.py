@@ -0,0 +1,101 @@
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from src.cache import read_header, write_cache
+from src.export_replay_fdr import write_replay_fdr
+from src.report import write_report, write_reports
+from src.visualize import AttitudePlot, MapPlot
+
+
+def make_flight(n=20_000, seed=0):
+    rng = np.random.default_rng(seed)
+    t = 36000 + np.arange(n) / 30.0
+    return pd.DataFrame({
+        "Time": t,
+        "Longitude": 10 + np.cumsum(rng.normal(0, 1e-5, n)),
+        "Latitude": 20 + np.cumsum(rng.normal(0, 1e-5, n)),
+        "Altitude": 3000 + np.cumsum(rng.normal(0, 0.5, n)),
+        "Roll": np.cumsum(rng.normal(0, 0.1, n)),
+        "Pitch": np.cumsum(rng.normal(0, 0.05, n)),
+        "Yaw": (t * 0.5) % 360,
+    })
+
+
+def test_templates_are_reused_across_flights():
+    plot = AttitudePlot()
+    first = make_flight()
+    second = make_flight(n=5000, seed=1)
+    fig = plot.update(first)
+    assert plot.update(second) is fig and len(fig.axes) == 3
+    ax = fig.axes[0]
+    assert ax.get_xlim() == (second["Time"].iloc[0], second["Time"].iloc[-1])
+    assert len(ax.lines) == 1 and len(ax.lines[0].get_xdata()) < 4 * ax.bbox.width + 2
+
+    plot = MapPlot()
+    plot.update(first)
+    colorbars = len(plot.fig.axes)
+    plot.update(second)
+    assert len(plot.fig.axes) == colorbars
+    assert plot.segments.get_clim()[0] < second["Altitude"].min()
+    print("[OK] test_templates_are_reused_across_flights")
+
+
+def test_write_report_from_cache():
+    df = make_flight()
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = write_cache(df, Path(tmp) / "flight.cache")
+        for workers in (1, 2):
+            out = Path(tmp) / f"report{workers}"
+            record = write_report(cache, out, workers=workers)
+            assert record["status"] == "ok" and record["summary"]["rows"] == len(df)
+            assert list(record["files"]) == ["map", "attitude", "trajectory", "altitude"]
+            for name in record["files"].values():
+                assert (out / name).read_bytes()[:8] == b"\x89PNG\r\n\x1a\n"
+            index = (out / "index.html").read_text()
+            assert all(f'src="{name}"' in index for name in record["files"].values())
+
+        # X/Y/Z were derived once, before any worker read the cache
+        names = [c["name"] for c in read_header(cache)["columns"]]
+        assert {"X", "Y", "Z"} <= set(names)
+
+        # A DataFrame source is never mistaken for a cache path
+        out = Path(tmp) / "frame"
+        record = write_report(df, out, plots=["map", "trajectory"])
+        assert record["status"] == "ok" and record["summary"]["rows"] == len(df)
+        assert all((out / name).is_file() for name in record["files"].values())
+    print("[OK] test_write_report_from_cache")
+
+
+def test_write_reports_many_flights():
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        flights = {}
+        for i in range(3):
+            flights[f"F{i}"] = tmp / f"F{i}.fdr"
+            write_replay_fdr(make_flight(n=3000, seed=i), flights[f"F{i}"])
+        flights["bad"] = tmp / "missing.csv"
+
+        summary = write_reports(flights, tmp / "reports", plots=["map", "altitude"],
+                                fmt="svg", workers=2)
+        assert summary["flights"] == 4 and summary["ok"] == 3 and summary["failed"] == 1
+        assert summary["images"] == 6
+        assert (tmp / "reports" / "F2" / "altitude.svg").read_text().startswith("<?xml")
+        index = (tmp / "reports" / "index.html").read_text()
+        assert all(f'href="{fid}/index.html"' in index for fid in flights)
+        assert "FileNotFoundError" in (tmp / "reports" / "bad" / "index.html").read_text()
+
+        try:
+            write_reports(flights, tmp / "reports", plots=["airspeed"])
+            assert False, "unknown plot accepted"
+        except ValueError:
+            pass
+    print("[OK] test_write_reports_many_flights")
+
+
+if __name__ == "__main__":
+    test_templates_are_reused_across_flights()
+    test_write_report_from_cache()
+    test_write_reports_many_flights()
+    print("\nAll tests passed.\n")
@@ -0,0 +1,90 @@
+import asyncio
+import socket
+import threading
+import time
+
+from src.replay import FDRFrame, ReplayScheduler
+from src.stream import PACKET, Subscriber, UDPStreamer, unpack_frame
+
+
+class Receiver(threading.Thread):
+    """Loopback UDP receiver draining its socket on its own thread."""
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.settimeout(0.2)
+        self.port = self.sock.getsockname()[1]
+        self.packets = []
+
+    def run(self):
+        while True:
+            try:
+                self.packets.append(unpack_frame(self.sock.recv(PACKET.size)))
+            except socket.timeout:
+                break
+        self.sock.close()
+
+
+def make_frames(n):
+    return [FDRFrame(time=i / 30, lat=50.0 + i * 1e-6, lon=10.0, alt=1000.0,
+                     roll=1.5, pitch=-2.25, yaw=90.0) for i in range(n)]
+
+
+async def stream_to_receivers(frames, decimations, blocking=False):
+    receivers = [Receiver() for _ in decimations]
+    subscribers = [Subscriber("127.0.0.1", r.port, d)
+                   for r, d in zip(receivers, decimations)]
+    for r in receivers:
+        r.start()
+
+    async with UDPStreamer(subscribers) as streamer:
+        start = time.perf_counter()
+        await streamer.stream(frames, blocking=blocking)
+        elapsed = time.perf_counter() - start
+
+    for r in receivers:
+        r.join()
+    return [r.packets for r in receivers], subscribers, elapsed
+
+
+def test_packet_roundtrip():
+    frame = make_frames(2)[1]
+    buf = bytearray(PACKET.size)
+    PACKET.pack_into(buf, 0, 7, frame.time, frame.lat, frame.lon, frame.alt,
+                     frame.roll, frame.pitch, frame.yaw)
+    seq, out = unpack_frame(buf)
+    assert seq == 7 and out == frame, f"Roundtrip mismatch: {out}"
+    print("[OK] test_packet_roundtrip")
+
+
+def test_stream_to_loopback_subscribers():
+    frames = make_frames(3000)
+    packets, subscribers, elapsed = asyncio.run(
+        stream_to_receivers(frames, decimations=[1, 1, 3]))
+
+    assert [seq for seq, _ in packets[0]] == list(range(3000))
+    assert [f for _, f in packets[1]] == frames
+    assert [seq for seq, _ in packets[2]] == list(range(0, 3000, 3))
+    assert all(sub.dropped == 0 for sub in subscribers)
+    rate = len(frames) / elapsed
+    assert rate > 1000, f"Only {rate:.0f} frames/s"
+    print(f"[OK] test_stream_to_loopback_subscribers ({rate:,.0f} frames/s)")
+
+
+def test_stream_paced_scheduler():
+    frames = make_frames(30)
+    packets, _, elapsed = asyncio.run(stream_to_receivers(
+        ReplayScheduler(frames, speed=10.0), decimations=[1], blocking=True))
+    assert [f for _, f in packets[0]] == frames
+    assert elapsed >= frames[-1].time / 10.0, "Frames were not paced"
+    print("[OK] test_stream_paced_scheduler")
+
+
+if __name__ == "__main__":
+    test_packet_roundtrip()
+    test_stream_to_loopback_subscribers()
+    test_stream_paced_scheduler()
+    print("\nAll tests passed.\n")